@@ -0,0 +1,234 @@
+from __future__ import annotations
+import queue
+import threading
+import time
+from multiprocessing.connection import Client, Connection, Listener
+from typing import Any, Callable, Dict, List, Tuple
+
+import gymnasium as gym
+import numpy as np
+import torch as th
+from stable_baselines3 import DQN
+from stable_baselines3.common.utils import polyak_update
+
+from DynamicsModel import add_to_buffer
+
+Address = Tuple[str, int]
+
+
+def actor_epsilon(i: int, n: int, eps: float = 0.4, alpha: float = 7.0) -> float:
+    """Ape-X exploration ladder: actor 0 explores most, the last one least."""
+    return eps ** (1 + alpha * i / max(n - 1, 1))
+
+
+def weights(model: DQN) -> Dict[str, np.ndarray]:
+    return {k: v.detach().cpu().numpy() for k, v in model.q_net.state_dict().items()}
+
+
+def run_actor(
+    actor_id: int,
+    address: Address,
+    authkey: bytes,
+    make_env: Callable[[], gym.Env],
+    epsilon: float,
+    send_every: int = 64,
+    seed: int | None = None,
+) -> None:
+    """Acts with the latest weights of the learner and streams transitions to it.
+
+    Each batch is one pickled dict of arrays on the socket; new weights are
+    picked up between two batches, so acting never waits for the learner.
+    """
+    env = make_env()
+    conn = Client(address, authkey=authkey)
+    conn.send(("hello", actor_id))
+    rng = np.random.default_rng(seed)
+    # local copy of the Q-network, never trained here
+    policy = DQN("MlpPolicy", env, buffer_size=1, device="cpu")
+    q_net = policy.q_net
+
+    def sync(block: bool) -> bool:
+        while block or conn.poll():
+            try:
+                kind, payload = conn.recv()
+            except (EOFError, OSError):  # learner gone
+                return False
+            if kind == "stop":
+                return False
+            q_net.load_state_dict({k: th.as_tensor(v) for k, v in payload.items()})
+            block = False
+        return True
+
+    running = sync(block=True)  # initial weights
+    obs, info = env.reset(seed=seed)
+    batch: Dict[str, List[Any]] = {
+        k: [] for k in ("obs", "action", "reward", "next_obs", "done")
+    }
+    returns: List[float] = []  # of the episodes finished since the last batch
+    ret = 0.0
+    while running:
+        mask = info.get("action_mask")
+        if mask is None:
+            mask = np.ones(env.action_space.n, dtype=bool)
+        if rng.random() < epsilon:
+            action = int(rng.choice(np.flatnonzero(mask)))
+        else:
+            with th.no_grad():
+                q = q_net(th.as_tensor(obs[None], dtype=th.float32))[0].numpy()
+            action = int(np.where(mask, q, -np.inf).argmax())
+
+        next_obs, reward, terminated, truncated, info = env.step(action)
+        for k, v in zip(batch, (obs, action, reward, next_obs, terminated)):
+            batch[k].append(v)
+        ret += reward
+        obs = next_obs
+        if terminated or truncated:
+            returns.append(ret)
+            ret = 0.0
+            obs, info = env.reset()
+
+        if len(batch["action"]) >= send_every:
+            arrays = {
+                k: np.asarray(v, dtype=np.int64 if k == "action" else np.float32)
+                for k, v in batch.items()
+            }
+            try:
+                conn.send(("batch", (arrays, returns)))
+            except OSError:
+                break
+            batch = {k: [] for k in batch}
+            returns = []
+            running = sync(block=False)
+    conn.close()
+    env.close()
+
+
+class ApeXLearner:
+    """Owns the replay buffer and the only trainable copy of the DQN.
+
+    Actors connect to `address` (multiprocessing.connection, pickles over a
+    local TCP socket with an auth key); one thread per actor queues its
+    batches. The learner trains on the shared buffer, at most
+    `max_replay_ratio` sampled transitions per collected one, and broadcasts
+    the weights every `sync_every` gradient steps.
+    """
+
+    def __init__(
+        self,
+        model: DQN,
+        address: Address = ("127.0.0.1", 0),
+        authkey: bytes = b"screeps",
+        batch_size: int = 256,
+        gradient_steps: int = 8,
+        target_update: int = 500,
+        sync_every: int = 50,
+        max_replay_ratio: float | None = 8.0,
+    ):
+        self.model = model
+        self.batch_size = batch_size
+        self.gradient_steps = gradient_steps
+        self.target_update = target_update
+        self.sync_every = sync_every
+        self.max_replay_ratio = max_replay_ratio
+        self.listener = Listener(address, authkey=authkey)
+        self.address: Address = self.listener.address
+        self.transitions = 0
+        self.updates = 0
+        self.episodes = 0
+        self._inbox: queue.Queue = queue.Queue()
+        self._actors: Dict[int, Connection] = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        threading.Thread(target=self._accept, daemon=True).start()
+
+    def _accept(self) -> None:
+        while not self._stop.is_set():
+            try:
+                conn = self.listener.accept()
+            except OSError:
+                return
+            kind, actor_id = conn.recv()
+            with self._lock:
+                self._actors[actor_id] = conn
+            conn.send(("weights", weights(self.model)))
+            threading.Thread(target=self._read, args=(conn,), daemon=True).start()
+
+    def _read(self, conn: Connection) -> None:
+        while True:
+            try:
+                kind, payload = conn.recv()
+            except (EOFError, OSError):
+                return
+            if kind == "batch":
+                self._inbox.put(payload)
+
+    def _broadcast(self, message) -> None:
+        with self._lock:
+            for actor_id, conn in list(self._actors.items()):
+                try:
+                    conn.send(message)
+                except OSError:
+                    del self._actors[actor_id]
+
+    def _drain(self) -> List[float]:
+        returns: List[float] = []
+        while True:
+            try:
+                batch, rets = self._inbox.get_nowait()
+            except queue.Empty:
+                return returns
+            add_to_buffer(self.model.replay_buffer, batch)
+            self.transitions += len(batch["action"])
+            self.episodes += len(rets)
+            returns += rets
+
+    def run(
+        self, total_transitions: int, learning_starts: int = 1000, log_every: float = 10
+    ) -> None:
+        """Trains until the actors delivered `total_transitions`, then stops them."""
+        start = last_log = time.perf_counter()
+        returns: List[float] = []
+        while self.transitions < total_transitions:
+            returns += self._drain()
+            ahead = (
+                self.max_replay_ratio is not None
+                and self.updates * self.batch_size
+                > self.max_replay_ratio * self.transitions
+            )
+            if self.transitions < learning_starts or ahead:
+                time.sleep(0.01)  # wait for the actors
+                continue
+            self.model.train(self.gradient_steps, self.batch_size)
+            before, self.updates = self.updates, self.updates + self.gradient_steps
+            if self.updates // self.target_update > before // self.target_update:
+                polyak_update(
+                    self.model.q_net.parameters(),
+                    self.model.q_net_target.parameters(),
+                    1.0,
+                )
+            if self.updates // self.sync_every > before // self.sync_every:
+                self._broadcast(("weights", weights(self.model)))
+
+            now = time.perf_counter()
+            if now - last_log >= log_every:
+                last_log = now
+                self._log(returns, now - start)
+                returns = []
+        self._log(returns, time.perf_counter() - start)
+        self.close()
+
+    def _log(self, returns: List[float], elapsed: float) -> None:
+        logger = self.model.logger
+        logger.record("apex/actors", len(self._actors))
+        logger.record("apex/transitions", self.transitions)
+        logger.record("apex/transitions_per_s", self.transitions / max(elapsed, 1e-9))
+        logger.record("apex/gradient_steps", self.updates)
+        logger.record("apex/episodes", self.episodes)
+        if returns:
+            logger.record("apex/ep_rew_mean", float(np.mean(returns)))
+        logger.dump(self.transitions)
+
+    def close(self) -> None:
+        self._stop.set()
+        self._broadcast(("stop", None))  # actors hang up, readers see EOF
+        self.listener.close()
@@ -0,0 +1,242 @@
+from __future__ import annotations
+import asyncio
+import json
+import threading
+from base64 import b64decode
+from gzip import decompress
+from typing import Any, Awaitable, Dict, List, Tuple
+
+import aiohttp
+
+# one signin per (host, user), shared by every client of the process
+_TOKENS: Dict[Tuple[str, str], str] = {}
+
+
+def _gunzip(ret: Dict[str, Any]) -> Dict[str, Any]:
+    # memory & segments come back as "gz:" + base64(gzip(json))
+    data = ret.get("data")
+    if isinstance(data, str) and data.startswith("gz:"):
+        ret["data"] = json.loads(decompress(b64decode(data[3:])).decode("utf-8"))
+    return ret
+
+
+class AsyncScreepsAPI:
+    """asyncio client for the Screeps HTTP API (subset used by the envs).
+
+    One aiohttp session keeps up to `limit` keep-alive connections to the
+    server, so concurrent calls (e.g. the memory reads of several envs) are
+    in flight together instead of queued. The auth token is reused across
+    clients of the same user and refreshed from the X-Token response header,
+    like screepsapi does; a 401 triggers one new signin.
+    """
+
+    def __init__(
+        self,
+        user: str | None = None,
+        password: str | None = None,
+        host: str | None = None,
+        secure: bool = False,
+        token: str | None = None,
+        limit: int = 16,
+    ):
+        self.user = user
+        self.password = password
+        self.host = host or "screeps.com"
+        self.prefix = ("https://" if secure else "http://") + self.host + "/api/"
+        self.limit = limit
+        self._key = (self.host, user or "")
+        if token is not None:
+            _TOKENS[self._key] = token
+        self._session: aiohttp.ClientSession | None = None
+
+    @property
+    def token(self) -> str | None:
+        return _TOKENS.get(self._key)
+
+    async def open(self) -> "AsyncScreepsAPI":
+        if self._session is None:
+            connector = aiohttp.TCPConnector(limit=self.limit, keepalive_timeout=60)
+            self._session = aiohttp.ClientSession(connector=connector)
+        if self.token is None and self.user is not None and self.password is not None:
+            await self.signin()
+        return self
+
+    async def close(self) -> None:
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    async def __aenter__(self) -> "AsyncScreepsAPI":
+        return await self.open()
+
+    async def __aexit__(self, *exc) -> None:
+        await self.close()
+
+    async def signin(self) -> str:
+        ret = await self._req(
+            "POST",
+            "auth/signin",
+            auth=False,
+            json={"email": self.user, "password": self.password},
+        )
+        _TOKENS[self._key] = ret["token"]
+        return ret["token"]
+
+    async def _req(
+        self, method: str, path: str, auth: bool = True, retry: bool = True, **kwargs
+    ) -> Any:
+        if self._session is None:
+            await self.open()
+        headers = (
+            {"X-Token": self.token or "", "X-Username": self.token or ""}
+            if auth
+            else {}
+        )
+        async with self._session.request(
+            method, self.prefix + path, headers=headers, **kwargs
+        ) as r:
+            if r.status == 401 and auth and retry and self.password is not None:
+                await self.signin()
+                return await self._req(method, path, auth, retry=False, **kwargs)
+            r.raise_for_status()
+            new = r.headers.get("X-Token")
+            if new and len(new) >= 40:
+                _TOKENS[self._key] = new
+            return json.loads(await r.text())
+
+    async def get(self, _path: str, **params) -> Any:
+        return await self._req(
+            "GET", _path, params={k: v for k, v in params.items() if v is not None}
+        )
+
+    async def post(self, _path: str, **body) -> Any:
+        return await self._req("POST", _path, json=body)
+
+    # Endpoints (same names and results as screepsapi.API)
+    async def me(self) -> Dict[str, Any]:
+        return await self.get("auth/me")
+
+    async def user_rooms(self, userid: str, shard: str = "shard0") -> Dict[str, Any]:
+        return await self.get("user/rooms", id=userid, shard=shard)
+
+    async def room_overview(
+        self, room: str, interval: int = 8, shard: str = "shard0"
+    ) -> Dict[str, Any]:
+        return await self.get(
+            "game/room-overview", interval=interval, room=room, shard=shard
+        )
+
+    async def memory(self, path: str = "", shard: str = "shard0") -> Dict[str, Any]:
+        return _gunzip(await self.get("user/memory", path=path, shard=shard))
+
+    async def set_memory(
+        self, path: str, value: Any, shard: str = "shard0"
+    ) -> Dict[str, Any]:
+        return await self.post("user/memory", path=path, value=value, shard=shard)
+
+    async def get_segment(self, segment: int, shard: str = "shard0") -> Dict[str, Any]:
+        return _gunzip(
+            await self.get("user/memory-segment", segment=segment, shard=shard)
+        )
+
+    async def set_segment(
+        self, segment: int, data: str, shard: str = "shard0"
+    ) -> Dict[str, Any]:
+        return await self.post(
+            "user/memory-segment", segment=segment, data=data, shard=shard
+        )
+
+    async def time(self, shard: str = "shard0") -> int:
+        return (await self.get("game/time", shard=shard))["time"]
+
+    async def console(self, cmd: str, shard: str = "shard0") -> Dict[str, Any]:
+        return await self.post("user/console", expression=cmd, shard=shard)
+
+
+class _Loop:
+    """Event loop running in a daemon thread, shared by every SyncScreepsAPI."""
+
+    _instance: "_Loop | None" = None
+    _lock = threading.Lock()
+
+    def __init__(self):
+        self.loop = asyncio.new_event_loop()
+        threading.Thread(target=self.loop.run_forever, daemon=True).start()
+
+    @classmethod
+    def get(cls) -> "_Loop":
+        with cls._lock:
+            if cls._instance is None:
+                cls._instance = cls()
+            return cls._instance
+
+    def run(self, coro: Awaitable) -> Any:
+        return asyncio.run_coroutine_threadsafe(coro, self.loop).result()
+
+
+class SyncScreepsAPI:
+    """Blocking facade over AsyncScreepsAPI, drop-in for screepsapi.API.
+
+    Calls run on a shared background loop, so all envs of a process share
+    the connection pool. `gather` sends several calls at once and returns
+    when the slowest is back (one round trip instead of the sum).
+    """
+
+    def __init__(
+        self,
+        u: str | None = None,
+        p: str | None = None,
+        host: str | None = None,
+        secure: bool = False,
+        token: str | None = None,
+        limit: int = 16,
+    ):
+        self._loop = _Loop.get()
+        self.aio = AsyncScreepsAPI(u, p, host, secure, token, limit)
+        self._loop.run(self.aio.open())
+
+    @property
+    def token(self) -> str | None:
+        return self.aio.token
+
+    def gather(self, *calls: Tuple[str, tuple, dict] | Tuple[str, tuple]) -> List[Any]:
+        """gather(("memory", ("dqn_step",)), ("console", (code,), {"shard": s}))"""
+
+        async def run():
+            coros = [
+                getattr(self.aio, c[0])(*c[1], **(c[2] if len(c) > 2 else {}))
+                for c in calls
+            ]
+            return await asyncio.gather(*coros)
+
+        return self._loop.run(run())
+
+    def close(self) -> None:
+        self._loop.run(self.aio.close())
+
+    def me(self):
+        return self._loop.run(self.aio.me())
+
+    def user_rooms(self, userid, shard="shard0"):
+        return self._loop.run(self.aio.user_rooms(userid, shard))
+
+    def room_overview(self, room, interval=8, shard="shard0"):
+        return self._loop.run(self.aio.room_overview(room, interval, shard))
+
+    def memory(self, path="", shard="shard0"):
+        return self._loop.run(self.aio.memory(path, shard))
+
+    def set_memory(self, path, value, shard="shard0"):
+        return self._loop.run(self.aio.set_memory(path, value, shard))
+
+    def get_segment(self, segment, shard="shard0"):
+        return self._loop.run(self.aio.get_segment(segment, shard))
+
+    def set_segment(self, segment, data, shard="shard0"):
+        return self._loop.run(self.aio.set_segment(segment, data, shard))
+
+    def time(self, shard="shard0"):
+        return self._loop.run(self.aio.time(shard))
+
+    def console(self, cmd, shard="shard0"):
+        return self._loop.run(self.aio.console(cmd, shard))
@@ -0,0 +1,246 @@
+from __future__ import annotations
+from typing import Any, Dict, List
+
+import numpy as np
+from stable_baselines3.common.callbacks import BaseCallback
+
+from ScreepsSpawnEnv import ACTIONS, spawn_reward, spawns_without_move
+
+LOW = np.array([0, 0, 0, 1, 0], dtype=np.float32)
+HIGH = np.array([1, 50, 50, 8, 500], dtype=np.float32)
+
+
+def reward_batch(
+    prev: np.ndarray, curr: np.ndarray, actions: np.ndarray, table=ACTIONS
+) -> np.ndarray:
+    """Reward of the env over a batch (the reward is known, not learned)."""
+    no_move = spawns_without_move(table)[actions]
+    return spawn_reward(prev, curr, no_move).astype(np.float32)
+
+
+class _Groups:
+    """Rows grouped by an int64 key, one random member drawn per query."""
+
+    def __init__(self, keys: np.ndarray):
+        self.order = np.argsort(keys, kind="stable")
+        self.keys, self.start, self.count = np.unique(
+            keys[self.order], return_index=True, return_counts=True
+        )
+
+    def sample(self, q: np.ndarray, rng: np.random.Generator) -> np.ndarray:
+        """Index of a row with key q (per query), -1 where the key is unseen."""
+        if len(self.keys) == 0:
+            return np.full(len(q), -1)
+        pos = np.minimum(np.searchsorted(self.keys, q), len(self.keys) - 1)
+        hit = self.keys[pos] == q
+        off = (rng.random(len(q)) * self.count[pos]).astype(np.int64)
+        return np.where(hit, self.order[self.start[pos] + off], -1)
+
+
+class DynamicsModel:
+    """Empirical transition model of the 5-dim spawn state.
+
+    Next states are drawn from the deltas observed for the same (state,
+    action); unseen pairs back off to (energy flag, creeps or not, RCL,
+    action), then to the action alone, then to "no change". Everything is
+    vectorized, so thousands of rollouts cost a few NumPy calls.
+    """
+
+    def __init__(
+        self,
+        actions: List[Dict[str, Any]] | None = None,
+        capacity: int = 200_000,
+        seed=None,
+    ):
+        self.table = actions or ACTIONS
+        self.n_actions = len(self.table)
+        self.capacity = capacity
+        self.rng = np.random.default_rng(seed)
+        self.obs = np.zeros((0, 5), dtype=np.float32)
+        self.actions = np.zeros(0, dtype=np.int64)
+        self.next_obs = np.zeros((0, 5), dtype=np.float32)
+        self._levels: List[_Groups] = []
+
+    def __len__(self) -> int:
+        return len(self.actions)
+
+    def _keys(self, obs: np.ndarray, actions: np.ndarray) -> List[np.ndarray]:
+        s = np.rint(obs).astype(np.int64)
+        e, h, u, rcl, prog = s.T
+        exact = ((((e * 51 + h) * 51 + u) * 9 + rcl) * 501 + prog) * self.n_actions
+        coarse = (((e * 2 + (h > 0)) * 2 + (u > 0)) * 9 + rcl) * self.n_actions
+        return [exact + actions, coarse + actions, actions]
+
+    def add(self, obs: np.ndarray, actions: np.ndarray, next_obs: np.ndarray) -> None:
+        """Adds transitions (oldest dropped beyond `capacity`) and refits."""
+        self.obs = np.concatenate([self.obs, obs])[-self.capacity :]
+        self.actions = np.concatenate([self.actions, actions])[-self.capacity :]
+        self.next_obs = np.concatenate([self.next_obs, next_obs])[-self.capacity :]
+        self._levels = [_Groups(k) for k in self._keys(self.obs, self.actions)]
+
+    def predict(self, obs: np.ndarray, actions: np.ndarray) -> np.ndarray:
+        """One sampled next state per (obs, action) row."""
+        delta = np.zeros_like(obs)
+        todo = np.ones(len(obs), dtype=bool)
+        for groups, keys in zip(self._levels, self._keys(obs, actions)):
+            idx = groups.sample(keys, self.rng)
+            hit = todo & (idx >= 0)
+            delta[hit] = self.next_obs[idx[hit]] - self.obs[idx[hit]]
+            todo &= ~hit
+            if not todo.any():
+                break
+        return np.clip(np.rint(obs) + delta, LOW, HIGH).astype(np.float32)
+
+    def skill(
+        self,
+        obs: np.ndarray,
+        actions: np.ndarray,
+        next_obs: np.ndarray,
+        samples: int = 8,
+    ) -> float:
+        """Skill score of the predicted state changes against "no change".
+
+        1 - MSE(pred, real) / MSE(0, real) over the rows, clipped to [0, 1]:
+        0 = no better than predicting no change, 1 = exact. Each row's
+        prediction is the mean of `samples` draws, so sampling noise does
+        not count as error.
+        """
+        real = next_obs - obs
+        pred = np.mean(
+            [self.predict(obs, actions) - obs for _ in range(samples)], axis=0
+        )
+        base = float(np.square(real).sum())
+        if base == 0:
+            return 0.0  # nothing changed: no evidence either way
+        return float(np.clip(1 - np.square(pred - real).sum() / base, 0, 1))
+
+    def rollout(
+        self, start: np.ndarray, policy, horizon: int = 5
+    ) -> Dict[str, np.ndarray]:
+        """Batched synthetic rollouts, `policy(obs) -> actions`; rows stop at RCL 2."""
+        obs, alive = start.astype(np.float32), np.ones(len(start), dtype=bool)
+        out: Dict[str, List[np.ndarray]] = {
+            k: [] for k in ("obs", "action", "reward", "next_obs", "done")
+        }
+        for _ in range(horizon):
+            if not alive.any():
+                break
+            o = obs[alive]
+            a = np.asarray(policy(o), dtype=np.int64).reshape(-1)
+            nxt = self.predict(o, a)
+            done = nxt[:, 3] >= 2
+            for k, v in zip(
+                out, (o, a, reward_batch(o, nxt, a, self.table), nxt, done)
+            ):
+                out[k].append(v)
+            obs[alive] = nxt
+            alive[np.flatnonzero(alive)[done]] = False
+        return {k: np.concatenate(v) if v else np.zeros(0) for k, v in out.items()}
+
+
+def add_to_buffer(buffer, batch: Dict[str, np.ndarray]) -> None:
+    """Writes a batch of transitions into a stable-baselines3 ReplayBuffer.
+
+    Each buffer row holds `n_envs` transitions, one per env column, so every
+    row written is full; the last `len % n_envs` transitions are dropped.
+    Synthetic next states have no action mask: every action is valid.
+    """
+    k = buffer.n_envs
+    n = len(batch["action"]) // k * k
+    rows_per_chunk = buffer.buffer_size * k
+    for start in range(0, n, rows_per_chunk):
+        rows = slice(start, min(start + rows_per_chunk, n))
+        m = (rows.stop - rows.start) // k
+        idx = (buffer.pos + np.arange(m)) % buffer.buffer_size
+        obs_shape = batch["obs"].shape[1:]
+        buffer.observations[idx] = batch["obs"][rows].reshape(m, k, *obs_shape)
+        buffer.next_observations[idx] = batch["next_obs"][rows].reshape(
+            m, k, *obs_shape
+        )
+        buffer.actions[idx] = batch["action"][rows].reshape(m, k, 1)
+        buffer.rewards[idx] = batch["reward"][rows].reshape(m, k)
+        buffer.dones[idx] = batch["done"][rows].reshape(m, k)
+        buffer.timeouts[idx] = 0
+        if hasattr(buffer, "next_masks"):  # MaskedReplayBuffer: all valid
+            buffer.next_masks[idx] = 255
+        buffer.full = buffer.full or buffer.pos + m >= buffer.buffer_size
+        buffer.pos = (buffer.pos + m) % buffer.buffer_size
+
+
+class DynaCallback(BaseCallback):
+    """Dyna for stable-baselines3 DQN: live steps fit the model, the model adds
+    synthetic transitions to the replay buffer.
+
+    Every `fit_every` steps the new live transitions are first used to score
+    the model (they were never seen by it), then added to it. The number of
+    synthetic transitions per live one is `max_ratio * skill` (skill
+    smoothed), so a model no better than "no change" adds none.
+    """
+
+    def __init__(
+        self,
+        model: DynamicsModel | None = None,
+        fit_every: int = 64,
+        max_ratio: float = 10.0,
+        horizon: int = 5,
+        min_transitions: int = 256,
+        smoothing: float = 0.8,
+        verbose: int = 0,
+    ):
+        super().__init__(verbose)
+        self.dynamics = model or DynamicsModel()
+        self.fit_every = fit_every
+        self.max_ratio = max_ratio
+        self.horizon = horizon
+        self.min_transitions = min_transitions
+        self.smoothing = smoothing
+        self.model_skill = 0.0
+        self.ratio = 0.0
+        self._new: Dict[str, List[Any]] = {"obs": [], "action": [], "next_obs": []}
+
+    def _on_step(self) -> bool:
+        obs = self.model._last_obs
+        new_obs = self.locals["new_obs"]
+        for i, info in enumerate(self.locals["infos"]):
+            self._new["obs"].append(obs[i])
+            self._new["action"].append(int(self.locals["actions"][i]))
+            self._new["next_obs"].append(info.get("terminal_observation", new_obs[i]))
+        if self.n_calls % self.fit_every == 0:
+            self._dyna_update()
+        return True
+
+    def _policy(self, obs: np.ndarray) -> np.ndarray:
+        actions, _ = self.model.policy.predict(obs, deterministic=True)
+        explore = self.dynamics.rng.random(len(obs)) < self.model.exploration_rate
+        return np.where(
+            explore,
+            self.dynamics.rng.integers(self.dynamics.n_actions, size=len(obs)),
+            actions,
+        )
+
+    def _dyna_update(self) -> None:
+        obs = np.asarray(self._new["obs"], dtype=np.float32)
+        actions = np.asarray(self._new["action"], dtype=np.int64)
+        next_obs = np.asarray(self._new["next_obs"], dtype=np.float32)
+        self._new = {k: [] for k in self._new}
+
+        if len(self.dynamics) >= self.min_transitions:
+            skill = self.dynamics.skill(obs, actions, next_obs)
+            self.model_skill = (
+                self.smoothing * self.model_skill + (1 - self.smoothing) * skill
+            )
+            self.ratio = self.max_ratio * self.model_skill
+        self.dynamics.add(obs, actions, next_obs)
+
+        n = int(self.ratio * len(actions))
+        if n > 0:
+            pick = self.dynamics.rng.integers(
+                len(self.dynamics), size=max(1, n // self.horizon)
+            )
+            batch = self.dynamics.rollout(
+                self.dynamics.obs[pick], self._policy, self.horizon
+            )
+            add_to_buffer(self.model.replay_buffer, batch)
+            self.logger.record("dyna/synthetic", len(batch["action"]))
+        self.logger.record("dyna/model_skill", self.model_skill)
+        self.logger.record("dyna/ratio", self.ratio)
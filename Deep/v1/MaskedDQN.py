@@ -0,0 +1,187 @@
+from __future__ import annotations
+from typing import Any, Dict, List, NamedTuple
+
+import numpy as np
+import torch as th
+from torch.nn import functional as F
+from stable_baselines3 import DQN
+from stable_baselines3.common.buffers import ReplayBuffer
+
+
+class MaskedReplayBufferSamples(NamedTuple):
+    observations: th.Tensor
+    actions: th.Tensor
+    next_observations: th.Tensor
+    dones: th.Tensor
+    rewards: th.Tensor
+    next_masks: th.Tensor  # (batch, n_actions) bool, valid actions at next_obs
+
+
+class MaskedReplayBuffer(ReplayBuffer):
+    """ReplayBuffer that also keeps `info["action_mask"]` of each next state.
+
+    Masks are stored bit-packed (n_actions / 8 bytes per transition); a
+    transition without one allows every action.
+    """
+
+    def __init__(
+        self, buffer_size: int, observation_space, action_space, *args, **kwargs
+    ):
+        super().__init__(buffer_size, observation_space, action_space, *args, **kwargs)
+        self.n_actions = int(action_space.n)
+        self.next_masks = np.full(
+            (self.buffer_size, self.n_envs, (self.n_actions + 7) // 8),
+            255,
+            dtype=np.uint8,
+        )
+
+    def add(
+        self, obs, next_obs, action, reward, done, infos: List[Dict[str, Any]]
+    ) -> None:
+        masks = np.ones((self.n_envs, self.n_actions), dtype=bool)
+        for i, info in enumerate(infos):
+            if info.get("action_mask") is not None:
+                masks[i] = info["action_mask"]
+        self.next_masks[self.pos] = np.packbits(masks, axis=1)
+        super().add(obs, next_obs, action, reward, done, infos)
+
+    def _get_samples(
+        self, batch_inds: np.ndarray, env=None
+    ) -> MaskedReplayBufferSamples:
+        env_indices = np.random.randint(0, high=self.n_envs, size=(len(batch_inds),))
+        if self.optimize_memory_usage:
+            next_obs = self.observations[
+                (batch_inds + 1) % self.buffer_size, env_indices, :
+            ]
+        else:
+            next_obs = self.next_observations[batch_inds, env_indices, :]
+        data = (
+            self._normalize_obs(self.observations[batch_inds, env_indices, :], env),
+            self.actions[batch_inds, env_indices, :],
+            self._normalize_obs(next_obs, env),
+            (
+                self.dones[batch_inds, env_indices]
+                * (1 - self.timeouts[batch_inds, env_indices])
+            ).reshape(-1, 1),
+            self._normalize_reward(
+                self.rewards[batch_inds, env_indices].reshape(-1, 1), env
+            ),
+        )
+        masks = np.unpackbits(
+            self.next_masks[batch_inds, env_indices], axis=1, count=self.n_actions
+        )
+        return MaskedReplayBufferSamples(
+            *map(self.to_torch, data),
+            th.as_tensor(masks.astype(bool), device=self.device),
+        )
+
+
+class MaskedDQN(DQN):
+    """DQN restricted to the valid actions published by the env.
+
+    The envs put the mask of the state they return in `info["action_mask"]`
+    (and in the reset infos). Acting takes the argmax of Q over valid
+    actions and explores among them only; the TD target takes the max over
+    the valid actions of the next state. Without masks it is plain DQN.
+    """
+
+    def __init__(self, *args, **kwargs):
+        kwargs.setdefault("replay_buffer_class", MaskedReplayBuffer)
+        super().__init__(*args, **kwargs)
+
+    def _setup_learn(self, *args, **kwargs):
+        out = super()._setup_learn(*args, **kwargs)
+        self._masks = np.ones((self.n_envs, self.action_space.n), dtype=bool)
+        self._update_masks(self._reset_infos(), np.ones(self.n_envs, dtype=bool))
+        return out
+
+    def _reset_infos(self) -> List[Dict[str, Any]]:
+        infos = getattr(self.env.unwrapped, "reset_infos", None)
+        return list(infos) if infos else [{} for _ in range(self.n_envs)]
+
+    def _update_masks(self, infos: List[Dict[str, Any]], done: np.ndarray) -> None:
+        # a done env returned its reset obs, described by its reset info
+        reset_infos = self._reset_infos() if done.any() else infos
+        for i, info in enumerate(infos):
+            mask = (reset_infos[i] if done[i] else info).get("action_mask")
+            self._masks[i] = True if mask is None else mask
+
+    def _update_info_buffer(self, infos: List[Dict[str, Any]], dones=None) -> None:
+        super()._update_info_buffer(infos, dones)
+        done = np.zeros(self.n_envs, dtype=bool) if dones is None else dones
+        self._update_masks(infos, np.asarray(done, dtype=bool))
+
+    def _random_actions(self, masks: np.ndarray) -> np.ndarray:
+        """One uniformly drawn valid action per row."""
+        return (np.random.rand(*masks.shape) * masks).argmax(axis=1)
+
+    def _sample_action(self, learning_starts: int, action_noise=None, n_envs: int = 1):
+        if self.num_timesteps < learning_starts:
+            action = self._random_actions(self._masks)
+        else:
+            action, _ = self.predict(
+                self._last_obs, deterministic=False, action_masks=self._masks
+            )
+        return action, action
+
+    def predict(
+        self,
+        observation: np.ndarray,
+        state=None,
+        episode_start=None,
+        deterministic: bool = False,
+        action_masks: np.ndarray | None = None,
+    ):
+        if action_masks is None:
+            return super().predict(observation, state, episode_start, deterministic)
+        self.policy.set_training_mode(False)
+        obs, vectorized = self.policy.obs_to_tensor(observation)
+        with th.no_grad():
+            q = self.q_net(obs).cpu().numpy()
+        masks = np.asarray(action_masks, dtype=bool).reshape(q.shape)
+        action = np.where(masks, q, -np.inf).argmax(axis=1)
+        if not deterministic:
+            explore = np.random.rand(len(action)) < self.exploration_rate
+            action = np.where(explore, self._random_actions(masks), action)
+        return (action if vectorized else action[0]), state
+
+    def train(self, gradient_steps: int, batch_size: int = 100) -> None:
+        # DQN.train with the max of the TD target over the valid next actions
+        self.policy.set_training_mode(True)
+        self._update_learning_rate(self.policy.optimizer)
+
+        losses = []
+        for _ in range(gradient_steps):
+            replay_data = self.replay_buffer.sample(
+                batch_size, env=self._vec_normalize_env
+            )
+            with th.no_grad():
+                next_q_values = self.q_net_target(replay_data.next_observations)
+                if isinstance(replay_data, MaskedReplayBufferSamples):
+                    next_q_values = next_q_values.masked_fill(
+                        ~replay_data.next_masks, -th.inf
+                    )
+                next_q_values, _ = next_q_values.max(dim=1)
+                next_q_values = next_q_values.reshape(-1, 1)
+                target_q_values = (
+                    replay_data.rewards
+                    + (1 - replay_data.dones) * self.gamma * next_q_values
+                )
+
+            current_q_values = self.q_net(replay_data.observations)
+            current_q_values = th.gather(
+                current_q_values, dim=1, index=replay_data.actions.long()
+            )
+
+            loss = F.smooth_l1_loss(current_q_values, target_q_values)
+            losses.append(loss.item())
+
+            self.policy.optimizer.zero_grad()
+            loss.backward()
+            th.nn.utils.clip_grad_norm_(self.policy.parameters(), self.max_grad_norm)
+            self.policy.optimizer.step()
+
+        self._n_updates += gradient_steps
+
+        self.logger.record("train/n_updates", self._n_updates, exclude="tensorboard")
+        self.logger.record("train/loss", np.mean(losses))
@@ -0,0 +1,424 @@
+"""
+Local stand-in for the private server: the HTTP endpoints used by screepsapi
+(auth, me, user_rooms, room_overview, time, memory, console, segments), backed by
+ScreepsSim and a Python copy of the main.js DQN handler.
+
+    python MockScreepsServer.py [port]          # serve until Ctrl-C
+    python MockScreepsServer.py --smoke [steps] # ScreepsSpawnEnv end to end
+"""
+
+from __future__ import annotations
+import base64
+import gzip
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Sequence
+from urllib.parse import parse_qs, urlparse
+
+import numpy as np
+
+from ScreepsSim import SimParams, SpawnEconomySim, action_tables
+from ScreepsSpawnEnv import WAIT_ACTION
+
+USER_ID = "5a0000000000000000000001"
+TOKEN = "0" * 40  # screepsapi only keeps X-Token headers of 40+ chars
+
+
+def _gz(value: Any) -> str:
+    return "gz:" + base64.b64encode(gzip.compress(json.dumps(value).encode())).decode()
+
+
+def _get_path(mem: Dict[str, Any], path: str) -> Any:
+    v: Any = mem
+    for k in filter(None, path.split(".")):
+        if not isinstance(v, dict):
+            return None
+        v = v.get(k)
+    return v
+
+
+def _set_path(mem: Dict[str, Any], path: str, value: Any) -> None:
+    keys = path.split(".")
+    for k in keys[:-1]:
+        mem = mem.setdefault(k, {})
+    if value is None:
+        mem.pop(keys[-1], None)
+    else:
+        mem[keys[-1]] = value
+
+
+class MockGame:
+    """In-process game: one user owning `rooms`, simulated by SpawnEconomySim.
+
+    `tick()` does what the server + main.js do in one tick: publish
+    Memory.dqn_step (or dqn_batch when Memory.dqn_rooms is set) for the
+    current state, then apply the pending Memory.dqn_action.
+    """
+
+    def __init__(
+        self,
+        rooms: Sequence[str] = ("W7N7",),
+        params: SimParams | None = None,
+        username: str = "dqn",
+        seed: int | None = None,
+    ):
+        self.rooms = list(rooms)
+        self.username = username
+        self.sim = SpawnEconomySim(len(self.rooms), params, seed=seed)
+        self.memory: Dict[str, Any] = {}
+        self.segments: Dict[int, str] = {}
+        self.console_log: List[str] = []
+        self.time = 1
+        self.wait_action = WAIT_ACTION
+        self._table: Any = None  # last Memory.dqn_actions loaded into the sim
+        self.lock = threading.RLock()
+
+    def reset_rooms(self, rooms: Sequence[str]) -> None:
+        with self.lock:
+            mask = np.isin(self.rooms, list(rooms))
+            self.sim.reset(mask)
+
+    def _load_actions(self, table: Any) -> None:
+        """Follows Memory.dqn_actions, like main.js does every tick."""
+        if not isinstance(table, list) or table == self._table:
+            return
+        self._table = table
+        actions = [
+            (
+                {
+                    "type": "SPAWN",
+                    "role": a["role"],
+                    "body": [p.upper() for p in a["body"]],
+                }
+                if a
+                else {"type": "WAIT"}
+            )
+            for a in table
+        ]
+        self.sim.tables = action_tables(actions)
+        self.wait_action = len(actions) - 1
+
+    def _due(self, macro: Dict[str, Any], obs: np.ndarray, mask: str) -> bool:
+        """dqnDue of main.js: is a decision needed again?"""
+        if self.time - macro["at"] >= self.memory.get("dqn_skip", 1):
+            return True
+        if int(obs[3]) != macro["level"]:
+            return True
+        is_spawn = self.sim.tables["is_spawn"]
+        return macro["done"] and any(s and m == "1" for s, m in zip(is_spawn, mask))
+
+    def _advance(self, actions: np.ndarray) -> np.ndarray:
+        """One sim tick; True where the room's action was carried out."""
+        before = self.sim.creeps_spawned.copy()
+        self.sim.step(actions)
+        self.time += 1
+        return ~self.sim.tables["is_spawn"][actions] | (
+            self.sim.creeps_spawned > before
+        )
+
+    def tick(self) -> None:
+        with self.lock:
+            mem = self.memory
+            self._load_actions(mem.get("dqn_actions"))
+            obs = self.sim.observe()
+            creeps = self.sim.creep_count()
+            masks = ["".join("01"[int(v)] for v in m) for m in self.sim.action_mask()]
+            applied = mem.get("dqn_applied", 0)
+            names = mem.get("dqn_rooms")
+            batch = isinstance(names, list)
+            idx = [
+                self.rooms.index(r) if r in self.rooms else -1
+                for r in (names if batch else [mem.get("dqn_room")])
+            ]
+            if not batch and idx[0] < 0:
+                idx = [0]
+            actions = np.full(self.sim.n, self.wait_action, dtype=np.int64)
+
+            # decision interval: the pending action runs without Python
+            macro = None if batch else mem.get("dqn_macro")
+            if macro is not None and not self._due(macro, obs[idx[0]], masks[idx[0]]):
+                macro["trail"].append(obs[idx[0]].tolist())
+                if not macro["done"]:
+                    actions[idx[0]] = macro["id"]
+                    macro["done"] = bool(self._advance(actions)[idx[0]])
+                else:
+                    self._advance(actions)
+                return
+            mem.pop("dqn_macro", None)
+
+            step = {
+                "seq": applied,
+                "tick": self.time,
+                "obs": [obs[i].tolist() if i >= 0 else [0, 0, 0, 1, 0] for i in idx],
+                "creeps": [int(creeps[i]) if i >= 0 else 0 for i in idx],
+                "mask": [masks[i] if i >= 0 else "" for i in idx],
+            }
+            if batch:
+                mem["dqn_batch"] = step
+            else:
+                mem["dqn_step"] = {
+                    **step,
+                    "obs": step["obs"][0],
+                    "creeps": step["creeps"][0],
+                    "mask": step["mask"][0],
+                    "trail": macro["trail"] if macro else [],
+                }
+                mem["dqn_ctrl_level"] = int(obs[idx[0], 3])
+
+            cmd = mem.get("dqn_action")
+            new_cmd = isinstance(cmd, dict) and cmd.get("seq") != applied
+            if new_cmd:
+                ids = cmd.get("id") if batch else [cmd.get("id")]
+                for i, a in zip(idx, ids if isinstance(ids, list) else []):
+                    if (
+                        i >= 0
+                        and isinstance(a, int)
+                        and 0 <= a < len(self.sim.tables["cost"])
+                    ):
+                        actions[i] = a
+                mem["dqn_applied"] = cmd.get("seq")
+            done = self._advance(actions)
+            if new_cmd and not batch and mem.get("dqn_skip", 1) > 1:
+                mem["dqn_macro"] = {
+                    "id": int(actions[idx[0]]),
+                    "at": self.time - 1,
+                    "level": int(obs[idx[0], 3]),
+                    "done": bool(done[idx[0]]),
+                    "trail": [],
+                }
+
+    def room_overview(self, room: str) -> Dict[str, Any]:
+        with self.lock:
+            i = self.rooms.index(room)
+            return {
+                "ok": 1,
+                "owner": {"username": self.username, "badge": {}},
+                "stats": {},
+                "statsMax": {},
+                "totals": {
+                    "creepsProduced": int(self.sim.creeps_spawned[i]),
+                    "energyControl": float(self.sim.progress[i]),
+                },
+            }
+
+
+class MockResetter:
+    """Same interface as reset.RoomResetter, resets the simulated rooms."""
+
+    cli = None
+
+    def __init__(self, game: MockGame):
+        self.game = game
+
+    def reset(self, room: str = "W7N7"):
+        self.game.reset_rooms([room])
+        return []
+
+    def reset_rooms(self, rooms: List[str]):
+        self.game.reset_rooms(rooms)
+        return []
+
+    def close(self) -> None:
+        pass
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive, like the real server
+
+    server: "MockScreepsServer"
+
+    def log_message(self, *args) -> None:
+        pass
+
+    def _reply(self, body: Dict[str, Any], status: int = 200) -> None:
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.send_header("X-Token", TOKEN)
+        self.end_headers()
+        self.wfile.write(data)
+        self.server.count(len(data), out=True)
+
+    def _dispatch(self, method: str) -> None:
+        url = urlparse(self.path)
+        q = {k: v[0] for k, v in parse_qs(url.query).items()}
+        body: Dict[str, Any] = {}
+        n = int(self.headers.get("Content-Length") or 0)
+        if n:
+            body = json.loads(self.rfile.read(n))
+        self.server.count(n + len(self.path), out=False)
+        self.server.lag()
+        start = time.perf_counter()
+
+        route = (method, url.path)
+        if (
+            route != ("POST", "/api/auth/signin")
+            and self.headers.get("X-Token") != TOKEN
+        ):
+            reply, status = {"error": "unauthorized"}, 401
+        else:
+            reply, status = self._route(route, q, body, self.server.game), 200
+            if reply is None:
+                reply, status = {"error": "not found"}, 404
+        self.server.server_s += time.perf_counter() - start
+        self._reply(reply, status)
+
+    def _route(self, route, q, body, game: MockGame) -> Dict[str, Any] | None:
+        with game.lock:
+            if route == ("POST", "/api/auth/signin"):
+                return {"ok": 1, "token": TOKEN}
+            if route == ("GET", "/api/auth/me"):
+                return {
+                    "ok": 1,
+                    "_id": USER_ID,
+                    "username": game.username,
+                    "cpu": 100,
+                    "gcl": 1,
+                }
+            if route == ("GET", "/api/user/rooms"):
+                return {"ok": 1, "shards": {"shard0": list(game.rooms)}}
+            if route == ("GET", "/api/game/time"):
+                return {"ok": 1, "time": game.time}
+            if route == ("GET", "/api/game/room-overview"):
+                return game.room_overview(q.get("room", game.rooms[0]))
+            if route == ("GET", "/api/user/memory"):
+                return {"ok": 1, "data": _gz(_get_path(game.memory, q.get("path", "")))}
+            if route == ("POST", "/api/user/memory"):
+                _set_path(game.memory, body["path"], body.get("value"))
+                return {"ok": 1}
+            if route == ("POST", "/api/user/console"):
+                game.console_log.append(body.get("expression", ""))
+                return {"ok": 1, "result": {"ok": 1, "n": 1}}
+            if route == ("GET", "/api/user/memory-segment"):
+                return {"ok": 1, "data": game.segments.get(int(q["segment"]))}
+            if route == ("POST", "/api/user/memory-segment"):
+                game.segments[int(body["segment"])] = body["data"]
+                return {"ok": 1}
+        return None
+
+    def do_GET(self) -> None:
+        self._dispatch("GET")
+
+    def do_POST(self) -> None:
+        self._dispatch("POST")
+
+
+class MockScreepsServer(ThreadingHTTPServer):
+    """HTTP server on 127.0.0.1 serving a MockGame.
+
+    `latency` (seconds, plus uniform `jitter`) is added to every request.
+    `tick_ms` runs the game clock like the server `tickRate`; with
+    `tick_ms=None` the caller ticks by hand (`game.tick()`). `requests`,
+    `bytes_in`, `bytes_out` and `server_s` (handler time, latency excluded)
+    separate client overhead from server time.
+    """
+
+    daemon_threads = True
+
+    def __init__(
+        self,
+        port: int = 0,
+        game: MockGame | None = None,
+        latency: float = 0.0,
+        jitter: float = 0.0,
+        tick_ms: float | None = 100.0,
+    ):
+        super().__init__(("127.0.0.1", port), _Handler)
+        self.game = game or MockGame()
+        self.latency = latency
+        self.jitter = jitter
+        self.tick_ms = tick_ms
+        self.requests = 0
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.server_s = 0.0
+        self._stats_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._rng = np.random.default_rng()
+
+    @property
+    def host(self) -> str:
+        return f"127.0.0.1:{self.server_address[1]}"
+
+    def count(self, n: int, out: bool) -> None:
+        with self._stats_lock:
+            if out:
+                self.bytes_out += n
+            else:
+                self.requests += 1
+                self.bytes_in += n
+
+    def lag(self) -> None:
+        delay = self.latency + (self._rng.uniform(0, self.jitter) if self.jitter else 0)
+        if delay > 0:
+            time.sleep(delay)
+
+    def resetter(self) -> MockResetter:
+        return MockResetter(self.game)
+
+    def _clock(self) -> None:
+        while not self._stop.wait(self.tick_ms / 1000):
+            self.game.tick()
+
+    def start(self) -> "MockScreepsServer":
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        if self.tick_ms is not None:
+            threading.Thread(target=self._clock, daemon=True).start()
+        return self
+
+    def stop(self) -> None:
+        self._stop.set()
+        self.shutdown()
+        self.server_close()
+
+
+def smoke(steps: int = 50) -> None:
+    import ScreepsSpawnEnv as live
+    from ScreepsSpawnEnv import ScreepsSpawnEnv
+
+    live.DEBUG_RCL = False
+
+    server = MockScreepsServer(tick_ms=10).start()
+    env = ScreepsSpawnEnv(
+        user="dqn",
+        password="dqn",
+        host=server.host,
+        secure=False,
+        shard="shard0",
+        resetter=server.resetter(),
+    )
+    try:
+        obs, info = env.reset()
+        start = time.perf_counter()
+        for _ in range(steps):
+            obs, reward, terminated, truncated, info = env.step(
+                env.action_space.sample()
+            )
+            if terminated:
+                env.reset()
+        elapsed = time.perf_counter() - start
+    finally:
+        env.close()
+        server.stop()
+    print(
+        f"✅ {steps} steps in {elapsed:.2f}s, {server.requests} requests, "
+        f"server {1000 * server.server_s / max(server.requests, 1):.2f} ms/request, last obs {obs}"
+    )
+
+
+if __name__ == "__main__":
+    import sys
+
+    args = sys.argv[1:]
+    if args and args[0] == "--smoke":
+        smoke(int(args[1]) if len(args) > 1 else 50)
+    else:
+        srv = MockScreepsServer(int(args[0]) if args else 21025).start()
+        print(f"🧪 mock Screeps server on {srv.host}")
+        try:
+            threading.Event().wait()
+        except KeyboardInterrupt:
+            srv.stop()
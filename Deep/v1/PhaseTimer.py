@@ -0,0 +1,42 @@
+from __future__ import annotations
+import time
+from typing import Dict
+
+
+class PhaseTimer:
+    """Cheap per-step profiler of the env hot path.
+
+        with self._timer("read"):
+            ...
+
+    adds the elapsed seconds to `phases["read"]`; `count(name)` bumps a
+    counter. `pop()` returns the phases of the step and clears them, counters
+    are cumulative for the life of the env.
+    """
+
+    __slots__ = ("phases", "counters", "_name", "_t0")
+
+    def __init__(self):
+        self.phases: Dict[str, float] = {}
+        self.counters: Dict[str, int] = {}
+        self._name = ""
+        self._t0 = 0.0
+
+    def __call__(self, name: str) -> "PhaseTimer":
+        self._name = name
+        return self
+
+    def __enter__(self) -> "PhaseTimer":
+        self._t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        dt = time.perf_counter() - self._t0
+        self.phases[self._name] = self.phases.get(self._name, 0.0) + dt
+
+    def count(self, name: str, n: int = 1) -> None:
+        self.counters[name] = self.counters.get(name, 0) + n
+
+    def pop(self) -> Dict[str, float]:
+        phases, self.phases = self.phases, {}
+        return phases
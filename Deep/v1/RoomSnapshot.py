@@ -0,0 +1,153 @@
+from __future__ import annotations
+import gzip
+import json
+import os
+from typing import Any, Dict, List
+
+from ScreepsCLI import ScreepsCLI
+
+# users fields that matter for the spawn economy
+USER_FIELDS = ["cpu", "cpuAvailable", "gcl"]
+
+# absolute Game.time fields, shifted on restore so timers keep their meaning
+TIME_FIELDS = [
+    "ageTime",
+    "cooldownTime",
+    "decayTime",
+    "downgradeTime",
+    "nextDecayTime",
+    "nextRegenerationTime",
+    "safeMode",
+    "safeModeCooldown",
+    "upgradeBlocked",
+]
+
+SERVER_KEY = "dqn_snapshot:"  # server-side copy, so restores send only a name
+CHUNK = 3000  # keeps every cli line short enough for a terminal channel
+
+
+class SnapshotStore:
+    """Exact room snapshots: capture once, restore in one bulk operation.
+
+    A snapshot holds every `rooms.objects` document of the room (sources,
+    ruins, tombstones and dropped energy included), the user's Memory and
+    USER_FIELDS. It is written gzipped to `directory/<name>.json.gz` and kept
+    in the server env under SERVER_KEY so `restore()` is a single short cli
+    call: remove + insert through `bulk`, Memory and user fields set, absolute
+    timers rebased on the current tick.
+
+    Memory is per user, not per room: a restore replaces the whole Memory of
+    the user (except the live `dqn_*` keys), so snapshots are meant for a
+    user owning only the snapshot's room.
+    """
+
+    def __init__(self, cli: ScreepsCLI, directory: str = "snapshots"):
+        self.cli = cli
+        self.directory = directory
+
+    def path(self, name: str) -> str:
+        return os.path.join(self.directory, f"{name}.json.gz")
+
+    def capture(self, name: str, room: str, username: str | None = None) -> Dict[str, Any]:
+        key = json.dumps(SERVER_KEY + name)
+        lower = json.dumps(username.lower() if username else None)
+        snap = self.cli.eval(
+            f"""(async () => {{
+                const db = storage.db, env = storage.env;
+                const u = {lower} ? await db.users.findOne({{ usernameLower: {lower} }}) : null;
+                const snap = {{
+                    room: {json.dumps(room)},
+                    user: u ? u._id : null,
+                    gameTime: +(await env.get(env.keys.GAMETIME)),
+                    objects: await db["rooms.objects"].find({{ room: {json.dumps(room)} }}),
+                    memory: u ? await env.get(env.keys.MEMORY + u._id) : null,
+                    fields: u ? Object.fromEntries({json.dumps(USER_FIELDS)}.map((f) => [f, u[f]])) : null,
+                }};
+                await env.set({key}, JSON.stringify(snap));
+                return snap;
+            }})()"""
+        )
+        os.makedirs(self.directory, exist_ok=True)
+        with gzip.open(self.path(name), "wt", encoding="utf-8") as f:
+            json.dump(snap, f, separators=(",", ":"))
+        return snap
+
+    def load(self, name: str) -> Dict[str, Any]:
+        with gzip.open(self.path(name), "rt", encoding="utf-8") as f:
+            return json.load(f)
+
+    def stage(self, name: str) -> None:
+        """Uploads a snapshot from disk to the server (e.g. a fresh server)."""
+        text = json.dumps(self.load(name), separators=(",", ":"))
+        key = json.dumps(SERVER_KEY + name)
+        self.cli.eval(f"storage.env.set({key}, '')")
+        for i in range(0, len(text), CHUNK):
+            chunk = json.dumps(text[i : i + CHUNK])
+            self.cli.eval(
+                f"storage.env.get({key}).then((v) => storage.env.set({key}, (v || '') + {chunk}))"
+            )
+
+    def restore(self, name: str, staged: bool = False) -> int:
+        """Puts the room back in the captured state, returns the object count."""
+        key = json.dumps(SERVER_KEY + name)
+        count = self.cli.eval(
+            f"""(async () => {{
+                const db = storage.db, env = storage.env;
+                const raw = await env.get({key});
+                if (!raw) return -1;
+                const snap = JSON.parse(raw);
+                const delta = +(await env.get(env.keys.GAMETIME)) - snap.gameTime;
+                const shift = (o) => {{
+                    for (const f of {json.dumps(TIME_FIELDS)}) if (typeof o[f] === "number") o[f] += delta;
+                    if (o.spawning && typeof o.spawning.spawnTime === "number") o.spawning.spawnTime += delta;
+                    return o;
+                }};
+                const current = await db["rooms.objects"].find({{ room: snap.room }});
+                await db["rooms.objects"].bulk([
+                    ...current.map((o) => ({{ op: "remove", id: o._id }})),
+                    ...snap.objects.map((o) => ({{ op: "insert", data: shift(o) }})),
+                ]);
+                if (snap.user) {{
+                    const memKey = env.keys.MEMORY + snap.user;
+                    const now = JSON.parse((await env.get(memKey)) || "{{}}");
+                    const mem = JSON.parse(snap.memory || "{{}}");
+                    // the env protocol keys are always the live ones, never the captured ones
+                    for (const k in mem) if (k.startsWith("dqn_")) delete mem[k];
+                    for (const k in now) if (k.startsWith("dqn_")) mem[k] = now[k];
+                    await env.set(memKey, JSON.stringify(mem));
+                    if (snap.fields) await db.users.update({{ _id: snap.user }}, {{ $set: snap.fields }});
+                }}
+                return snap.objects.length;
+            }})()"""
+        )
+        if count < 0 and not staged:  # not on this server yet
+            self.stage(name)
+            return self.restore(name, staged=True)
+        return count
+
+    def names(self) -> List[str]:
+        if not os.path.isdir(self.directory):
+            return []
+        return sorted(f[: -len(".json.gz")] for f in os.listdir(self.directory) if f.endswith(".json.gz"))
+
+
+if __name__ == "__main__":
+    import sys
+    from reset import RoomResetter
+
+    usage = "usage: RoomSnapshot.py capture <name> [room] | restore <name> | list"
+    if len(sys.argv) < 2:
+        sys.exit(usage)
+    cmd, args = sys.argv[1], sys.argv[2:]
+    store = SnapshotStore(RoomResetter.from_env().cli)
+
+    if cmd == "capture" and args:
+        room = args[1] if len(args) > 1 else "W7N7"
+        snap = store.capture(args[0], room, os.getenv("USERNAME"))
+        print(f"📸 {args[0]}: {len(snap['objects'])} objects of {room} at tick {snap['gameTime']}")
+    elif cmd == "restore" and args:
+        print(f"♻️ {args[0]}: {store.restore(args[0])} objects restored")
+    elif cmd == "list":
+        print("\n".join(store.names()))
+    else:
+        sys.exit(usage)
@@ -0,0 +1,177 @@
+from __future__ import annotations
+import itertools
+import json
+import re
+import socket
+from typing import Any
+
+# `cli: port` of setup-server/config.yml
+CLI_PORT = 21026
+
+_RESULT = re.compile(r"@@(\d+)(ok|err) (.*?)\r?\n")
+
+
+class CLIError(RuntimeError):
+    pass
+
+
+class ScreepsCLI:
+    """Persistent connection to the private server CLI (screeps-launcher cli).
+
+    Each expression is wrapped so that its (awaited) result is printed after a
+    unique marker; `eval` returns once that marker comes back, so callers never
+    need to sleep for a command to complete. The transport is either a TCP
+    socket to the cli port or any socket-like channel (see `over_ssh`).
+
+    Advancing a paused server is not exact: the pause flag is only checked
+    when a tick starts, so a slow round trip can let the main loop run one
+    or more ticks past the target. `overshoot` sums those extra ticks.
+    """
+
+    def __init__(
+        self,
+        host: str | None = None,
+        port: int = CLI_PORT,
+        timeout: float = 30.0,
+        channel: Any = None,
+    ):
+        self.host = host
+        self.port = port
+        self.timeout = timeout
+        self._sock = channel  # needs sendall / recv / close
+        self._buf = ""
+        self._ids = itertools.count(1)
+        self.overshoot = 0  # ticks run past the target by advance / lockstep
+
+    def connect(self) -> "ScreepsCLI":
+        if self._sock is not None:
+            return self
+        self._sock = socket.create_connection((self.host, self.port), self.timeout)
+        self._sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        return self
+
+    @classmethod
+    def over_ssh(
+        cls,
+        ssh_client,
+        workdir: str = "Screepfinal",
+        timeout: float = 30.0,
+    ) -> "ScreepsCLI":
+        """Warm cli over an open paramiko client (docker compose exec … cli).
+
+        Returns once the cli answers, so no fixed sleep is needed for it to
+        start.
+        """
+        channel = ssh_client.invoke_shell()
+        channel.settimeout(timeout)
+        channel.send(
+            f"cd {workdir} && sudo docker compose exec screeps screeps-launcher cli\n"
+        )
+        cli = cls(timeout=timeout, channel=channel)
+        cli.eval("0")
+        return cli
+
+    def close(self) -> None:
+        if self._sock is not None:
+            self._sock.close()
+            self._sock = None
+
+    def eval(self, expr: str) -> Any:
+        """Runs a JS expression (promises are awaited) and returns its JSON value."""
+        if self._sock is None:
+            self.connect()
+        n = next(self._ids)
+        code = " ".join(line.strip() for line in expr.strip().splitlines())
+        # the marker is assembled at run time so a terminal echo never matches
+        wrapped = (
+            f"Promise.resolve().then(() => ({code}))"
+            f".then(r => print('@@' + {n} + 'ok ' + JSON.stringify(r === undefined ? null : r)),"
+            f" e => print('@@' + {n} + 'err ' + JSON.stringify(String(e))))"
+        )
+        self._sock.sendall((wrapped + "\n").encode("utf-8"))
+
+        while True:
+            for m in _RESULT.finditer(self._buf):
+                if int(m.group(1)) == n:
+                    self._buf = self._buf[m.end() :]
+                    value = json.loads(m.group(3))
+                    if m.group(2) == "err":
+                        raise CLIError(value)
+                    return value
+            chunk = self._sock.recv(65536)
+            if not chunk:
+                raise CLIError("CLI connection closed")
+            self._buf += chunk.decode("utf-8", errors="replace")
+
+    # System helpers
+    def pause(self) -> None:
+        self.eval("system.pauseSimulation()")
+
+    def resume(self) -> None:
+        self.eval("system.resumeSimulation()")
+
+    def get_tick_rate(self) -> int:
+        return int(self.eval("system.getTickRate()"))
+
+    def set_tick_rate(self, ms: int) -> None:
+        self.eval(f"system.setTickRate({int(ms)})")
+
+    def game_time(self) -> int:
+        return int(self.eval("storage.env.get(storage.env.keys.GAMETIME)"))
+
+    def advance(self, ticks: int = 1) -> int:
+        """Lets a paused server run `ticks` ticks (or more), returns Game.time."""
+        start, now = self.eval(
+            f"""(async () => {{
+                const env = storage.env;
+                const start = +(await env.get(env.keys.GAMETIME));
+                return [start, await {_advance_js(ticks)}];
+            }})()"""
+        )
+        self.overshoot += max(0, int(now) - int(start) - int(ticks))
+        return int(now)
+
+    def lockstep(
+        self, user_id: str, seq: int, max_ticks: int = 4, key: str = "dqn_step"
+    ) -> dict:
+        """Advances a paused server until `Memory[key].seq == seq`.
+
+        Memory is read straight from storage, so the action ack and the
+        observation come back in the same CLI round trip. Each tick can
+        overshoot like `advance`, then the step is from a later tick.
+        """
+        step, ran, start, now = self.eval(
+            f"""(async () => {{
+                const env = storage.env;
+                const read = async () => (JSON.parse((await env.get(env.keys.MEMORY + {json.dumps(user_id)})) || "{{}}")[{json.dumps(key)}]) || {{}};
+                const start = +(await env.get(env.keys.GAMETIME));
+                let step = await read(), i = 0, t = start;
+                for (; i < {int(max_ticks)} && step.seq !== {int(seq)}; i++) {{
+                    t = await {_advance_js(1)};
+                    step = await read();
+                }}
+                return [step, i, start, t];
+            }})()"""
+        )
+        self.overshoot += max(0, int(now) - int(start) - int(ran))
+        return step
+
+
+def _advance_js(ticks: int) -> str:
+    # the main loop checks the pause flag when a tick starts: resume, wait for
+    # gameTime to move, pause again before the next one begins
+    return f"""(async () => {{
+        const env = storage.env;
+        const nap = () => new Promise((r) => (typeof setTimeout === "function" ? setTimeout(r, 1) : r()));
+        let t = +(await env.get(env.keys.GAMETIME));
+        for (let i = 0; i < {int(ticks)}; i++) {{
+            const t0 = t;
+            await system.resumeSimulation();
+            for (let n = 0; n < 1e5 && t === t0; n++) {{
+                await nap();
+                t = +(await env.get(env.keys.GAMETIME));
+            }}
+            await system.pauseSimulation();
+        }}
+        return t;
+    }})()"""
@@ -1,17 +1,71 @@
+from collections import defaultdict, deque
+
+import numpy as np
+import torch as th
 from stable_baselines3.common.callbacks import BaseCallback
 
+# histograms only go to TensorBoard
+TB_ONLY = ("stdout", "log", "json", "csv")
+
 
 class ScreepsMetricsCallback(BaseCallback):
+    """Episode metrics plus rolling profiles of the env hot path.
+
+    `info["phases"]` (seconds per phase of the step, see PhaseTimer) is kept
+    over the last `window` steps; every `log_every` steps the mean/p95 of each
+    phase and of the whole step are logged, with a TensorBoard histogram,
+    together with the env counters (API errors, fallback observations...).
+    """
+
+    def __init__(self, window: int = 1000, log_every: int = 100, verbose: int = 0):
+        super().__init__(verbose)
+        self.window = window
+        self.log_every = log_every
+        self._phases = defaultdict(lambda: deque(maxlen=self.window))
+        self._counters = {}  # env index -> its latest counters
+
     def _on_step(self) -> bool:
         wrote = False
-        for info in self.locals["infos"]:
+        seen = set()
+        for i, info in enumerate(self.locals["infos"]):
             if "creeps_until_lvl2" in info:
                 self.logger.record("screeps/creeps_to_RCL2", info["creeps_until_lvl2"])
                 wrote = True
             if "ticks_until_lvl2" in info:
                 self.logger.record("screeps/ticks_to_RCL2", info["ticks_until_lvl2"])
                 wrote = True
+
+            phases = info.get("phases")
+            if phases is not None and id(phases) not in seen:  # batched envs share it
+                seen.add(id(phases))
+                for name, dt in phases.items():
+                    self._phases[name].append(1000 * dt)
+                self._phases["total"].append(1000 * sum(phases.values()))
+            counters = info.get("counters")
+            if counters is not None and id(counters) not in seen:
+                seen.add(id(counters))
+                self._counters[i] = counters  # cumulative, latest per env
+
+        if self.n_calls % self.log_every == 0 and self._phases:
+            self._record_profile()
+            wrote = True
         if wrote:
             # flush in event-file visible in TensorBoard
             self.logger.dump(self.num_timesteps)
         return True
+
+    def _record_profile(self) -> None:
+        for name, values in self._phases.items():
+            ms = np.fromiter(values, dtype=np.float64)
+            self.logger.record(f"perf/{name}_ms", float(ms.mean()))
+            self.logger.record(f"perf/{name}_p95_ms", float(np.percentile(ms, 95)))
+            self.logger.record(
+                f"perf_hist/{name}_ms", th.as_tensor(ms), exclude=TB_ONLY
+            )
+
+        totals = defaultdict(int)
+        for counters in self._counters.values():
+            for name, n in counters.items():
+                totals[name] += n
+        for name, n in totals.items():
+            self.logger.record(f"perf/{name}", n)
@@ -0,0 +1,464 @@
+from __future__ import annotations
+from dataclasses import dataclass, fields
+from typing import List, Dict, Any, Sequence, Tuple
+
+import gymnasium as gym
+from gymnasium import spaces
+import numpy as np
+from stable_baselines3.common.vec_env import VecEnv
+
+from ScreepsSpawnEnv import ACTIONS, PART_COST, PARTS, ROLES, ScreepsSpawnEnv
+
+#  GAME CONSTANTS (RCL1 -> RCL2 economy)
+BODYPART_COST = PART_COST
+CREEP_SPAWN_TIME = 3  # ticks per body part
+CREEP_LIFE_TIME = 1500
+HARVEST_POWER = 2  # energy per WORK per tick
+UPGRADE_CONTROLLER_POWER = 1  # progress per WORK per tick
+CARRY_CAPACITY = 50
+SPAWN_ENERGY_CAPACITY = 300
+SPAWN_MIN_ENERGY = 200  # same guard as the JS spawn command
+SOURCE_RATE = 10  # 3000 energy / 300 ticks regeneration
+CONTROLLER_LEVELS = np.array([np.inf, 200, 45000, np.inf])  # indexed by RCL
+MAX_CREEPS = 64  # creep slots per simulated room
+
+
+@dataclass
+class SimParams:
+    """Calibratable part of the economy model.
+
+    Every field may be a scalar or an array with one value per room, so a
+    whole grid of candidates can be simulated in a single batch.
+    """
+
+    harvest_trip: float = 12.0  # ticks source -> spawn -> source
+    upgrade_trip: float = 16.0  # ticks spawn -> controller -> spawn
+    efficiency: float = 1.0  # fraction of the ideal throughput reached
+    sources: float = 2.0  # energy sources in the room
+    noise: float = 0.0  # relative std of per-creep throughput
+
+    def broadcast(self, n: int) -> Dict[str, np.ndarray]:
+        return {
+            f.name: np.broadcast_to(
+                np.asarray(getattr(self, f.name), dtype=np.float64), (n,)
+            ).copy()
+            for f in fields(self)
+        }
+
+
+# Per-action lookup tables
+def action_tables(actions: Sequence[Dict[str, Any]]) -> Dict[str, np.ndarray]:
+    is_spawn = np.array([a["type"] == "SPAWN" for a in actions])
+    role = np.array(
+        [ROLES.index(a["role"]) if a["type"] == "SPAWN" else -1 for a in actions],
+        dtype=np.int8,
+    )
+    counts = np.array(
+        [
+            (
+                a.get("counts") or [a["body"].count(p) for p in PARTS]
+                if a["type"] == "SPAWN"
+                else [0] * 3
+            )
+            for a in actions
+        ],
+        dtype=np.int64,
+    )
+    cost = counts @ np.array([BODYPART_COST[p] for p in PARTS])
+    return {"is_spawn": is_spawn, "role": role, "counts": counts, "cost": cost}
+
+
+#  VECTORIZED SIMULATOR
+class SpawnEconomySim:
+    """Fluid model of N independent rooms climbing from RCL1 to RCL2.
+
+    Harvesters bring energy back to the spawn at a rate set by their WORK and
+    CARRY parts and the round trip, upgraders pull it out of the spawn and turn
+    it into controller progress. Creeps missing WORK, CARRY or MOVE are
+    suicided by `main.js` as soon as they leave the spawn, so here they only
+    cost energy and spawn time.
+    """
+
+    def __init__(
+        self,
+        n_rooms: int = 1,
+        params: SimParams | None = None,
+        actions: Sequence[Dict[str, Any]] = ACTIONS,
+        max_creeps: int = MAX_CREEPS,
+        seed: int | None = None,
+    ):
+        self.n = n_rooms
+        self.c = max_creeps
+        self.params = params or SimParams()
+        self.tables = action_tables(actions)
+        self.rng = np.random.default_rng(seed)
+
+        self._p = self.params.broadcast(n_rooms)
+        n, c = self.n, self.c
+        self.tick = np.zeros(n, dtype=np.int64)
+        self.energy = np.zeros(n)
+        self.progress = np.zeros(n)
+        self.level = np.ones(n, dtype=np.int64)
+        self.spawn_free_at = np.zeros(n, dtype=np.int64)
+        self.creeps_spawned = np.zeros(n, dtype=np.int64)
+
+        # creep slots, role == -1 means empty
+        self.role = np.full((n, c), -1, dtype=np.int8)
+        self.work = np.zeros((n, c))
+        self.rate = np.zeros((n, c))  # energy per tick once active
+        self.active_from = np.zeros((n, c), dtype=np.int64)
+        self.dies_at = np.zeros((n, c), dtype=np.int64)
+        self.reset()
+
+    def reset(self, mask: np.ndarray | None = None) -> np.ndarray:
+        """Resets the rooms selected by `mask` (all by default) like reset.py."""
+        m = np.ones(self.n, dtype=bool) if mask is None else np.asarray(mask)
+        self.tick[m] = 0
+        self.energy[m] = SPAWN_ENERGY_CAPACITY
+        self.progress[m] = 0
+        self.level[m] = 1
+        self.spawn_free_at[m] = 0
+        self.creeps_spawned[m] = 0
+        self.role[m] = -1
+        self.work[m] = 0
+        self.rate[m] = 0
+        return self.observe()
+
+    # Throughput of freshly spawned creeps (vectorized over rooms)
+    def _creep_rate(self, rooms, role, counts) -> Tuple[np.ndarray, np.ndarray]:
+        p = {k: v[rooms] for k, v in self._p.items()}
+        w, c, m = counts[:, 0], counts[:, 1], np.maximum(counts[:, 2], 1)
+        cap = CARRY_CAPACITY * c
+        slow = np.maximum(1.0, (w + c) / m)  # ticks per tile when loaded
+
+        fill = cap / np.maximum(HARVEST_POWER * w, 1)
+        harvest = cap / (fill + p["harvest_trip"] * slow)
+        drain = cap / np.maximum(UPGRADE_CONTROLLER_POWER * w, 1)
+        upgrade = cap / (drain + p["upgrade_trip"] * slow)
+
+        rate = np.where(role == 0, harvest, upgrade) * p["efficiency"]
+        if np.any(p["noise"] > 0):
+            rate *= np.clip(1 + p["noise"] * self.rng.standard_normal(len(rooms)), 0, None)
+        warmup = 0.5 * np.where(role == 0, fill + p["harvest_trip"], p["upgrade_trip"])
+        return rate, np.ceil(warmup * slow).astype(np.int64)
+
+    def step(self, actions: np.ndarray) -> np.ndarray:
+        """Applies one action per room, then advances every room by one tick."""
+        a = np.asarray(actions, dtype=np.int64)
+        t = self.tables
+
+        # SPAWN (idle spawn, energy guard of the JS command, free slot)
+        cost = t["cost"][a]
+        free_slot = self.role < 0
+        can = (
+            t["is_spawn"][a]
+            & (self.tick >= self.spawn_free_at)
+            & (self.energy >= np.maximum(SPAWN_MIN_ENERGY, cost))
+            & free_slot.any(axis=1)
+        )
+        rooms = np.flatnonzero(can)
+        if rooms.size:
+            slots = free_slot[rooms].argmax(axis=1)
+            counts = t["counts"][a[rooms]]
+            role = t["role"][a[rooms]]
+            done = self.tick[rooms] + CREEP_SPAWN_TIME * counts.sum(axis=1)
+            viable = counts.min(axis=1) > 0
+            rate, warmup = self._creep_rate(rooms, role, counts)
+
+            self.energy[rooms] -= cost[rooms]
+            self.spawn_free_at[rooms] = done
+            self.creeps_spawned[rooms] += 1
+            self.role[rooms, slots] = role
+            self.work[rooms, slots] = counts[:, 0]
+            self.rate[rooms, slots] = np.where(viable, rate, 0)
+            self.active_from[rooms, slots] = done + warmup
+            self.dies_at[rooms, slots] = np.where(viable, done + CREEP_LIFE_TIME, done + 1)
+
+        # ECONOMY
+        active = (self.role >= 0) & (self.tick[:, None] >= self.active_from)
+        harvested = np.where(active & (self.role == 0), self.rate, 0).sum(axis=1)
+        harvested = np.minimum(harvested, SOURCE_RATE * self._p["sources"])
+        regen = (self.energy < SPAWN_ENERGY_CAPACITY).astype(np.float64)
+        self.energy = np.minimum(self.energy + harvested + regen, SPAWN_ENERGY_CAPACITY)
+
+        demand = np.where(active & (self.role == 1), self.rate, 0).sum(axis=1)
+        used = np.minimum(self.energy, demand)
+        self.energy -= used
+        self.progress += used * UPGRADE_CONTROLLER_POWER
+
+        total = CONTROLLER_LEVELS[np.minimum(self.level, len(CONTROLLER_LEVELS) - 1)]
+        up = self.progress >= total
+        self.level[up] += 1
+        self.progress[up] -= total[up]
+
+        self.tick += 1
+        self.role[self.tick[:, None] >= self.dies_at] = -1
+        return self.observe()
+
+    def action_mask(self) -> np.ndarray:
+        """(n_rooms, n_actions) actions `step` would carry out now (dqnMask)."""
+        t = self.tables
+        ready = (self.tick >= self.spawn_free_at) & (self.role < 0).any(axis=1)
+        afford = self.energy[:, None] >= np.maximum(SPAWN_MIN_ENERGY, t["cost"])
+        return ~t["is_spawn"] | (ready[:, None] & afford)
+
+    def creep_count(self) -> np.ndarray:
+        return (self.role >= 0).sum(axis=1)
+
+    def observe(self) -> np.ndarray:
+        """(N, 5) observation, same layout as `dqn_state`."""
+        alive = self.role >= 0
+        return np.stack(
+            [
+                (self.energy >= SPAWN_MIN_ENERGY).astype(np.float64),
+                np.where(alive & (self.role == 0), self.work, 0).sum(axis=1),
+                np.where(alive & (self.role == 1), self.work, 0).sum(axis=1),
+                self.level,
+                np.floor(self.progress / 100),
+            ],
+            axis=1,
+        ).astype(np.float32)
+
+
+#  GYM WRAPPERS
+class ScreepsSimEnv(gym.Env):
+    """Offline drop-in for ScreepsSpawnEnv (same spaces, actions and reward)."""
+
+    metadata = {"render_modes": ["human"]}
+
+    _compute_reward = ScreepsSpawnEnv._compute_reward
+
+    def __init__(
+        self,
+        params: SimParams | None = None,
+        render_mode: str | None = None,
+        actions: List[Dict[str, Any]] | None = None,
+        decision_interval: int = 1,
+    ):
+        super().__init__()
+        self.params = params
+        self.render_mode = render_mode
+        self.actions = actions or ACTIONS
+        self.wait_action = len(self.actions) - 1
+        self.decision_interval = max(1, int(decision_interval))  # see dqnDue
+
+        self.action_space = spaces.Discrete(len(self.actions))
+        low = np.array([0, 0, 0, 1, 0], dtype=np.float32)
+        high = np.array([1, 50, 50, 8, 500], dtype=np.float32)
+        self.observation_space = spaces.Box(low, high, dtype=np.float32)
+
+        self.sim = SpawnEconomySim(1, params, self.actions)
+        self._prev_state: np.ndarray | None = None
+        self._tick = 0
+        self._first_spawn_tick = None
+        self._creeps_seen = 0
+
+    def reset(self, *, seed=None, options=None):
+        super().reset(seed=seed)
+        if seed is not None:
+            self.sim.rng = np.random.default_rng(seed)
+
+        self._tick = 0
+        self._first_spawn_tick = None
+        self._creeps_seen = 0
+
+        obs = self.sim.reset()[0]
+        self._prev_state = obs.copy()
+        return obs, {"action_mask": self.action_masks()}
+
+    def step(self, action: int):
+        act_obj = self.actions[action]
+        obs, trail = self._run(action)
+
+        self._tick += len(trail) + 1
+        creep_cnt = int(self.sim.creep_count()[0])
+        if self._first_spawn_tick is None and creep_cnt > 0:
+            self._first_spawn_tick = self._tick
+        self._creeps_seen = creep_cnt
+
+        states = [self._prev_state, *trail, obs]
+        wait = self.actions[self.wait_action]
+        reward = sum(
+            self._compute_reward(s, s_next, act_obj if i == 0 else wait)
+            for i, (s, s_next) in enumerate(zip(states, states[1:]))
+        )
+        self._prev_state = obs.copy()
+
+        terminated = bool(obs[3] >= 2)
+        info = {"action_mask": self.action_masks(), "ticks": len(trail) + 1}
+        if terminated:
+            info["creeps_until_lvl2"] = self._creeps_seen
+            info["ticks_until_lvl2"] = self._tick - self._first_spawn_tick
+
+        return obs, reward, terminated, False, info
+
+    def _run(self, action: int) -> Tuple[np.ndarray, List[np.ndarray]]:
+        """Ticks until the next decision, like main.js with Memory.dqn_skip.
+
+        The action is retried until carried out; returns the state of the
+        decision point and those of the ticks before it.
+        """
+        is_spawn = self.sim.tables["is_spawn"]
+        level = self.sim.level[0]
+        trail: List[np.ndarray] = []
+        done = False
+        while True:
+            spawned = self.sim.creeps_spawned[0]
+            obs = self.sim.step(np.array([self.wait_action if done else action]))[0]
+            done = done or not is_spawn[action] or self.sim.creeps_spawned[0] > spawned
+            due = (
+                len(trail) + 1 >= self.decision_interval
+                or self.sim.level[0] != level
+                or (done and self.action_masks()[is_spawn].any())
+            )
+            if due:
+                return obs, trail
+            trail.append(obs)
+
+    def action_masks(self) -> np.ndarray:
+        return self.sim.action_mask()[0]
+
+    def render(self) -> None:
+        if self.render_mode != "human":
+            return
+        s = self.sim.observe()[0]
+        print(
+            f"E:{int(s[0])} | H:{int(s[1])} | U:{int(s[2])} | RCL:{int(s[3])} | prog:{int(s[4])}"
+        )
+
+
+class ScreepsSimVecEnv(VecEnv):
+    """N simulated rooms stepped as one NumPy batch (stable-baselines3 VecEnv)."""
+
+    def __init__(
+        self,
+        n_envs: int,
+        params: SimParams | None = None,
+        max_episode_steps: int | None = None,
+        seed: int | None = None,
+        actions: List[Dict[str, Any]] | None = None,
+    ):
+        env = ScreepsSimEnv(actions=actions)
+        super().__init__(n_envs, env.observation_space, env.action_space)
+        self.actions = env.actions
+        self.sim = SpawnEconomySim(n_envs, params, self.actions, seed=seed)
+        self.max_episode_steps = max_episode_steps
+        self._actions = np.zeros(n_envs, dtype=np.int64)
+        self._prev = self.sim.observe()
+        self._first_spawn = np.full(n_envs, -1, dtype=np.int64)
+
+    def reset(self) -> np.ndarray:
+        self._prev = self.sim.reset()
+        self._first_spawn[:] = -1
+        self.reset_infos = [{"action_mask": m} for m in self.sim.action_mask()]
+        return self._prev.copy()
+
+    def step_async(self, actions: np.ndarray) -> None:
+        self._actions = np.asarray(actions, dtype=np.int64).reshape(self.num_envs)
+
+    def step_wait(self):
+        obs = self.sim.step(self._actions)
+        rewards = np.array(
+            [
+                ScreepsSpawnEnv._compute_reward(
+                    None, self._prev[i], obs[i], self.actions[a]
+                )
+                for i, a in enumerate(self._actions)
+            ],
+            dtype=np.float32,
+        )
+        creeps = self.sim.creep_count()
+        ticks = self.sim.tick
+        self._first_spawn = np.where(
+            (self._first_spawn < 0) & (creeps > 0), ticks, self._first_spawn
+        )
+
+        terminated = obs[:, 3] >= 2
+        truncated = np.zeros(self.num_envs, dtype=bool)
+        if self.max_episode_steps is not None:
+            truncated = ~terminated & (ticks >= self.max_episode_steps)
+        dones = terminated | truncated
+
+        infos: List[Dict[str, Any]] = [{} for _ in range(self.num_envs)]
+        for i in np.flatnonzero(dones):
+            if terminated[i]:
+                infos[i]["creeps_until_lvl2"] = int(creeps[i])
+                infos[i]["ticks_until_lvl2"] = int(ticks[i] - self._first_spawn[i])
+            infos[i]["TimeLimit.truncated"] = bool(truncated[i])
+            infos[i]["terminal_observation"] = obs[i].copy()
+
+        if dones.any():
+            obs[dones] = self.sim.reset(dones)[dones]
+            self._first_spawn[dones] = -1
+        masks = self.sim.action_mask()
+        for i, info in enumerate(infos):
+            info["action_mask"] = masks[i]
+        for i in np.flatnonzero(dones):
+            self.reset_infos[i] = {"action_mask": masks[i]}
+        self._prev = obs.copy()
+        return obs, rewards, dones, infos
+
+    def action_masks(self) -> np.ndarray:
+        return self.sim.action_mask()
+
+    def close(self) -> None:
+        pass
+
+    def get_attr(self, attr_name, indices=None):
+        return [getattr(self, attr_name) for _ in self._get_indices(indices)]
+
+    def set_attr(self, attr_name, value, indices=None) -> None:
+        setattr(self, attr_name, value)
+
+    def env_method(self, method_name, *method_args, indices=None, **method_kwargs):
+        return [
+            getattr(self, method_name)(*method_args, **method_kwargs)
+            for _ in self._get_indices(indices)
+        ]
+
+    def env_is_wrapped(self, wrapper_class, indices=None) -> List[bool]:
+        return [False for _ in self._get_indices(indices)]
+
+
+#  CALIBRATION
+def calibrate(
+    actions: np.ndarray,
+    observations: np.ndarray,
+    grid: Dict[str, Sequence[float]] | None = None,
+) -> SimParams:
+    """Fits SimParams to a recorded live episode by replaying it.
+
+    `actions` is (T,) and `observations` is (T+1, 5), the first row being the
+    observation returned by reset. Every combination of `grid` is simulated as
+    one room of a single batch and the candidate whose level/progress and
+    energy traces are closest to the live ones wins.
+    """
+    grid = grid or {
+        "harvest_trip": np.arange(4, 41, 2),
+        "upgrade_trip": np.arange(4, 41, 2),
+        "efficiency": np.linspace(0.5, 1.0, 6),
+    }
+    names = list(grid)
+    mesh = np.meshgrid(*[np.asarray(grid[k], dtype=np.float64) for k in names], indexing="ij")
+    cand = {k: m.ravel() for k, m in zip(names, mesh)}
+    n = next(iter(cand.values())).size
+
+    sim = SpawnEconomySim(n, SimParams(**cand))
+    live = np.asarray(observations, dtype=np.float32)
+    live_prog = live[:, 3] * 2 + live[:, 4]
+    err = np.zeros(n)
+
+    obs = sim.observe()
+    for t, a in enumerate(np.asarray(actions, dtype=np.int64)):
+        obs = sim.step(np.full(n, a))
+        err += (obs[:, 3] * 2 + obs[:, 4] - live_prog[t + 1]) ** 2
+        err += obs[:, 0] != live[t + 1, 0]
+
+    best = int(np.argmin(err))
+    return SimParams(**{k: float(v[best]) for k, v in cand.items()})
+
+
+def load_recorded_run(path: str) -> SimParams:
+    """Calibrates from an .npz holding `actions` and `observations` arrays."""
+    run = np.load(path)
+    return calibrate(run["actions"], run["observations"])
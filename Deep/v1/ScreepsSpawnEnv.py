@@ -1,8 +1,5 @@
 from __future__ import annotations
-import subprocess
-import sys
-import time
-from typing import List, Dict, Tuple, Any
+from typing import List, Dict, Tuple, Any, Iterator
 import json
 from collections.abc import Mapping
 
@@ -12,10 +9,19 @@ from gymnasium import spaces
 import numpy as np
 from screepsapi import API
 
+from ScreepsCLI import CLI_PORT
+from reset import RoomResetter
+from RoomSnapshot import SnapshotStore
+from PhaseTimer import PhaseTimer
+from StepChannel import StepChannel
+
 #  ACTION & STATE HELPERS
 PARTS = ["WORK", "CARRY", "MOVE"]
 ROLES = ["harvester", "upgrader"]
+PART_COST = {"WORK": 100, "CARRY": 50, "MOVE": 50}
+MAX_CREEP_SIZE = 50
 DEBUG_RCL = True
+FALLBACK_OBS = [0, 0, 0, 1, 0]  # used when Memory.dqn_step.obs is unreadable
 
 
 # Helper functions
@@ -45,7 +51,7 @@ def _to_list(v):
 
     # security fallback
     if not isinstance(v, list) or len(v) != 5:
-        v = [0, 0, 0, 1, 0]
+        v = FALLBACK_OBS
 
     return v
 
@@ -66,15 +72,135 @@ def generate_exact_body_combos(parts: List[str], max_parts: int) -> List[List[st
     return combos
 
 
-ALL_BODIES = generate_exact_body_combos(PARTS, 3)
+def body_counts(
+    max_parts: int,
+    energy_cap: int,
+    min_parts: int = 1,
+    parts: List[str] = PARTS,
+) -> Iterator[Tuple[int, ...]]:
+    """Lazily yields part counts (one per part type) whose body is affordable.
+
+    One entry per multiset, so the number of bodies grows polynomially with
+    `max_parts` instead of len(parts) ** max_parts for ordered bodies.
+    """
+    cost = [PART_COST[p] for p in parts]
+
+    def helper(prefix: List[int], left: int, spent: int):
+        if len(prefix) == len(parts) - 1:
+            for n in range(left + 1):
+                if spent + n * cost[-1] > energy_cap:
+                    break
+                if sum(prefix) + n >= min_parts:
+                    yield (*prefix, n)
+            return
+        for n in range(left + 1):
+            if spent + n * cost[len(prefix)] > energy_cap:
+                break
+            yield from helper(prefix + [n], left - n, spent + n * cost[len(prefix)])
+
+    yield from helper([], min(max_parts, MAX_CREEP_SIZE), 0)
+
+
+def build_actions(
+    max_parts: int = 3,
+    energy_cap: int = 300,
+    min_parts: int | None = None,
+    roles: List[str] = ROLES,
+) -> List[Dict[str, Any]]:
+    """Count-based action list: (#WORK, #CARRY, #MOVE, role) + WAIT last.
 
-# List of actions
-ACTIONS: List[Dict[str, Any]] = [
+    `min_parts` defaults to `max_parts` (bodies of exactly that size, like the
+    original 3-part actions). Bodies are laid out WORK..., CARRY..., MOVE...
+    """
+    min_parts = max_parts if min_parts is None else min_parts
+    actions: List[Dict[str, Any]] = [
+        {
+            "type": "SPAWN",
+            "role": role,
+            "counts": counts,
+            "body": [p for p, n in zip(PARTS, counts) for _ in range(n)],
+        }
+        for counts in body_counts(max_parts, energy_cap, min_parts)
+        for role in roles
+    ]
+    actions.append({"type": "WAIT"})  # final action
+    return actions
+
+
+# Ordered 3-part bodies (27 x 2 + WAIT), for models trained before build_actions
+LEGACY_ACTIONS: List[Dict[str, Any]] = [
     {"type": "SPAWN", "role": role, "body": body}
-    for body in ALL_BODIES
+    for body in generate_exact_body_combos(PARTS, 3)
     for role in ROLES
-]
-ACTIONS.append({"type": "WAIT"})  # final action
+] + [{"type": "WAIT"}]
+
+# List of actions: the 10 bodies of 3 parts x 2 roles + WAIT
+ACTIONS: List[Dict[str, Any]] = build_actions(max_parts=3, energy_cap=300)
+WAIT_ACTION = len(ACTIONS) - 1
+
+
+def action_index(actions: List[Dict[str, Any]]) -> Dict[Tuple, int]:
+    """(w, c, m, role) -> index in `actions`, e.g. to encode a MultiDiscrete choice."""
+    return {
+        (*a["counts"], a["role"]): i for i, a in enumerate(actions) if "counts" in a
+    }
+
+
+def action_table(actions: List[Dict[str, Any]]) -> List[Dict[str, Any] | None]:
+    """Compact copy of ACTIONS published once in Memory.dqn_actions for main.js.
+
+    Parts are lower-cased so they equal the game constants (WORK === "work"),
+    `cost` saves main.js from summing BODYPART_COST for the action mask.
+    """
+    return [
+        (
+            {
+                "role": a["role"],
+                "body": [p.lower() for p in a["body"]],
+                "cost": sum(PART_COST[p] for p in a["body"]),
+            }
+            if a["type"] == "SPAWN"
+            else None
+        )
+        for a in actions
+    ]
+
+
+def spawns_without_move(actions: List[Dict[str, Any]]) -> np.ndarray:
+    """True for the SPAWN actions whose body has no MOVE (penalized)."""
+    return np.array([a["type"] == "SPAWN" and "MOVE" not in a["body"] for a in actions])
+
+
+def spawn_reward(prev: np.ndarray, curr: np.ndarray, no_move: np.ndarray) -> np.ndarray:
+    """Per-tick reward of (prev, curr) state rows, `no_move` from spawns_without_move.
+
+    The only copy of the reward: the envs call it with one row
+    (ScreepsSpawnEnv._compute_reward), DynamicsModel with whole batches.
+    """
+    prev = np.asarray(prev, dtype=np.float64).reshape(-1, 5)
+    curr = np.asarray(curr, dtype=np.float64).reshape(-1, 5)
+    # base penalty, penalty for a spawn without MOVE
+    r = np.full(len(curr), -0.1) - np.asarray(no_move, dtype=np.float64)
+    # controller progress
+    r += np.maximum(curr[:, 4] - prev[:, 4], 0)
+    # balance harvesters / upgraders via work parts as proxy
+    h, u = curr[:, 1], curr[:, 2]
+    total = h + u
+    ratio = np.divide(h, total, out=np.zeros_like(h), where=total > 0)
+    r -= np.where(total > 0, np.abs(ratio - 0.6) ** 2 * 5.0, 0)
+    # bonus RCL2
+    r += np.where(curr[:, 3] >= 2, 20.0, 0)
+    return r
+
+
+def decode_mask(raw: Any, n: int) -> np.ndarray:
+    """Mask string of main.js ("1" = valid, one char per action) -> bool array.
+
+    Anything unreadable (older main.js, another action table) allows every action.
+    """
+    if isinstance(raw, str) and len(raw) == n:
+        return np.frombuffer(raw.encode(), dtype=np.uint8) == ord("1")
+    return np.ones(n, dtype=bool)
 
 
 #  ENVIRONMENT DQN ALIGNED WITH Q‑LEARNING
@@ -82,7 +208,7 @@ class ScreepsSpawnEnv(gym.Env):
     """Room-level agent that chooses to "SPAWN" or "WAIT".
 
     Observation (5 dim) = [energyFlag, harvesterWork, upgraderWork, ctrlLvl, ctrlProg/100]
-    Action             = Discrete(len(ACTIONS))
+    Action             = Discrete(len(actions)), index in `actions` (ACTIONS)
     """
 
     metadata = {"render_modes": ["human"]}
@@ -95,79 +221,129 @@ class ScreepsSpawnEnv(gym.Env):
         secure: bool,
         shard: str,
         render_mode: str | None = None,
+        room: str = "W7N7",
+        tick_sync: bool = False,
+        sync_timeout: float = 5.0,
+        lockstep: bool = False,
+        cli_port: int = CLI_PORT,
+        lockstep_tick_rate: int | None = 50,
+        resetter: RoomResetter | None = None,
+        api: Any = None,
+        snapshot: str | None = None,
+        snapshot_dir: str = "snapshots",
+        actions: List[Dict[str, Any]] | None = None,
+        decision_interval: int = 1,
     ):
         super().__init__()
-        self.api = API(u=user, p=password, host=host, secure=secure)
+        # e.g. build_actions(max_parts=..., energy_cap=...) or LEGACY_ACTIONS
+        self.actions = actions or ACTIONS
+        self.wait_action = len(self.actions) - 1
+        # > 1: main.js runs up to this many ticks on its own after an action,
+        # until the next decision is needed (see dqnDue)
+        self.decision_interval = max(1, int(decision_interval))
+        # any screepsapi.API-like client, e.g. AsyncScreepsAPI.SyncScreepsAPI
+        self.api = (
+            api
+            if api is not None
+            else API(u=user, p=password, host=host, secure=secure)
+        )
         self.shard = shard
         self.render_mode = render_mode
+        self.room = room  # owned by `user`, the only room this env touches
+
+        # action write / step read, polling, tick_sync or lockstep
+        self._timer = PhaseTimer()  # per-phase seconds, exported in info
+        self._chan = StepChannel(
+            self.api,
+            shard,
+            "dqn_step",
+            self._timer,
+            user,
+            password,
+            host,
+            secure,
+            tick_sync=tick_sync,
+            sync_timeout=sync_timeout,
+            lockstep=lockstep,
+            cli_port=cli_port,
+            lockstep_tick_rate=lockstep_tick_rate,
+        )
+        self._cli = self._chan.cli
+
+        # in-process reset service, its cli channel stays open between episodes
+        self._resetter = resetter
+        self._owns_resetter = resetter is None
+
+        # snapshot: restore this saved room state instead of reset_commands(room)
+        self.snapshot = snapshot
+        self.snapshot_dir = snapshot_dir
 
         # espace of actions/states
-        self.action_space = spaces.Discrete(len(ACTIONS))
+        self.action_space = spaces.Discrete(len(self.actions))
         low = np.array([0, 0, 0, 1, 0], dtype=np.float32)  # min bounds
         high = np.array([1, 50, 50, 8, 500], dtype=np.float32)  # RCL8 et prog simplifié
         self.observation_space = spaces.Box(low, high, dtype=np.float32)
 
         # internal state
         self._prev_state: np.ndarray | None = None
+        self._step_data: Dict[str, Any] = {}  # last Memory.dqn_step read
 
-        self._tick = 0  # advances by one step at each tick
+        self._tick = 0  # game ticks since the reset
         self._first_spawn_tick = None  # tick where ≥1 creep is in play
         self._creeps_seen = 0  # total number of living creeps at the current tick
 
+        # action table read by the resident handler of main.js
+        self._publish(
+            dqn_actions=action_table(self.actions),
+            dqn_sync=int(tick_sync),
+            dqn_room=room,
+            dqn_skip=self.decision_interval,
+        )
+
     def reset(self, *, seed=None, options=None):
         super().reset(seed=seed)
 
-        # complete reset of the room
-        subprocess.run([sys.executable, "reset.py"], check=True)
-        self._wait_tick(3)
+        # complete reset of the room (one batched cli call)
+        if self._resetter is None:
+            self._resetter = (
+                RoomResetter(self._cli) if self._cli else RoomResetter.from_env()
+            )
+        self._timer.pop()
+        with self._timer("reset"):
+            if self.snapshot:
+                store = SnapshotStore(self._resetter.cli, self.snapshot_dir)
+                store.restore(self.snapshot)
+            else:
+                self._resetter.reset(self.room)
 
         # reset of counters
         self._tick = 0
         self._first_spawn_tick = None
         self._creeps_seen = 0
 
-        # initial state
-
-        self._wait_tick()  # 1) the server finishes tick N
-
-        obs = self._get_obs()  # 2) READ dqn_state/dqn_creep_count from tick N
-
-        self._inject_state_snippet()  # 3) PROGRAM the measurement for tick N+1
+        # initial state: sync the action counter, then WAIT one tick
+        self._chan.sync()
+        obs = self._exchange(self.wait_action)
 
         self._prev_state = obs.copy()
-        return obs, {}
+        # reset phases stay in the timer: the next step's info["phases"]
+        # reports them (VecEnv reset infos never reach the callbacks)
+        return obs, self._info(pop=False)
 
     def step(self, action: int):
-        act_obj = ACTIONS[action]
-
-        # SPAWN
-        if act_obj["type"] == "SPAWN":
-            role = act_obj["role"]
-            parts = ",".join(act_obj["body"])
-            body = (
-                "const room=Object.values(Game.rooms).find(r=>r.controller && r.controller.my);"
-                "if(room){{"
-                " const sp=_.find(Game.spawns,s=>!s.spawning);"
-                " if(sp && room.energyAvailable>=200){{"
-                f"  sp.spawnCreep([{parts}],`{role[0].upper()}_${{Game.time}}`,"
-                f"     {{ memory: {{ role:'{role}' }} }});"
-                " }}"
-                "}}"
-            )
-            self._console(js_iife(body))
-
-        self._wait_tick()
-
-        obs = self._get_obs()
-        self._inject_state_snippet()
-        time.sleep(0.01)
-
-        # READ updated state
-        obs = self._get_obs()
-
-        # counters & reward
-        self._tick += 1
-        creep_cnt = self._get_creep_count()
+        act_obj = self.actions[action]
+
+        # one write (action) + one read (state of the tick after it, or of
+        # the next decision point with decision_interval > 1)
+        prev_tick = self._step_data.get("tick")
+        obs = self._exchange(action)
+        trail = self._trail()
+
+        # counters & reward: main.js publishes tick T before applying the
+        # action, so a step covers at least 2 game ticks
+        ticks = self._ticks_since(prev_tick, len(trail) + 1)
+        self._tick += ticks
+        creep_cnt = int(self._step_data.get("creeps") or 0)
         if self._first_spawn_tick is None and creep_cnt > 0:
             self._first_spawn_tick = self._tick
         self._creeps_seen = creep_cnt
@@ -175,24 +351,37 @@ class ScreepsSpawnEnv(gym.Env):
             print(
                 f"[DBG] tick={self._tick+1:4}  ctrl_lvl={obs[3]}  creeps={self._creeps_seen}"
             )
-        reward = self._compute_reward(self._prev_state, obs, act_obj)
+        with self._timer("reward"):
+            # sum of the per-tick rewards, the action only counts on its tick
+            states = [self._prev_state, *trail, obs]
+            wait = self.actions[self.wait_action]
+            reward = sum(
+                self._compute_reward(s, s_next, act_obj if i == 0 else wait)
+                for i, (s, s_next) in enumerate(zip(states, states[1:]))
+            )
         self._prev_state = obs.copy()
 
         terminated = bool(obs[3] >= 2)  # RCL 2
         truncated = False
 
-        info = {}
+        info = self._info()
+        info["ticks"] = ticks  # game ticks covered by this step
         if terminated:
             info["creeps_until_lvl2"] = self._creeps_seen
             info["ticks_until_lvl2"] = self._tick - self._first_spawn_tick
 
         return obs, reward, terminated, truncated, info
 
+    def close(self) -> None:
+        if self._resetter is not None and self._owns_resetter and not self._cli:
+            self._resetter.close()
+        self._chan.close()
+
     # Simple rendering
     def render(self) -> None:  # optional console display
         if self.render_mode != "human":
             return
-        s = self._get_obs()
+        s = self._get_obs()  # last state read by step/reset
         print(
             f"E:{int(s[0])} | H:{int(s[1])} | U:{int(s[2])} | RCL:{int(s[3])} | prog:{int(s[4])}"
         )
@@ -202,77 +391,68 @@ class ScreepsSpawnEnv(gym.Env):
     def _console(self, code: str) -> None:
         self.api.console(code, shard=self.shard)
 
-    def _wait_tick(self, n: float = 1):
-        time.sleep(0.1 * n)
-
-    def _inject_state_snippet(self):
-        js = js_iife(
-            f"""
-            const room = Object.values(Game.rooms).find(r => r.controller && r.controller.my);
-            if (room) {{
-                const e  = room.energyAvailable >= 200 ? 1 : 0;
-                const h  = _.sum(_.filter(Game.creeps, c => c.memory.role === 'harvester')
-                                .map(c => c.getActiveBodyparts(WORK)));
-                const u  = _.sum(_.filter(Game.creeps, c => c.memory.role === 'upgrader')
-                                .map(c => c.getActiveBodyparts(WORK)));
-                const cl = room.controller.level;
-                const cp = Math.floor(room.controller.progress / 100);
-
-                Memory.dqn_state       = JSON.stringify([e, h, u, cl, cp]);
-
-                Memory.dqn_creep_count = Object.keys(Game.creeps).length;
-            }}
-            """
+    def _publish(self, **values: Any) -> None:
+        """Memory writes, sent concurrently when the client can (SyncScreepsAPI)."""
+        calls = [
+            ("set_memory", (k, v), {"shard": self.shard}) for k, v in values.items()
+        ]
+        if hasattr(self.api, "gather"):
+            self.api.gather(*calls)
+            return
+        for name, args, kwargs in calls:
+            getattr(self.api, name)(*args, **kwargs)
+
+    def _info(self, pop: bool = True) -> Dict[str, Any]:
+        return {
+            "tick": self._step_data.get("tick"),  # Game.time of obs
+            # seconds spent in each phase
+            "phases": self._timer.pop() if pop else dict(self._timer.phases),
+            "counters": dict(self._timer.counters),  # cumulative
+            "action_mask": self.action_masks(),  # valid actions at obs
+        }
+
+    def action_masks(self) -> np.ndarray:
+        """Actions main.js can carry out in the last observed state."""
+        return decode_mask(self._step_data.get("mask"), len(self.actions))
+
+    def _exchange(self, action: int) -> np.ndarray:
+        """Writes the action and reads back the first state taken after it."""
+        step = self._chan.exchange(
+            int(action),
+            max_ticks=20 + self.decision_interval,
+            wait_timeout=self._chan.sync_timeout * self.decision_interval,
         )
-        self._console(js)
+        if step is not None:
+            self._step_data = dict(step)
+        return self._get_obs()
+
+    def _ticks_since(self, prev_tick: Any, default: int) -> int:
+        """Game ticks between the step read before the action and the last one."""
+        tick = self._step_data.get("tick")
+        if isinstance(prev_tick, int) and isinstance(tick, int) and tick > prev_tick:
+            return tick - prev_tick
+        return default
+
+    def _trail(self) -> List[np.ndarray]:
+        """States of the ticks main.js ran on its own since the last action."""
+        rows = self._step_data.get("trail")
+        if self._step_data.get("seq") != self._chan.seq or not isinstance(rows, list):
+            return []
+        return [
+            np.array(r, dtype=np.float32)
+            for r in rows
+            if isinstance(r, list) and len(r) == 5
+        ]
 
     def _get_obs(self) -> np.ndarray:
-        try:
-            raw = self.api.memory("dqn_state", shard=self.shard)
-        except Exception:
-            raw = None
-        mem = _to_list(raw)
+        with self._timer("decode"):
+            mem = _to_list(self._step_data.get("obs"))
+        if mem is FALLBACK_OBS:
+            self._timer.count("fallback_obs")
         return np.array(mem, dtype=np.float32)
 
     def _compute_reward(
         self, prev: np.ndarray, curr: np.ndarray, action_obj: Dict[str, Any]
     ) -> float:
-        # Base penalty
-        r = -0.1
-
-        # Penality for spawn without MOVE
-        if action_obj["type"] == "SPAWN" and "MOVE" not in action_obj["body"]:
-            r -= 1.0
-
-        # Controller progress
-        progress_delta = curr[4] - prev[4]
-        if progress_delta > 0:
-            r += float(progress_delta)
-
-        # Balance harvesters / upgraders via work parts as proxy
-        h, u = curr[1], curr[2]
-        total = h + u
-        if total > 0:
-            ratio = h / total
-            r -= (abs(ratio - 0.6) ** 2) * 5.0
-
-        # Bonus RCL2
-        if curr[3] >= 2:
-            r += 20.0
-
-        return r
-
-    # Number of creeps
-    def _get_creep_count(self) -> int:
-        raw = self.api.memory("dqn_creep_count", shard=self.shard)
-
-        if isinstance(raw, Mapping):  # OrderedDict {'ok':1,'data':0}
-            raw = raw.get("data", 0)
-
-        while isinstance(raw, str):
-            try:
-                raw = json.loads(raw)
-            except json.JSONDecodeError:
-                break
-
-        return int(raw or 0)
+        no_move = spawns_without_move([action_obj])
+        return float(spawn_reward(prev, curr, no_move)[0])
@@ -0,0 +1,227 @@
+from __future__ import annotations
+from typing import Any, Dict, List, Sequence
+
+from gymnasium import spaces
+import numpy as np
+from screepsapi import API
+from stable_baselines3.common.vec_env import VecEnv
+
+from ScreepsCLI import CLI_PORT
+from ScreepsSpawnEnv import ACTIONS, ScreepsSpawnEnv, action_table, decode_mask
+from PhaseTimer import PhaseTimer
+from StepChannel import StepChannel
+from reset import RoomResetter
+
+STEP_KEY = "dqn_batch"  # Memory key written by dqnBatchHandler (main.js)
+EMPTY_OBS = [0, 0, 0, 1, 0]
+
+
+class ScreepsVecEnv(VecEnv):
+    """All rooms of one user driven as a single stable-baselines3 VecEnv.
+
+    Every step is one Memory write holding the N actions and one read of
+    Memory.dqn_batch holding the (N, 5) observations, whatever N is. Rooms
+    that reach RCL 2 (or `max_episode_steps`) are reset together in one cli
+    call, then one WAIT tick is exchanged to observe them again; the other
+    rooms see that tick too, its reward is added to theirs.
+    """
+
+    _compute_reward = ScreepsSpawnEnv._compute_reward
+    _publish = ScreepsSpawnEnv._publish
+
+    def __init__(
+        self,
+        user: str,
+        password: str,
+        host: str,
+        secure: bool,
+        shard: str,
+        rooms: Sequence[str],
+        max_episode_steps: int | None = None,
+        tick_sync: bool = False,
+        sync_timeout: float = 5.0,
+        lockstep: bool = False,
+        cli_port: int = CLI_PORT,
+        lockstep_tick_rate: int | None = 50,
+        resetter: RoomResetter | None = None,
+        api: Any = None,
+        actions: List[Dict[str, Any]] | None = None,
+    ):
+        self.actions = actions or ACTIONS
+        self.wait_action = len(self.actions) - 1
+        action_space = spaces.Discrete(len(self.actions))
+        low = np.array([0, 0, 0, 1, 0], dtype=np.float32)
+        high = np.array([1, 50, 50, 8, 500], dtype=np.float32)
+        observation_space = spaces.Box(low, high, dtype=np.float32)
+        super().__init__(len(rooms), observation_space, action_space)
+
+        # any screepsapi.API-like client, e.g. AsyncScreepsAPI.SyncScreepsAPI
+        self.api = (
+            api
+            if api is not None
+            else API(u=user, p=password, host=host, secure=secure)
+        )
+        self.shard = shard
+        self.rooms = list(rooms)
+        self.max_episode_steps = max_episode_steps
+
+        self._timer = PhaseTimer()
+        self._chan = StepChannel(
+            self.api,
+            shard,
+            STEP_KEY,
+            self._timer,
+            user,
+            password,
+            host,
+            secure,
+            tick_sync=tick_sync,
+            sync_timeout=sync_timeout,
+            lockstep=lockstep,
+            cli_port=cli_port,
+            lockstep_tick_rate=lockstep_tick_rate,
+        )
+        self._cli = self._chan.cli
+
+        self._resetter = resetter
+        self._owns_resetter = resetter is None
+
+        self._step_data: Dict[str, Any] = {}
+        self._actions = np.full(self.num_envs, self.wait_action, dtype=np.int64)
+        self._prev = np.zeros((self.num_envs, 5), dtype=np.float32)
+        self._ticks = np.zeros(self.num_envs, dtype=np.int64)
+        self._first_spawn = np.full(self.num_envs, -1, dtype=np.int64)
+
+        self._publish(
+            dqn_actions=action_table(self.actions),
+            dqn_sync=int(tick_sync),
+            dqn_rooms=self.rooms,
+        )
+
+    # VecEnv API
+    def reset(self) -> np.ndarray:
+        self._reset_rooms(np.ones(self.num_envs, dtype=bool))
+        self._chan.sync()
+        self._prev = self._exchange(np.full(self.num_envs, self.wait_action))
+        # reset phases go out with the first step's info["phases"]
+        self.reset_infos = [{"action_mask": m} for m in self.action_masks()]
+        return self._prev.copy()
+
+    def step_async(self, actions: np.ndarray) -> None:
+        self._actions = np.asarray(actions, dtype=np.int64).reshape(self.num_envs)
+
+    def step_wait(self):
+        obs = self._exchange(self._actions)
+        with self._timer("reward"):
+            rewards = np.array(
+                [
+                    self._compute_reward(self._prev[i], obs[i], self.actions[a])
+                    for i, a in enumerate(self._actions)
+                ],
+                dtype=np.float32,
+            )
+        self._ticks += 1
+        creeps = self._creeps()
+        self._first_spawn = np.where(
+            (self._first_spawn < 0) & (creeps > 0), self._ticks, self._first_spawn
+        )
+
+        terminated = obs[:, 3] >= 2
+        truncated = np.zeros(self.num_envs, dtype=bool)
+        if self.max_episode_steps is not None:
+            truncated = ~terminated & (self._ticks >= self.max_episode_steps)
+        dones = terminated | truncated
+
+        infos: List[Dict[str, Any]] = [{} for _ in range(self.num_envs)]
+        for i in np.flatnonzero(dones):
+            if terminated[i]:
+                infos[i]["creeps_until_lvl2"] = int(creeps[i])
+                infos[i]["ticks_until_lvl2"] = int(
+                    self._ticks[i] - self._first_spawn[i]
+                )
+            infos[i]["TimeLimit.truncated"] = bool(truncated[i])
+            infos[i]["terminal_observation"] = obs[i].copy()
+
+        if dones.any():
+            # the other rooms WAIT during the tick that observes the reset
+            # ones: their step covers it, so obs and masks stay current
+            self._reset_rooms(dones)
+            fresh = self._exchange(np.full(self.num_envs, self.wait_action))
+            wait = self.actions[self.wait_action]
+            with self._timer("reward"):
+                for i in np.flatnonzero(~dones):
+                    rewards[i] += self._compute_reward(obs[i], fresh[i], wait)
+            self._ticks[~dones] += 1
+            obs = fresh
+        self._prev = obs.copy()
+
+        # one shared dict for the whole batch (ScreepsMetricsCallback dedupes)
+        phases, counters = self._timer.pop(), dict(self._timer.counters)
+        masks = self.action_masks()
+        tick = self._step_data.get("tick")  # Game.time of obs
+        for info, mask in zip(infos, masks):
+            info["tick"] = tick
+            info["phases"], info["counters"] = phases, counters
+            info["action_mask"] = mask
+        for i in np.flatnonzero(dones):
+            self.reset_infos[i] = {"action_mask": masks[i]}
+        return obs, rewards, dones, infos
+
+    def close(self) -> None:
+        self.api.set_memory("dqn_rooms", None, shard=self.shard)
+        if self._resetter is not None and self._owns_resetter and not self._cli:
+            self._resetter.close()
+        self._chan.close()
+
+    def get_attr(self, attr_name, indices=None):
+        return [getattr(self, attr_name) for _ in self._get_indices(indices)]
+
+    def set_attr(self, attr_name, value, indices=None) -> None:
+        setattr(self, attr_name, value)
+
+    def env_method(self, method_name, *method_args, indices=None, **method_kwargs):
+        return [
+            getattr(self, method_name)(*method_args, **method_kwargs)
+            for _ in self._get_indices(indices)
+        ]
+
+    def env_is_wrapped(self, wrapper_class, indices=None) -> List[bool]:
+        return [False for _ in self._get_indices(indices)]
+
+    def action_masks(self) -> np.ndarray:
+        """(N, n_actions) actions main.js can carry out in each room now."""
+        masks = self._step_data.get("mask")
+        if not isinstance(masks, list) or len(masks) != self.num_envs:
+            masks = [None] * self.num_envs
+        return np.stack([decode_mask(m, len(self.actions)) for m in masks])
+
+    # Helpers
+    def _reset_rooms(self, mask: np.ndarray) -> None:
+        if self._resetter is None:
+            self._resetter = (
+                RoomResetter(self._cli) if self._cli else RoomResetter.from_env()
+            )
+        with self._timer("reset"):
+            self._resetter.reset_rooms([r for r, m in zip(self.rooms, mask) if m])
+        self._ticks[mask] = 0
+        self._first_spawn[mask] = -1
+
+    def _exchange(self, actions: np.ndarray) -> np.ndarray:
+        """One write of all actions, one read of the batch that follows them."""
+        step = self._chan.exchange([int(a) for a in actions])
+        if step is not None:
+            self._step_data = dict(step)
+        return self._get_obs()
+
+    def _get_obs(self) -> np.ndarray:
+        rows = self._step_data.get("obs")
+        if not isinstance(rows, list) or len(rows) != self.num_envs:
+            self._timer.count("fallback_obs")
+            rows = [EMPTY_OBS] * self.num_envs
+        return np.array(rows, dtype=np.float32).reshape(self.num_envs, 5)
+
+    def _creeps(self) -> np.ndarray:
+        creeps = self._step_data.get("creeps")
+        if not isinstance(creeps, list) or len(creeps) != self.num_envs:
+            creeps = [0] * self.num_envs
+        return np.array(creeps, dtype=np.int64)
@@ -0,0 +1,179 @@
+from __future__ import annotations
+import math
+import time
+from typing import Any, Dict
+from collections.abc import Mapping
+
+from ScreepsCLI import ScreepsCLI, CLI_PORT
+from TickStream import TickStream
+from PhaseTimer import PhaseTimer
+
+
+class StepChannel:
+    """Action write / step read shared by ScreepsSpawnEnv and ScreepsVecEnv.
+
+    `exchange(ids)` writes Memory.dqn_action = {seq, id} and reads back
+    Memory[key] until main.js acknowledges `seq`, over one of three
+    transports: polling (sleep 0.1 s), the websocket console feed
+    (tick_sync) or the cli of a paused server (lockstep). Polling costs one
+    write and one read per tick waited; the wait is bounded with the `tick`
+    main.js publishes in the step, Game.time is only asked when the step
+    stops changing.
+    """
+
+    def __init__(
+        self,
+        api: Any,
+        shard: str,
+        key: str,
+        timer: PhaseTimer,
+        user: str,
+        password: str,
+        host: str,
+        secure: bool,
+        tick_sync: bool = False,
+        sync_timeout: float = 5.0,
+        lockstep: bool = False,
+        cli_port: int = CLI_PORT,
+        lockstep_tick_rate: int | None = 50,
+    ):
+        self.api = api
+        self.shard = shard
+        self.key = key  # Memory key written by main.js
+        self._timer = timer
+        self.seq = 0  # id of the last action written in Memory.dqn_action
+        self.tick: int | None = None  # Game.time of the last step read
+
+        # tick_sync: follow Game.time on the websocket instead of sleeping
+        self.sync_timeout = sync_timeout
+        self.stream: TickStream | None = None
+        if tick_sync:
+            self.stream = TickStream(user, password, host, secure, shard).start()
+
+        # lockstep: the server stays paused and the env runs it tick by tick
+        # through the CLI (screepsmod-admin-utils), nothing ever sleeps
+        self.cli: ScreepsCLI | None = None
+        self._saved_tick_rate: int | None = None  # restored by close()
+        if lockstep:
+            self._user_id = self.api.me()["_id"]
+            self.cli = ScreepsCLI(host.split(":")[0], cli_port).connect()
+            if lockstep_tick_rate is not None:
+                # min tick duration, leaves room to pause between two ticks
+                self._saved_tick_rate = self.cli.get_tick_rate()
+                self.cli.set_tick_rate(lockstep_tick_rate)
+            self.cli.pause()
+
+    def close(self) -> None:
+        if self.stream is not None:
+            self.stream.close()
+        if self.cli is not None:
+            if self._saved_tick_rate is not None:
+                self.cli.set_tick_rate(self._saved_tick_rate)
+            self.cli.resume()
+            self.cli.close()
+
+    def sync(self) -> None:
+        """Takes the action counter of main.js (after a reset or a restart)."""
+        step = self.read()
+        if step is not None:
+            self.seq = int(step.get("seq") or 0)
+
+    def wait_tick(self, n: float = 1) -> None:
+        if self.cli is not None:
+            before = self.cli.overshoot
+            self.cli.advance(math.ceil(n))
+            self._timer.count("overshoot_ticks", self.cli.overshoot - before)
+            return
+        if self.stream is None:
+            time.sleep(0.1 * n)
+            return
+        self.stream.wait_tick(self.stream.tick + math.ceil(n), self.sync_timeout)
+
+    def send(self, ids: Any) -> None:
+        self.seq += 1
+        action = {"seq": self.seq, "id": ids}
+        with self._timer("write"):
+            self.api.set_memory("dqn_action", action, shard=self.shard)
+
+    def game_time(self) -> int | None:
+        """Game.time of the server, None if the client or server can't tell."""
+        try:
+            return int(self.api.time(shard=self.shard))
+        except Exception:
+            return None
+
+    def read(self) -> Dict[str, Any] | None:
+        """Memory[key] = {seq, tick, obs, creeps, mask, ...} written by main.js."""
+        try:
+            with self._timer("read"):
+                raw = self.api.memory(self.key, shard=self.shard)
+        except Exception:
+            self._timer.count("api_errors")
+            return None
+        self._timer.count("reads")
+        data = raw.get("data") if isinstance(raw, Mapping) else None
+        if not isinstance(data, Mapping):
+            return None
+        if isinstance(data.get("tick"), int):
+            self.tick = data["tick"]
+        return data
+
+    def exchange(
+        self, ids: Any, max_ticks: int = 20, wait_timeout: float | None = None
+    ) -> Dict[str, Any] | None:
+        """Writes the action(s), returns the first step taken after them.
+
+        main.js has `max_ticks` game ticks to answer, whatever the tick rate.
+        None or a step of an older `seq` (counted in `stale_steps`) when it
+        did not.
+        """
+        start = self.tick
+        self.send(ids)
+        step = None
+        if self.cli is not None:
+            before = self.cli.overshoot
+            with self._timer("lockstep"):  # tick wait + read in one cli call
+                step = self.cli.lockstep(self._user_id, self.seq, max_ticks, self.key)
+            # ticks the paused server ran past the one asked for (not exact)
+            self._timer.count("overshoot_ticks", self.cli.overshoot - before)
+            if isinstance(step, Mapping) and isinstance(step.get("tick"), int):
+                self.tick = step["tick"]
+        elif self.stream is not None:
+            # pushed by the websocket, the memory read is only a fallback
+            with self._timer("wait"):
+                step = self.stream.wait_seq(self.seq, wait_timeout or self.sync_timeout)
+            if step is None:
+                with self._timer("wait"):
+                    self.wait_tick()
+                step = self.read()
+        else:
+            step = self._poll(start, max_ticks)
+        if step is None or step.get("seq") != self.seq:
+            self._timer.count("stale_steps")  # obs not taken after this action
+        return step
+
+    def _poll(self, start: int | None, max_ticks: int) -> Dict[str, Any] | None:
+        """Reads every 0.1 s until the ack or `max_ticks` ticks after `start`.
+
+        A new step tells the current tick; with no new step for
+        `sync_timeout` s (decision_interval > 1, or a stopped server) one
+        Game.time read tells which, and ends the wait if the clock stood still.
+        """
+        clock, moved = start, time.monotonic()
+        while True:
+            with self._timer("wait"):
+                self.wait_tick()
+            step = self.read()
+            if step is not None and step.get("seq") == self.seq:
+                return step
+            if self.tick != clock and self.tick is not None:
+                clock, moved = self.tick, time.monotonic()
+            elif time.monotonic() - moved > self.sync_timeout:
+                now = self.game_time()
+                if now is None or now == clock:
+                    return step
+                clock, moved = now, time.monotonic()
+            if start is None:
+                start = clock
+            if start is not None and clock - start >= max_ticks:
+                return step
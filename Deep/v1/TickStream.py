@@ -0,0 +1,78 @@
+from __future__ import annotations
+import json
+import threading
+from typing import Any, Callable, Dict
+
+from screepsapi import Socket
+
+# prefix of the line logged by the main.js handler when Memory.dqn_sync is set
+LOG_PREFIX = "DQN "
+
+
+class TickStream(Socket):
+    """Websocket feed of the per-tick `Memory.dqn_step` published by main.js.
+
+    Runs the screepsapi socket in a daemon thread, keeps the latest step
+    (tagged with its `Game.time`) and lets the env block until a given tick or
+    action ack shows up instead of sleeping.
+    """
+
+    def __init__(
+        self,
+        user: str,
+        password: str,
+        host: str,
+        secure: bool,
+        shard: str = "shard0",
+    ):
+        super().__init__(user=user, password=password, host=host, secure=secure)
+        self.shard = shard
+        self.latest: Dict[str, Any] | None = None
+        self.tick = -1  # Game.time of `latest`
+        self._cond = threading.Condition()
+        self._thread: threading.Thread | None = None
+
+    def start(self) -> "TickStream":
+        self._thread = threading.Thread(target=self.connect, daemon=True)
+        self._thread.start()
+        return self
+
+    def close(self) -> None:
+        if getattr(self, "ws", None):
+            self.disconnect()
+
+    # screepsapi.Socket hooks
+    def set_subscriptions(self):
+        self.subscribe_user("console")
+
+    def process_log(self, ws, message, shard="shard0"):
+        if shard != self.shard or not str(message).startswith(LOG_PREFIX):
+            return
+        try:
+            data = json.loads(message[len(LOG_PREFIX) :])
+        except json.JSONDecodeError:
+            return
+        with self._cond:
+            self.latest = data
+            self.tick = int(data.get("tick", self.tick))
+            self._cond.notify_all()
+
+    def on_close(self, ws, *args):  # websocket-client passes code and reason
+        pass
+
+    # Blocking helpers
+    def wait_for(
+        self, pred: Callable[[Dict[str, Any]], bool], timeout: float
+    ) -> Dict[str, Any] | None:
+        """Latest step once `pred(step)` holds, None after `timeout` seconds."""
+        with self._cond:
+            ok = self._cond.wait_for(
+                lambda: self.latest is not None and pred(self.latest), timeout
+            )
+            return dict(self.latest) if ok else None
+
+    def wait_seq(self, seq: int, timeout: float) -> Dict[str, Any] | None:
+        return self.wait_for(lambda s: s.get("seq") == seq, timeout)
+
+    def wait_tick(self, tick: int, timeout: float) -> Dict[str, Any] | None:
+        return self.wait_for(lambda s: int(s.get("tick", -1)) >= tick, timeout)
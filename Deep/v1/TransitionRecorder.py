@@ -0,0 +1,189 @@
+from __future__ import annotations
+import json
+import os
+from typing import Any, Dict, List, Tuple
+
+import gymnasium as gym
+import numpy as np
+
+# one raw append-only file per column: <directory>/<name>.bin
+# dtypes match the stable-baselines3 ReplayBuffer arrays (Discrete actions, Box obs)
+COLUMNS: Dict[str, Tuple[str, Tuple[int, ...]]] = {
+    "obs": ("float32", (5,)),
+    "action": ("int64", (1,)),
+    "reward": ("float32", ()),
+    "next_obs": ("float32", (5,)),
+    "done": ("float32", ()),  # terminated or truncated
+    "timeout": ("float32", ()),  # truncated
+    "tick": ("int64", ()),  # Game.time of next_obs, -1 if unknown
+    "step_ms": ("float32", ()),  # sum of info["phases"]
+}
+
+
+def action_keys(actions: List[Dict[str, Any]] | None) -> List[str] | None:
+    """Readable id of each action ("harvester:WORK,CARRY,MOVE", "WAIT")."""
+    if actions is None:
+        return None
+    return [
+        f"{a['role']}:{','.join(a['body'])}" if a["type"] == "SPAWN" else a["type"]
+        for a in actions
+    ]
+
+
+def _meta_path(directory: str) -> str:
+    return os.path.join(directory, "meta.json")
+
+
+def check_actions(directory: str, actions: List[Dict[str, Any]]) -> None:
+    """Raises ValueError unless `directory` was recorded with `actions`.
+
+    Action ids are indices in the env's table, so they mean nothing under
+    another one (and may be out of range).
+    """
+    with open(_meta_path(directory)) as f:
+        recorded = json.load(f).get("actions")
+    if recorded is None:
+        raise ValueError(
+            f"❌ {directory} does not store its action table (recorded before"
+            " meta.json kept it), re-record it with the current actions"
+        )
+    if recorded != action_keys(actions):
+        raise ValueError(
+            f"❌ {directory} was recorded with another action table"
+            f" ({len(recorded)} actions, expected {len(actions)})"
+        )
+
+
+class TransitionRecorder(gym.Wrapper):
+    """Streams every transition of the wrapped env to `directory`.
+
+    Rows are buffered `flush_every` at a time and appended to one raw file per
+    column, so RAM stays bounded and a crash loses at most one buffer. Runs
+    append to the same directory; `load_transitions` maps the files back.
+    meta.json holds the column layout and the action table of the env.
+    """
+
+    def __init__(self, env: gym.Env, directory: str, flush_every: int = 256):
+        super().__init__(env)
+        self.directory = directory
+        self.flush_every = flush_every
+        os.makedirs(directory, exist_ok=True)
+        meta_path = _meta_path(directory)
+        meta: Dict[str, Any] = {k: [d, list(s)] for k, (d, s) in COLUMNS.items()}
+        meta["actions"] = action_keys(getattr(env.unwrapped, "actions", None))
+        if os.path.exists(meta_path):
+            with open(meta_path) as f:
+                if json.load(f) != meta:
+                    raise ValueError(
+                        f"❌ {directory} holds another column layout or action table"
+                    )
+        else:
+            with open(meta_path, "w") as f:
+                json.dump(meta, f)
+
+        self._files = {k: open(_path(directory, k), "ab") for k in COLUMNS}
+        self._buf = {
+            k: np.zeros((flush_every,) + s, dtype=d) for k, (d, s) in COLUMNS.items()
+        }
+        self._n = 0  # rows in the buffers
+        self._obs: np.ndarray | None = None
+
+    def reset(self, **kwargs):
+        obs, info = self.env.reset(**kwargs)
+        self._obs = np.asarray(obs, dtype=np.float32)
+        return obs, info
+
+    def step(self, action):
+        obs, reward, terminated, truncated, info = self.env.step(action)
+        row = self._n
+        b = self._buf
+        b["obs"][row] = self._obs
+        b["action"][row] = int(action)
+        b["reward"][row] = reward
+        b["next_obs"][row] = obs
+        b["done"][row] = terminated or truncated
+        b["timeout"][row] = truncated
+        tick = info.get("tick")
+        b["tick"][row] = -1 if tick is None else tick
+        b["step_ms"][row] = 1000 * sum(info.get("phases", {}).values())
+        self._n += 1
+        if self._n == self.flush_every:
+            self.flush()
+        self._obs = np.asarray(obs, dtype=np.float32)
+        return obs, reward, terminated, truncated, info
+
+    def flush(self) -> None:
+        for k, f in self._files.items():
+            f.write(self._buf[k][: self._n].tobytes())
+            f.flush()
+        self._n = 0
+
+    def close(self) -> None:
+        if self._files:
+            self.flush()
+            for f in self._files.values():
+                f.close()
+            self._files = {}
+        super().close()
+
+
+def _path(directory: str, column: str) -> str:
+    return os.path.join(directory, f"{column}.bin")
+
+
+def load_transitions(
+    directory: str,
+    mode: str = "r",
+    actions: List[Dict[str, Any]] | None = None,
+) -> Dict[str, np.memmap]:
+    """Memory-maps every column (no copy). A half-written last row is ignored.
+
+    `mode="c"` (copy-on-write) lets the arrays be modified in RAM without
+    touching the files. With `actions`, the recording must have been made
+    with that action table (check_actions).
+    """
+    if actions is not None:
+        check_actions(directory, actions)
+    cols: Dict[str, Any] = {}
+    n = None
+    for k, (d, s) in COLUMNS.items():
+        row = np.dtype(d).itemsize * int(np.prod(s, dtype=np.int64))
+        rows = os.path.getsize(_path(directory, k)) // row
+        n = rows if n is None else min(n, rows)
+    for k, (d, s) in COLUMNS.items():
+        if n == 0:
+            cols[k] = np.zeros((0,) + s, dtype=d)
+            continue
+        cols[k] = np.memmap(_path(directory, k), dtype=d, mode=mode, shape=(n,) + s)
+    return cols
+
+
+def fill_replay_buffer(
+    buffer, directory: str, actions: List[Dict[str, Any]] | None = None
+) -> int:
+    """Copies the recorded files into a single-env stable-baselines3 ReplayBuffer.
+
+    The buffer keeps its configured `buffer_size`: the rows are read from the
+    memmaps straight into its arrays, and when there are more of them than fit,
+    only the newest `buffer_size` are kept. Online steps then continue after
+    them. Returns the number of rows copied. Pass the action table of the model
+    as `actions` to reject other recordings.
+    """
+    if buffer.n_envs != 1 or getattr(buffer, "optimize_memory_usage", False):
+        raise ValueError(
+            "❌ needs a ReplayBuffer with n_envs=1, no memory optimization"
+        )
+    cols = load_transitions(directory, mode="r", actions=actions)
+    n = min(len(cols["reward"]), buffer.buffer_size)
+    if n == 0:
+        return 0
+    rows = slice(len(cols["reward"]) - n, None)
+    buffer.observations[:n] = cols["obs"][rows].reshape(n, 1, -1)
+    buffer.next_observations[:n] = cols["next_obs"][rows].reshape(n, 1, -1)
+    buffer.actions[:n] = cols["action"][rows].reshape(n, 1, -1)
+    buffer.rewards[:n] = cols["reward"][rows].reshape(n, 1)
+    buffer.dones[:n] = cols["done"][rows].reshape(n, 1)
+    buffer.timeouts[:n] = cols["timeout"][rows].reshape(n, 1)
+    buffer.full = n == buffer.buffer_size
+    buffer.pos = 0 if buffer.full else n
+    return n
@@ -0,0 +1,253 @@
+"""
+Step/reset latency benchmark of the spawn envs, results saved as JSON.
+
+    python benchmark.py --backend sim
+    python benchmark.py --backend mock --latency 0.02 --steps 200
+    python benchmark.py --backend live --mode lockstep
+    python benchmark.py --compare bench/old.json bench/new.json
+"""
+
+from __future__ import annotations
+import argparse
+import json
+import os
+import subprocess
+import time
+from typing import Any, Dict, List
+
+import numpy as np
+from dotenv import load_dotenv
+from screepsapi import API
+
+import ScreepsSpawnEnv as live
+from ScreepsSpawnEnv import ScreepsSpawnEnv, WAIT_ACTION
+from ScreepsSim import ScreepsSimEnv
+from MockScreepsServer import MockScreepsServer
+from AsyncScreepsAPI import SyncScreepsAPI
+
+load_dotenv()
+
+MODES = {
+    "sleep": {},
+    "tick_sync": {"tick_sync": True},
+    "lockstep": {"lockstep": True},
+}
+
+
+class MeteredAPI(API):
+    """screepsapi.API counting requests and bytes on the wire (bodies + urls)."""
+
+    def __init__(self, *args, **kwargs):
+        self.requests = 0
+        self.bytes_out = 0  # client -> server
+        self.bytes_in = 0  # server -> client
+        super().__init__(*args, **kwargs)
+
+    def req(self, func, path, **args):
+        def metered(url, **kw):
+            r = func(url, **kw)
+            self.requests += 1
+            self.bytes_out += len(r.request.url) + len(r.request.body or b"")
+            self.bytes_in += len(r.content)
+            return r
+
+        return super().req(metered, path, **args)
+
+
+def percentiles(samples: List[float]) -> Dict[str, float]:
+    ms = 1000 * np.asarray(samples)
+    return {
+        "mean_ms": float(ms.mean()),
+        "p50_ms": float(np.percentile(ms, 50)),
+        "p95_ms": float(np.percentile(ms, 95)),
+        "p99_ms": float(np.percentile(ms, 99)),
+    }
+
+
+def git_commit() -> str | None:
+    try:
+        out = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True
+        )
+        return out.stdout.strip() or None
+    except OSError:
+        return None
+
+
+def wire_counters(server, api) -> tuple | None:
+    """(requests, bytes out, bytes in) so far, None if nothing is metered."""
+    if server is not None:
+        return server.requests, server.bytes_out, server.bytes_in
+    if isinstance(api, MeteredAPI):
+        return api.requests, api.bytes_out, api.bytes_in
+    return None
+
+
+def make_env(args, server: MockScreepsServer | None):
+    if args.backend == "sim":
+        return ScreepsSimEnv(), None
+    live.DEBUG_RCL = False
+    if server is not None:
+        host, user, password = server.host, "dqn", "dqn"
+        extra: Dict[str, Any] = {"resetter": server.resetter()}
+    else:
+        host = f"{os.getenv('VPS_HOST')}:{os.getenv('SCREEPS_HOST', '21025')}"
+        user, password = os.getenv("USERNAME"), os.getenv("PASSWORD")
+        extra = {"cli_port": int(os.getenv("SCREEPS_CLI_PORT", "21026"))}
+        extra.update(MODES[args.mode])
+    if args.transport == "async":
+        api = SyncScreepsAPI(u=user, p=password, host=host, secure=False)
+    else:
+        api = MeteredAPI(u=user, p=password, host=host, secure=False)
+    env = ScreepsSpawnEnv(
+        user=user,
+        password=password,
+        host=host,
+        secure=False,
+        shard="shard0",
+        api=api,
+        **extra,
+    )
+    return env, api
+
+
+def run(args) -> Dict[str, Any]:
+    server = None
+    if args.backend == "mock":
+        server = MockScreepsServer(
+            latency=args.latency, jitter=args.jitter, tick_ms=args.tick_ms
+        ).start()
+    env, api = make_env(args, server)
+    rng = np.random.default_rng(args.seed)
+    try:
+        reset_s = []
+        for _ in range(args.resets):
+            start = time.perf_counter()
+            env.reset()
+            reset_s.append(time.perf_counter() - start)
+
+        before = wire_counters(server, api)  # traffic of the steps only
+        tick0 = getattr(env, "_step_data", {}).get("tick")
+
+        step_s, phases = [], {}
+        for _ in range(args.steps):
+            action = (
+                WAIT_ACTION if args.wait_only else int(rng.integers(env.action_space.n))
+            )
+            start = time.perf_counter()
+            _, _, terminated, truncated, info = env.step(action)
+            step_s.append(time.perf_counter() - start)
+            for name, dt in info.get("phases", {}).items():
+                phases[name] = phases.get(name, 0.0) + dt
+            if terminated or truncated:
+                env.reset()
+        tick1 = getattr(env, "_step_data", {}).get("tick")
+        after = wire_counters(server, api)
+    finally:
+        env.close()
+        if isinstance(api, SyncScreepsAPI):
+            api.close()
+        if server is not None:
+            server.stop()
+
+    result: Dict[str, Any] = {
+        "backend": args.backend,
+        "mode": args.mode if args.backend == "live" else None,
+        "transport": args.transport if args.backend != "sim" else None,
+        "latency_s": args.latency if args.backend == "mock" else None,
+        "steps": args.steps,
+        "commit": git_commit(),
+        "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "steps_per_s": args.steps / sum(step_s),
+        "step": percentiles(step_s),
+        "reset": percentiles(reset_s) if reset_s else None,
+        "phases_ms_per_step": {k: 1000 * v / args.steps for k, v in phases.items()},
+        "counters": dict(getattr(getattr(env, "_timer", None), "counters", {})),
+        "ticks_per_step": (tick1 - tick0) / args.steps if tick0 and tick1 else None,
+    }
+    if before is not None:
+        n, out, inn = (a - b for a, b in zip(after, before))
+        result["wire"] = {
+            "requests_per_step": n / args.steps,
+            "bytes_out_per_step": out / args.steps,
+            "bytes_in_per_step": inn / args.steps,
+        }
+    if server is not None:
+        result["server_ms_per_request"] = (
+            1000 * server.server_s / max(server.requests, 1)
+        )
+    return result
+
+
+def compare(old_path: str, new_path: str) -> None:
+    with open(old_path) as f:
+        old = json.load(f)
+    with open(new_path) as f:
+        new = json.load(f)
+    rows = [
+        ("steps/s", ("steps_per_s",)),
+        ("step p50 ms", ("step", "p50_ms")),
+        ("step p95 ms", ("step", "p95_ms")),
+        ("step p99 ms", ("step", "p99_ms")),
+        ("reset p50 ms", ("reset", "p50_ms")),
+        ("requests/step", ("wire", "requests_per_step")),
+        ("bytes out/step", ("wire", "bytes_out_per_step")),
+        ("bytes in/step", ("wire", "bytes_in_per_step")),
+    ]
+    print(
+        f"{'':16}{old.get('commit') or 'old':>12}{new.get('commit') or 'new':>12}   ratio"
+    )
+    for label, keys in rows:
+        a, b = old, new
+        for k in keys:
+            a = a.get(k) if isinstance(a, dict) else None
+            b = b.get(k) if isinstance(b, dict) else None
+        if a is None or b is None:
+            continue
+        ratio = b / a if a else float("nan")
+        print(f"{label:16}{a:12.2f}{b:12.2f}   {ratio:5.2f}x")
+
+
+if __name__ == "__main__":
+    p = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    p.add_argument("--backend", choices=["live", "mock", "sim"], default="mock")
+    p.add_argument("--mode", choices=list(MODES), default="sleep", help="live only")
+    p.add_argument("--transport", choices=["sync", "async"], default="sync")
+    p.add_argument("--steps", type=int, default=100)
+    p.add_argument("--resets", type=int, default=3)
+    p.add_argument("--latency", type=float, default=0.0, help="mock, s/request")
+    p.add_argument("--jitter", type=float, default=0.0, help="mock, s/request")
+    p.add_argument("--tick-ms", type=float, default=100.0, help="mock tick rate")
+    p.add_argument("--wait-only", action="store_true", help="always WAIT")
+    p.add_argument("--seed", type=int, default=0)
+    p.add_argument("--out", default=None, help="JSON path (default bench/<...>.json)")
+    p.add_argument("--compare", nargs=2, metavar=("OLD", "NEW"))
+    args = p.parse_args()
+
+    if args.compare:
+        compare(*args.compare)
+        raise SystemExit
+
+    result = run(args)
+    out = args.out or os.path.join(
+        "bench",
+        f"{args.backend}-{result['mode'] or args.transport or 'sim'}-{time.strftime('%Y%m%d-%H%M%S')}.json",
+    )
+    os.makedirs(os.path.dirname(out) or ".", exist_ok=True)
+    with open(out, "w") as f:
+        json.dump(result, f, indent=2)
+
+    s = result["step"]
+    print(
+        f"{args.backend:5} {result['steps_per_s']:9.1f} steps/s  "
+        f"p50 {s['p50_ms']:.2f}  p95 {s['p95_ms']:.2f}  p99 {s['p99_ms']:.2f} ms"
+    )
+    if result["reset"]:
+        print(f"reset p50 {result['reset']['p50_ms']:.1f} ms")
+    if "wire" in result:
+        w = result["wire"]
+        print(
+            f"{w['requests_per_step']:.2f} requests, {w['bytes_out_per_step']:.0f} B out, "
+            f"{w['bytes_in_per_step']:.0f} B in per step"
+        )
+    print(f"📄 {out}")
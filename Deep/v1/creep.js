@@ -1,36 +1,21 @@
 // creep.js
 const brainLogic = require("creep.brain");
+const roomCache = require("roomcache");
 
 const HARVESTER_ACTIONS = ["HARVEST", "TRANSFER"];
 const UPGRADER_ACTIONS = ["WITHDRAW", "UPGRADE"];
 const EPISODE_LENGTH = 10;
 
 function findSource(creep) {
-  return creep.pos.findClosestByPath(FIND_SOURCES_ACTIVE);
+  return roomCache.source(creep);
 }
 
 function findDepositTarget(creep) {
-  return creep.pos.findClosestByPath(FIND_STRUCTURES, {
-    filter: (s) =>
-      (((s.structureType === STRUCTURE_SPAWN ||
-        s.structureType === STRUCTURE_EXTENSION) &&
-        s.my) ||
-        s.structureType === STRUCTURE_CONTAINER ||
-        s.structureType === STRUCTURE_STORAGE) &&
-      s.store.getFreeCapacity(RESOURCE_ENERGY) > 0,
-  });
+  return roomCache.depositTarget(creep);
 }
 
 function findWithdrawSource(creep) {
-  return creep.pos.findClosestByPath(FIND_STRUCTURES, {
-    filter: (s) =>
-      (((s.structureType === STRUCTURE_SPAWN ||
-        s.structureType === STRUCTURE_EXTENSION) &&
-        s.my) ||
-        s.structureType === STRUCTURE_CONTAINER ||
-        s.structureType === STRUCTURE_STORAGE) &&
-      s.store.getUsedCapacity(RESOURCE_ENERGY) > 0,
-  });
+  return roomCache.withdrawSource(creep);
 }
 
 function findController(creep) {
@@ -153,7 +138,7 @@ module.exports.run = function (creep) {
         const code = creep.harvest(src);
         if (code === OK) did = true;
         else if (code === ERR_NOT_IN_RANGE)
-          creep.moveTo(src, { visualizePathStyle: { stroke: "#ffaa00" } });
+          roomCache.moveTo(creep, src, "#ffaa00");
       }
     }
   } else if (action === "TRANSFER") {
@@ -163,7 +148,7 @@ module.exports.run = function (creep) {
         const code = creep.transfer(tgt, RESOURCE_ENERGY);
         if (code === OK) did = true;
         else if (code === ERR_NOT_IN_RANGE)
-          creep.moveTo(tgt, { visualizePathStyle: { stroke: "#ffffff" } });
+          roomCache.moveTo(creep, tgt, "#ffffff");
       }
     }
   } else if (action === "WITHDRAW") {
@@ -173,7 +158,7 @@ module.exports.run = function (creep) {
         const code = creep.withdraw(src, RESOURCE_ENERGY);
         if (code === OK) did = true;
         else if (code === ERR_NOT_IN_RANGE)
-          creep.moveTo(src, { visualizePathStyle: { stroke: "#ffaa00" } });
+          roomCache.moveTo(creep, src, "#ffaa00");
       }
     }
   } else if (action === "UPGRADE") {
@@ -183,7 +168,7 @@ module.exports.run = function (creep) {
         const code = creep.upgradeController(ctrl);
         if (code === OK) did = true;
         else if (code === ERR_NOT_IN_RANGE)
-          creep.moveTo(ctrl, { visualizePathStyle: { stroke: "#ffffff" } });
+          roomCache.moveTo(creep, ctrl, "#ffffff");
       }
     }
   }
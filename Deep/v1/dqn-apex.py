@@ -0,0 +1,132 @@
+"""
+Ape-X style DQN: N actor processes, each with its own env (simulator, mock
+server or private server), stream transitions over a local socket to one
+learner that owns the replay buffer and broadcasts new weights.
+
+    python dqn-apex.py                  # learner + N_ACTORS local actors
+    ROLE=learner python dqn-apex.py     # learner only, actors join APEX_ADDRESS
+    ROLE=actor ACTOR_ID=3 python dqn-apex.py
+"""
+
+import functools
+import multiprocessing as mp
+import os
+
+from dotenv import load_dotenv
+from gymnasium.wrappers import TimeLimit
+from stable_baselines3 import DQN
+from stable_baselines3.common.logger import configure
+
+import ScreepsSpawnEnv as live
+from ApeX import ApeXLearner, actor_epsilon, run_actor
+from MockScreepsServer import MockGame, MockScreepsServer
+from ScreepsCLI import ScreepsCLI
+from ScreepsSim import ScreepsSimEnv
+from ScreepsSpawnEnv import ScreepsSpawnEnv
+from reset import RoomResetter
+
+load_dotenv()
+
+ROLE = os.getenv("ROLE", "all")  # all | learner | actor
+# "sim": offline simulator, "mock": one MockScreepsServer per actor,
+# "live": one private server per actor (ACTOR_HOSTS)
+BACKEND = os.getenv("SCREEPS_BACKEND", "mock")
+N_ACTORS = int(os.getenv("N_ACTORS", "4"))
+ACTOR_ID = int(os.getenv("ACTOR_ID", "0"))
+APEX_HOST, APEX_PORT = os.getenv("APEX_ADDRESS", "127.0.0.1:6010").split(":")
+APEX_KEY = os.getenv("APEX_KEY", "screeps").encode()
+TOTAL_TRANSITIONS = int(os.getenv("TOTAL_TRANSITIONS", "100000"))
+LEARNING_STARTS = int(os.getenv("LEARNING_STARTS", "1000"))
+MOCK_TICK_MS = float(os.getenv("MOCK_TICK_MS", "20"))
+
+try:
+    if BACKEND not in ("sim", "mock", "live"):
+        raise ValueError(f"❌ Unknown SCREEPS_BACKEND {BACKEND!r} (sim|mock|live)")
+    # e.g. "vps:21025,vps:21035": docker compose replicas of setup-server, the
+    # cli port of each one being its game port + 1
+    ACTOR_HOSTS = [h for h in os.getenv("ACTOR_HOSTS", "").split(",") if h]
+    if BACKEND == "live" and len(ACTOR_HOSTS) < N_ACTORS:
+        raise ValueError(f"❌ {N_ACTORS} actors need as many ACTOR_HOSTS")
+    ROOMS = [r for r in os.getenv("ACTOR_ROOMS", "").split(",") if r]
+    USERNAME = os.getenv("USERNAME")
+    PASSWORD = os.getenv("PASSWORD")
+
+except Exception as e:
+    print(e)
+    exit(1)
+
+
+def make_env(i: int):
+    live.DEBUG_RCL = False
+    room = ROOMS[i % len(ROOMS)] if ROOMS else "W7N7"
+    if BACKEND == "sim":
+        env = ScreepsSimEnv()
+    elif BACKEND == "mock":
+        # the server lives in the actor process, it dies with it
+        server = MockScreepsServer(
+            game=MockGame(rooms=[room], seed=i), tick_ms=MOCK_TICK_MS
+        ).start()
+        env = ScreepsSpawnEnv(
+            user="dqn",
+            password="dqn",
+            host=server.host,
+            secure=False,
+            shard="shard0",
+            room=room,
+            resetter=server.resetter(),
+        )
+    else:
+        host = ACTOR_HOSTS[i]
+        name, port = host.split(":")
+        env = ScreepsSpawnEnv(
+            user=USERNAME,
+            password=PASSWORD,
+            host=host,
+            secure=False,
+            shard="shard0",
+            room=room,
+            resetter=RoomResetter(ScreepsCLI(name, int(port) + 1).connect()),
+        )
+    return TimeLimit(env, max_episode_steps=20_000)
+
+
+def actor(i: int) -> None:
+    run_actor(
+        i,
+        (APEX_HOST, int(APEX_PORT)),
+        APEX_KEY,
+        functools.partial(make_env, i),
+        actor_epsilon(i, N_ACTORS),
+        seed=i,
+    )
+
+
+if __name__ == "__main__":
+    if ROLE == "actor":
+        actor(ACTOR_ID)
+        exit(0)
+
+    model = DQN(
+        "MlpPolicy",
+        ScreepsSimEnv(),  # spaces only, the actors own the real envs
+        learning_rate=2.5e-4,
+        gamma=0.99,
+        buffer_size=1_000_000,
+    )
+    model.set_logger(configure("./tb_screeps/DQN_apex", ["stdout", "tensorboard"]))
+    learner = ApeXLearner(model, (APEX_HOST, int(APEX_PORT)), APEX_KEY)
+    print(f"🧠 learner on {APEX_HOST}:{APEX_PORT}")
+
+    procs = []
+    if ROLE == "all":
+        procs = [mp.Process(target=actor, args=(i,)) for i in range(N_ACTORS)]
+        for p in procs:
+            p.start()
+    try:
+        learner.run(TOTAL_TRANSITIONS, LEARNING_STARTS)
+    finally:
+        learner.close()
+        for p in procs:
+            p.join(timeout=30)
+    model.save("dqn_apex")
+    print(f"✅ {learner.transitions} transitions, {learner.updates} gradient steps")
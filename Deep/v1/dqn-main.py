@@ -1,19 +1,52 @@
 from stable_baselines3 import DQN
 from stable_baselines3.common.vec_env import DummyVecEnv, VecMonitor
-from ScreepsSpawnEnv import ScreepsSpawnEnv
+from ScreepsSpawnEnv import LEGACY_ACTIONS, ScreepsSpawnEnv, build_actions
+from ScreepsSim import ScreepsSimEnv
+from ScreepsVecEnv import ScreepsVecEnv
+from AsyncScreepsAPI import SyncScreepsAPI
+from TransitionRecorder import TransitionRecorder
 from gymnasium.wrappers import TimeLimit
 from dotenv import load_dotenv
 import os
 
 from ScreepsMetricsCallback import ScreepsMetricsCallback
+from DynamicsModel import DynaCallback, DynamicsModel
+from MaskedDQN import MaskedDQN
+from stable_baselines3.common.callbacks import CallbackList
 
 load_dotenv()
 
+# "live" trains against the private server, "sim" against the offline simulator,
+# "batch" drives all ROOMS of the user at once (ScreepsVecEnv)
+BACKEND = os.getenv("SCREEPS_BACKEND", "live")
+TOTAL_TIMESTEPS = int(os.getenv("TOTAL_TIMESTEPS", "1000"))
+INIT_MODEL = os.getenv("INIT_MODEL")  # e.g. a model pretrained on the simulator
+# "async": pooled keep-alive aiohttp client instead of screepsapi (requests)
+TRANSPORT = os.getenv("SCREEPS_TRANSPORT", "sync")
+RECORD_DIR = os.getenv("RECORD_DIR")  # keep every transition, e.g. "data/live"
+DYNA = os.getenv("DYNA", "0") == "1"  # synthetic rollouts from a learned model
+# only pick actions main.js can carry out (info["action_mask"])
+MASKED = os.getenv("MASKED", "0") == "1"
+# > 1: main.js runs up to this many ticks between two decisions (live and sim)
+DECISION_INTERVAL = int(os.getenv("DECISION_INTERVAL", "1"))
+ROOMS = [r.strip() for r in os.getenv("ROOMS", "W7N7").split(",") if r.strip()]
+# bodies of MIN_PARTS..BODY_PARTS parts costing at most ENERGY_CAP
+# "legacy" = the 55 ordered actions of models trained before build_actions
+BODY_PARTS = os.getenv("BODY_PARTS", "3")
+ENERGY_CAP = int(os.getenv("ENERGY_CAP", "300"))
+MIN_PARTS = os.getenv("MIN_PARTS")
+
 try:
+    if BACKEND not in ("live", "sim", "batch"):
+        raise ValueError(f"❌ Unknown SCREEPS_BACKEND {BACKEND!r} (live|sim|batch)")
+    if BACKEND == "batch" and DECISION_INTERVAL > 1:
+        raise ValueError("❌ DECISION_INTERVAL needs one env per room (live|sim)")
     VPS_HOST = os.getenv("VPS_HOST")
     SCREEPS_HOST = os.getenv("SCREEPS_HOST", "21025")
     if VPS_HOST and SCREEPS_HOST:
         HOST = f"{VPS_HOST}:{SCREEPS_HOST}"
+    elif BACKEND == "sim":
+        HOST = None
     else:
         raise ValueError("❌ VPS_HOST or SCREEPS_HOST missing in .env")
 
@@ -21,13 +54,41 @@ try:
     PASSWORD = os.getenv("PASSWORD")
     SECURE = os.getenv("SECURE")
 
+    if BODY_PARTS == "legacy":
+        ACTIONS = LEGACY_ACTIONS
+    else:
+        ACTIONS = build_actions(
+            int(BODY_PARTS), ENERGY_CAP, int(MIN_PARTS) if MIN_PARTS else None
+        )
+
 except Exception as e:
     print(e)
     exit(1)
 
 
+APIS = []  # async clients, closed after the envs
+
+
+def make_api():
+    if TRANSPORT == "async":
+        APIS.append(SyncScreepsAPI(u=USERNAME, p=PASSWORD, host=HOST, secure=False))
+        return APIS[-1]
+    return None  # the env builds its own screepsapi.API
+
+
 # Environment
 def make_env():
+    env = make_base_env()
+    if RECORD_DIR:
+        env = TransitionRecorder(env, RECORD_DIR)
+    return env
+
+
+def make_base_env():
+    if BACKEND == "sim":
+        return ScreepsSimEnv(
+            render_mode=None, actions=ACTIONS, decision_interval=DECISION_INTERVAL
+        )
     return ScreepsSpawnEnv(
         user=USERNAME,
         password=PASSWORD,
@@ -35,27 +96,52 @@ def make_env():
         secure=False,
         shard="shard0",
         render_mode=None,
+        api=make_api(),
+        actions=ACTIONS,
+        decision_interval=DECISION_INTERVAL,
     )
 
 
 # MAX_STEPS = 500
-env = DummyVecEnv([make_env])
-env = TimeLimit(env, max_episode_steps=20_000)
+if BACKEND == "batch":
+    env = ScreepsVecEnv(
+        user=USERNAME,
+        password=PASSWORD,
+        host=HOST,
+        secure=False,
+        shard="shard0",
+        rooms=ROOMS,
+        max_episode_steps=20_000,
+        api=make_api(),
+        actions=ACTIONS,
+    )
+else:
+    env = DummyVecEnv([make_env])
+    env = TimeLimit(env, max_episode_steps=20_000)
 env = VecMonitor(env, filename="./logs/monitor.csv")
 
 # Agent
-model = DQN(
-    "MlpPolicy",
-    env,
-    verbose=1,
-    tensorboard_log="./tb_screeps",
-    learning_rate=2.5e-4,
-    gamma=0.99,
-)
+Algo = MaskedDQN if MASKED else DQN
+if INIT_MODEL:
+    model = Algo.load(INIT_MODEL, env=env, tensorboard_log="./tb_screeps")
+else:
+    model = Algo(
+        "MlpPolicy",
+        env,
+        verbose=1,
+        tensorboard_log="./tb_screeps",
+        learning_rate=2.5e-4,
+        gamma=0.99,
+    )
 
 # Callback(s) + training
 callback = ScreepsMetricsCallback()
+if DYNA:
+    callback = CallbackList([callback, DynaCallback(DynamicsModel(ACTIONS))])
 
-model.learn(total_timesteps=1000, progress_bar=True, callback=callback)
+model.learn(total_timesteps=TOTAL_TIMESTEPS, progress_bar=True, callback=callback)
 
 model.save("dqn_spawn")
+env.close()  # flushes the TransitionRecorder
+for api in APIS:
+    api.close()  # aiohttp sessions
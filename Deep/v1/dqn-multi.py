@@ -0,0 +1,100 @@
+"""
+DQN on N rooms of one private server: one bot user per room, one env per
+process (SubprocVecEnv). The agent code is the same as dqn-main.py.
+"""
+
+import json
+import os
+
+from dotenv import load_dotenv
+from stable_baselines3 import DQN
+from stable_baselines3.common.vec_env import SubprocVecEnv, VecMonitor
+
+from ScreepsMetricsCallback import ScreepsMetricsCallback
+from ScreepsSpawnEnv import ScreepsSpawnEnv
+from reset import RoomResetter
+
+load_dotenv()
+
+try:
+    VPS_HOST = os.getenv("VPS_HOST")
+    SCREEPS_HOST = os.getenv("SCREEPS_HOST", "21025")
+    if VPS_HOST and SCREEPS_HOST:
+        HOST = f"{VPS_HOST}:{SCREEPS_HOST}"
+    else:
+        raise ValueError("❌ VPS_HOST or SCREEPS_HOST missing in .env")
+
+    ROOMS = [r.strip() for r in os.getenv("ROOMS", "W7N7").split(",") if r.strip()]
+    BOT_AI = os.getenv("BOT_AI", "dqn")  # `bots:` entry of setup-server/config.yml
+    BOT_PREFIX = os.getenv("BOT_PREFIX", "dqn")
+    BOT_PASSWORD = os.getenv("BOT_PASSWORD")
+    if not BOT_PASSWORD:
+        raise ValueError("❌ BOT_PASSWORD missing in .env")
+    TOTAL_TIMESTEPS = int(os.getenv("TOTAL_TIMESTEPS", "1000"))
+    TICK_SYNC = os.getenv("TICK_SYNC", "0") == "1"
+
+except Exception as e:
+    print(e)
+    exit(1)
+
+
+def bot_name(i: int) -> str:
+    return f"{BOT_PREFIX}{i}"
+
+
+def spawn_bots(cli) -> None:
+    """Creates the missing bot users (one per room) and sets their password.
+
+    `bots.spawn` comes with the server cli, `setPassword` with screepsmod-auth.
+    """
+    for i, room in enumerate(ROOMS):
+        name = json.dumps(bot_name(i))
+        created = cli.eval(
+            f"""(async () => {{
+                if (await storage.db.users.findOne({{ usernameLower: {name}.toLowerCase() }})) return false;
+                await bots.spawn({json.dumps(BOT_AI)}, {json.dumps(room)}, {{ username: {name} }});
+                return true;
+            }})()"""
+        )
+        cli.eval(f"setPassword({name}, {json.dumps(BOT_PASSWORD)})")
+        print(f"{'🤖 created' if created else '✅ found'} {bot_name(i)} in {room}")
+
+
+def make_env(i: int):
+    def _init():
+        return ScreepsSpawnEnv(
+            user=bot_name(i),
+            password=BOT_PASSWORD,
+            host=HOST,
+            secure=False,
+            shard="shard0",
+            render_mode=None,
+            room=ROOMS[i],
+            tick_sync=TICK_SYNC,
+        )
+
+    return _init
+
+
+if __name__ == "__main__":
+    setup = RoomResetter.from_env()
+    try:
+        spawn_bots(setup.cli)
+    finally:
+        setup.close()
+
+    env = SubprocVecEnv([make_env(i) for i in range(len(ROOMS))])
+    env = VecMonitor(env, filename="./logs/monitor_multi.csv")
+
+    model = DQN(
+        "MlpPolicy",
+        env,
+        verbose=1,
+        tensorboard_log="./tb_screeps",
+        learning_rate=2.5e-4,
+        gamma=0.99,
+    )
+
+    callback = ScreepsMetricsCallback()
+    model.learn(total_timesteps=TOTAL_TIMESTEPS, progress_bar=True, callback=callback)
+    model.save("dqn_spawn")
@@ -0,0 +1,130 @@
+"""
+DQN pretrained offline on recorded transitions (TransitionRecorder), then
+optionally fine-tuned online with the replay buffer already full.
+"""
+
+import os
+import time
+
+from dotenv import load_dotenv
+from stable_baselines3 import DQN
+from stable_baselines3.common.logger import configure
+from stable_baselines3.common.utils import polyak_update
+from stable_baselines3.common.vec_env import DummyVecEnv, VecMonitor
+
+from ScreepsMetricsCallback import ScreepsMetricsCallback
+from ScreepsSim import ScreepsSimEnv
+from ScreepsSpawnEnv import LEGACY_ACTIONS, ScreepsSpawnEnv, build_actions
+from TransitionRecorder import TransitionRecorder, fill_replay_buffer
+
+load_dotenv()
+
+DATA_DIR = os.getenv("DATA_DIR", "data/live")
+OFFLINE_STEPS = int(os.getenv("OFFLINE_STEPS", "20000"))  # gradient steps
+OFFLINE_BATCH = int(os.getenv("OFFLINE_BATCH", "4096"))
+TARGET_UPDATE = int(os.getenv("TARGET_UPDATE", "500"))  # gradient steps
+# 0 = pretrain only; otherwise live (or sim) steps after the hand-off
+ONLINE_TIMESTEPS = int(os.getenv("ONLINE_TIMESTEPS", "0"))
+BACKEND = os.getenv("SCREEPS_BACKEND", "live")
+RECORD_DIR = os.getenv("RECORD_DIR")  # keep recording during the online phase
+# replay capacity, also during fine-tuning; only the newest rows are loaded
+BUFFER_SIZE = int(os.getenv("BUFFER_SIZE", "1000000"))
+# the action table the dataset was recorded with (see dqn-main.py)
+BODY_PARTS = os.getenv("BODY_PARTS", "3")
+ENERGY_CAP = int(os.getenv("ENERGY_CAP", "300"))
+MIN_PARTS = os.getenv("MIN_PARTS")
+
+try:
+    if not os.path.isdir(DATA_DIR):
+        raise ValueError(
+            f"❌ No recorded transitions in {DATA_DIR} (RECORD_DIR of dqn-main.py)"
+        )
+    HOST = None
+    if ONLINE_TIMESTEPS and BACKEND == "live":
+        VPS_HOST = os.getenv("VPS_HOST")
+        SCREEPS_HOST = os.getenv("SCREEPS_HOST", "21025")
+        if not (VPS_HOST and SCREEPS_HOST):
+            raise ValueError("❌ VPS_HOST or SCREEPS_HOST missing in .env")
+        HOST = f"{VPS_HOST}:{SCREEPS_HOST}"
+    USERNAME = os.getenv("USERNAME")
+    PASSWORD = os.getenv("PASSWORD")
+
+    if BODY_PARTS == "legacy":
+        ACTIONS = LEGACY_ACTIONS
+    else:
+        ACTIONS = build_actions(
+            int(BODY_PARTS), ENERGY_CAP, int(MIN_PARTS) if MIN_PARTS else None
+        )
+
+except Exception as e:
+    print(e)
+    exit(1)
+
+
+def make_env():
+    if BACKEND == "sim" or not ONLINE_TIMESTEPS:
+        # same spaces, no server needed
+        env = ScreepsSimEnv(render_mode=None, actions=ACTIONS)
+    else:
+        env = ScreepsSpawnEnv(
+            user=USERNAME,
+            password=PASSWORD,
+            host=HOST,
+            secure=False,
+            shard="shard0",
+            render_mode=None,
+            actions=ACTIONS,
+        )
+    if RECORD_DIR and ONLINE_TIMESTEPS:
+        env = TransitionRecorder(env, RECORD_DIR)
+    return env
+
+
+def pretrain(model: DQN) -> None:
+    """Batched DQN updates over the whole dataset, target net synced by hand."""
+    start = time.perf_counter()
+    done = 0
+    while done < OFFLINE_STEPS:
+        k = min(TARGET_UPDATE, OFFLINE_STEPS - done)
+        model.train(gradient_steps=k, batch_size=OFFLINE_BATCH)
+        polyak_update(model.q_net.parameters(), model.q_net_target.parameters(), 1.0)
+        done += k
+        model.logger.record("offline/gradient_steps", done)
+        model.logger.dump(done)
+    print(f"✅ {done} gradient steps in {time.perf_counter() - start:.1f}s")
+
+
+if __name__ == "__main__":
+    env = VecMonitor(DummyVecEnv([make_env]), filename="./logs/monitor_offline.csv")
+
+    model = DQN(
+        "MlpPolicy",
+        env,
+        verbose=1,
+        tensorboard_log="./tb_screeps",
+        learning_rate=2.5e-4,
+        gamma=0.99,
+        buffer_size=BUFFER_SIZE,
+        learning_starts=0,  # the buffer is filled from the recorded files
+        exploration_initial_eps=0.1,  # the policy is no longer random
+    )
+    try:
+        # action ids are only meaningful under the table they were recorded with
+        n = fill_replay_buffer(model.replay_buffer, DATA_DIR, ACTIONS)
+    except ValueError as e:
+        print(e)
+        exit(1)
+    print(f"📼 {n} recorded transitions from {DATA_DIR}")
+    model.set_logger(configure("./tb_screeps/DQN_offline", ["stdout", "tensorboard"]))
+    pretrain(model)
+    model.save("dqn_offline")
+
+    if ONLINE_TIMESTEPS:
+        # online steps go after the recorded rows, never into the files
+        model.learn(
+            total_timesteps=ONLINE_TIMESTEPS,
+            progress_bar=True,
+            callback=ScreepsMetricsCallback(),
+        )
+        model.save("dqn_spawn")
+    env.close()
@@ -0,0 +1,204 @@
+"""
+Exports the Q-network of a trained DQN (dqn_spawn.zip) to a Screeps module,
+policy.js: weights in one base64 Float32Array, a dense forward pass and the
+action table, so main.js can pick spawns in game (Memory.dqn_local = 1).
+
+The export is checked against the Python policy with node on recorded
+observations (DATA_DIR of TransitionRecorder) or simulated ones.
+"""
+
+import base64
+import json
+import os
+import subprocess
+import tempfile
+
+import numpy as np
+import torch as th
+from dotenv import load_dotenv
+from stable_baselines3 import DQN
+
+from ScreepsSim import ScreepsSimEnv
+from ScreepsSpawnEnv import LEGACY_ACTIONS, action_table, build_actions
+from TransitionRecorder import load_transitions
+
+load_dotenv()
+
+MODEL = os.getenv("MODEL", "dqn_spawn")
+OUT = os.getenv("OUT", "policy.js")
+DATA_DIR = os.getenv("DATA_DIR")  # observations for the parity check
+PARITY_SAMPLES = int(os.getenv("PARITY_SAMPLES", "2000"))
+# same action table as the training run (see dqn-main.py)
+BODY_PARTS = os.getenv("BODY_PARTS", "3")
+ENERGY_CAP = int(os.getenv("ENERGY_CAP", "300"))
+MIN_PARTS = os.getenv("MIN_PARTS")
+
+ACTIVATIONS = {th.nn.ReLU: "relu", th.nn.Tanh: "tanh"}
+
+JS_TEMPLATE = """// policy.js, generated by export-policy.py from {model}: do not edit.
+// Q(obs) of the DQN, a dense forward pass over Float32Array weights.
+const LAYERS = {layers};
+const ACTIVATION = "{activation}";
+const ACTIONS = {actions};
+const WEIGHTS = "{weights}";
+
+function decode(b64) {{
+  // no Buffer/atob in the game sandbox
+  const abc = "ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789+/";
+  const pad = b64.endsWith("==") ? 2 : b64.endsWith("=") ? 1 : 0;
+  const bytes = new Uint8Array(((b64.length * 3) >> 2) - pad);
+  for (let i = 0, j = 0; i < b64.length; i += 4) {{
+    const n = (abc.indexOf(b64[i]) << 18) | (abc.indexOf(b64[i + 1]) << 12) |
+      ((abc.indexOf(b64[i + 2]) & 63) << 6) | (abc.indexOf(b64[i + 3]) & 63);
+    if (j < bytes.length) bytes[j++] = n >> 16;
+    if (j < bytes.length) bytes[j++] = (n >> 8) & 255;
+    if (j < bytes.length) bytes[j++] = n & 255;
+  }}
+  return new Float32Array(bytes.buffer);
+}}
+
+// decoded once per global reset, layer buffers reused every call
+const W = decode(WEIGHTS);
+const OUT = LAYERS.slice(1).map((n) => new Float32Array(n));
+
+function q(obs) {{
+  let x = obs;
+  let off = 0;
+  for (let l = 0; l < OUT.length; l++) {{
+    const nIn = LAYERS[l], nOut = LAYERS[l + 1], y = OUT[l];
+    const last = l === OUT.length - 1;
+    for (let o = 0; o < nOut; o++) {{
+      let s = W[off + nIn * nOut + o]; // bias
+      const row = off + o * nIn;
+      for (let i = 0; i < nIn; i++) s += W[row + i] * x[i];
+      y[o] = last ? s : ACTIVATION === "relu" ? (s > 0 ? s : 0) : Math.tanh(s);
+    }}
+    off += nIn * nOut + nOut;
+    x = y;
+  }}
+  return x;
+}}
+
+// greedy action, restricted to the "1" entries of `mask` (dqnMask) if given
+function act(obs, mask) {{
+  const values = q(obs);
+  let best = -1;
+  for (let a = 0; a < values.length; a++) {{
+    if (mask && mask[a] !== "1") continue;
+    if (best < 0 || values[a] > values[best]) best = a;
+  }}
+  return best < 0 ? ACTIONS.length - 1 : best;
+}}
+
+module.exports = {{ ACTIONS, q, act }};
+"""
+
+PARITY_JS = """
+const policy = require(process.argv[1]);
+const rows = JSON.parse(require("fs").readFileSync(process.argv[2], "utf8"));
+const out = rows.map((obs) => Array.from(policy.q(obs)));
+process.stdout.write(JSON.stringify(out));
+"""
+
+
+def export_weights(model: DQN):
+    """(layer sizes, activation name, flat float32 weights) of the Q-network."""
+    linears = [m for m in model.q_net.q_net if isinstance(m, th.nn.Linear)]
+    acts = {type(m) for m in model.q_net.q_net if not isinstance(m, th.nn.Linear)}
+    if len(acts) > 1 or not acts <= set(ACTIVATIONS):
+        raise ValueError(f"❌ Unsupported activations {acts}")
+    activation = ACTIVATIONS[acts.pop()] if acts else "relu"
+    layers = [linears[0].in_features] + [m.out_features for m in linears]
+    # per layer: weight (out, in) row-major, then bias
+    flat = np.concatenate(
+        [
+            np.concatenate(
+                [m.weight.detach().cpu().numpy().ravel(), m.bias.detach().cpu().numpy()]
+            )
+            for m in linears
+        ]
+    ).astype("<f4")
+    return layers, activation, flat
+
+
+def parity_observations(n: int) -> np.ndarray:
+    if DATA_DIR:
+        obs = np.asarray(load_transitions(DATA_DIR)["obs"])
+        if len(obs):
+            idx = np.random.default_rng(0).choice(
+                len(obs), min(n, len(obs)), replace=False
+            )
+            return obs[idx]
+    env, rows = ScreepsSimEnv(), []
+    obs, _ = env.reset(seed=0)
+    while len(rows) < n:
+        rows.append(obs)
+        obs, _, done, _, _ = env.step(env.action_space.sample())
+        if done:
+            obs, _ = env.reset()
+    return np.array(rows, dtype=np.float32)
+
+
+def parity_check(model: DQN, path: str, n: int) -> bool:
+    obs = parity_observations(n)
+    with th.no_grad():
+        expected = model.q_net(th.as_tensor(obs, device=model.device)).cpu().numpy()
+    with tempfile.NamedTemporaryFile("w", suffix=".json", delete=False) as f:
+        json.dump(obs.tolist(), f)
+    try:
+        out = subprocess.run(
+            ["node", "-e", PARITY_JS, os.path.abspath(path), f.name],
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+    finally:
+        os.unlink(f.name)
+    got = np.array(json.loads(out.stdout), dtype=np.float32)
+
+    err = float(np.abs(got - expected).max())
+    scale = max(float(np.abs(expected).max()), 1.0)
+    same = got.argmax(1) == expected.argmax(1)
+    # a different argmax is only a failure when the Python top-2 are apart
+    top2 = np.sort(expected, axis=1)[:, -2:]
+    real = ~same & (top2[:, 1] - top2[:, 0] > 1e-4 * scale)
+    print(
+        f"🔎 {len(obs)} observations: max |ΔQ| {err:.2e}, "
+        f"same action {same.mean():.2%}, real mismatches {int(real.sum())}"
+    )
+    return err <= 1e-4 * scale and not real.any()
+
+
+if __name__ == "__main__":
+    model = DQN.load(MODEL, device="cpu")
+    if BODY_PARTS == "legacy":
+        actions = LEGACY_ACTIONS
+    else:
+        actions = build_actions(
+            int(BODY_PARTS), ENERGY_CAP, int(MIN_PARTS) if MIN_PARTS else None
+        )
+    if len(actions) != model.action_space.n:
+        print(
+            f"❌ {MODEL} has {model.action_space.n} actions, BODY_PARTS={BODY_PARTS} gives {len(actions)}"
+        )
+        exit(1)
+
+    layers, activation, flat = export_weights(model)
+    with open(OUT, "w") as f:
+        f.write(
+            JS_TEMPLATE.format(
+                model=os.path.basename(MODEL),
+                layers=json.dumps(layers),
+                activation=activation,
+                actions=json.dumps(action_table(actions), separators=(",", ":")),
+                weights=base64.b64encode(flat.tobytes()).decode(),
+            )
+        )
+    print(
+        f"✅ {OUT}: layers {layers}, {flat.size} weights, {os.path.getsize(OUT) / 1024:.1f} KiB"
+    )
+
+    if not parity_check(model, OUT, PARITY_SAMPLES):
+        print("❌ policy.js does not match the Python policy")
+        exit(1)
+    print("✅ parity with the Python policy")
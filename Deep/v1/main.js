@@ -1,22 +1,188 @@
 // main.js
 const creepAI = require("creep");
-module.exports.loop = function () {
-  
-  const room = Object.values(Game.rooms).find(
+
+// policy.js (export-policy.py): the trained DQN acting in game
+let policy = null;
+try {
+  policy = require("policy");
+} catch (e) {
+  // not deployed, Python drives the spawns
+}
+
+// Resident DQN handler: applies Memory.dqn_action = {seq, id} (index in
+// Memory.dqn_actions, null entries are WAIT) and publishes
+// Memory.dqn_step = {seq, tick, obs, creeps, mask}. `seq` is the last action
+// applied *before* this tick, so Python reads the state that follows its action.
+// With Memory.dqn_sync the step is also logged, so the websocket console feed
+// (TickStream.py) delivers it as soon as the tick ends.
+function dqnRoom() {
+  // Memory.dqn_room is set by ScreepsSpawnEnv(room=...)
+  const named = Memory.dqn_room && Game.rooms[Memory.dqn_room];
+  if (named && named.controller && named.controller.my) return named;
+  return Object.values(Game.rooms).find(
     (r) => r.controller && r.controller.my
   );
-  if (room) {
+}
+
+function dqnCreeps(room) {
+  return _.filter(
+    Game.creeps,
+    (c) => (c.memory.room || c.room.name) === room.name
+  );
+}
+
+function dqnObservation(room) {
+  const creeps = dqnCreeps(room);
+  const work = (role) =>
+    _.sum(
+      _.filter(creeps, (c) => c.memory.role === role).map((c) =>
+        c.getActiveBodyparts(WORK)
+      )
+    );
+  return [
+    room.energyAvailable >= 200 ? 1 : 0,
+    work("harvester"),
+    work("upgrader"),
+    room.controller.level,
+    Math.floor(room.controller.progress / 100),
+  ];
+}
+
+// Energy guard of a SPAWN (act.cost is precomputed by action_table in Python)
+function dqnAffordable(room, act) {
+  return room.energyAvailable >= Math.max(200, act.cost || 0);
+}
+
+// Actions dqnApply can carry out now, one "1"/"0" char per Memory.dqn_actions
+// entry (WAIT is always valid), so the agent can skip no-op spawns.
+function dqnMask(room, table = Memory.dqn_actions || []) {
+  const idle = _.some(room.find(FIND_MY_SPAWNS), (s) => !s.spawning);
+  return table
+    .map((act) => (!act || (idle && dqnAffordable(room, act)) ? "1" : "0"))
+    .join("");
+}
+
+// true once the action is carried out (WAIT and unknown ids at once)
+function dqnApply(room, id, table = Memory.dqn_actions || []) {
+  const act = table[id];
+  if (!act) return true; // WAIT or unknown id
+  const sp = _.find(room.find(FIND_MY_SPAWNS), (s) => !s.spawning);
+  if (sp && dqnAffordable(room, act)) {
+    return (
+      // the room in the name: rooms of one user may spawn on the same tick
+      sp.spawnCreep(
+        act.body,
+        `${act.role[0].toUpperCase()}_${room.name}_${Game.time}`,
+        { memory: { role: act.role, room: room.name } }
+      ) === OK
+    );
+  }
+  return false;
+}
+
+// Decision-interval mode (Memory.dqn_skip = k > 1): the action stays pending
+// in Memory.dqn_macro and is retried every tick until it is carried out, and
+// the step is only published once a decision is needed again: k ticks went
+// by, the level changed, or the action is done and some spawn is possible.
+// The states of the ticks in between go to dqn_step.trail for the reward.
+function dqnDue(macro, obs, mask) {
+  if (Game.time - macro.at >= Memory.dqn_skip || obs[3] !== macro.level) {
+    return true;
+  }
+  const acts = Memory.dqn_actions || [];
+  return macro.done && acts.some((act, i) => act && mask[i] === "1");
+}
+
+function dqnHandler(room) {
+  const obs = dqnObservation(room);
+  const mask = dqnMask(room);
+  const macro = Memory.dqn_macro;
+  if (macro && !dqnDue(macro, obs, mask)) {
+    macro.trail.push(obs);
+    if (!macro.done) macro.done = dqnApply(room, macro.id);
+    return;
+  }
+  delete Memory.dqn_macro;
+
+  const applied = Memory.dqn_applied || 0;
+  Memory.dqn_step = {
+    seq: applied,
+    tick: Game.time,
+    obs,
+    creeps: dqnCreeps(room).length,
+    mask,
+    trail: macro ? macro.trail : [],
+  };
+  if (Memory.dqn_sync) console.log("DQN " + JSON.stringify(Memory.dqn_step));
+
+  const cmd = Memory.dqn_action;
+  if (cmd && cmd.seq !== applied) {
+    const done = dqnApply(room, cmd.id);
+    Memory.dqn_applied = cmd.seq;
+    if (Memory.dqn_skip > 1) {
+      Memory.dqn_macro = {
+        id: cmd.id,
+        at: Game.time,
+        level: obs[3],
+        done,
+        trail: [],
+      };
+    }
+  }
+}
+
+// Batched variant for ScreepsVecEnv: one user, Memory.dqn_rooms = [names].
+// Memory.dqn_action.id holds one action per room and the whole batch is
+// published in Memory.dqn_batch = {seq, tick, obs: [[5] per room], creeps, mask}.
+function dqnBatchHandler(names) {
+  const rooms = names.map((name) => {
+    const r = Game.rooms[name];
+    return r && r.controller && r.controller.my ? r : null;
+  });
+  const applied = Memory.dqn_applied || 0;
+  Memory.dqn_batch = {
+    seq: applied,
+    tick: Game.time,
+    obs: rooms.map((r) => (r ? dqnObservation(r) : [0, 0, 0, 1, 0])),
+    creeps: rooms.map((r) => (r ? dqnCreeps(r).length : 0)),
+    mask: rooms.map((r) => (r ? dqnMask(r) : "")),
+  };
+  if (Memory.dqn_sync) console.log("DQN " + JSON.stringify(Memory.dqn_batch));
+
+  const cmd = Memory.dqn_action;
+  if (cmd && cmd.seq !== applied) {
+    const ids = Array.isArray(cmd.id) ? cmd.id : [];
+    rooms.forEach((r, i) => r && dqnApply(r, ids[i]));
+    Memory.dqn_applied = cmd.seq;
+  }
+}
+
+// Memory.dqn_local = 1 with policy.js deployed: every owned room picks its
+// spawns with the exported Q-network, no Python loop and no round trip.
+function dqnLocalHandler() {
+  for (const room of Object.values(Game.rooms)) {
+    if (!room.controller || !room.controller.my) continue;
+    const mask = dqnMask(room, policy.ACTIONS);
+    // only WAIT is possible: no forward pass
+    if (mask.indexOf("1") === mask.length - 1) continue;
+    dqnApply(room, policy.act(dqnObservation(room), mask), policy.ACTIONS);
+  }
+}
+
+module.exports.loop = function () {
+
+  const room = dqnRoom();
+  if (policy && Memory.dqn_local) {
+    dqnLocalHandler();
+  } else if (Array.isArray(Memory.dqn_rooms)) {
+    dqnBatchHandler(Memory.dqn_rooms);
+  } else if (room) {
     Memory.dqn_ctrl_level = room.controller.level;
+    dqnHandler(room);
   }
 
-  const alive = _.filter(Game.creeps, (c) => !c.spawning);
-  Memory.dqn_creep_count = alive.length;
-  console.log(Memory.dqn_creep_count);
   for (const name in Game.creeps) {
     const creep = Game.creeps[name];
-    const room = Object.values(Game.rooms).find(
-      (r) => r.controller && r.controller.my
-    );
 
     if (
       !creep.getActiveBodyparts(WORK) ||
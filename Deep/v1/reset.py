@@ -1,9 +1,13 @@
 #!/usr/bin/env python3
-import time
+import json
 import sys
+import time
+from typing import List
 from dotenv import load_dotenv
 import os, paramiko
 
+from ScreepsCLI import ScreepsCLI, CLI_PORT
+
 
 load_dotenv()
 
@@ -11,23 +15,30 @@ VPS_HOST = os.getenv("VPS_HOST")
 VPS_PORT = int(os.getenv("VPS_SSH_PORT", "22"))
 VPS_USER = os.getenv("VPS_USER", "debian")
 VPS_PASSWORD = os.getenv("VPS_PASSWORD")
+# "ssh" (docker compose exec … cli on the VPS) or "tcp" (cli port exposed)
+RESET_TRANSPORT = os.getenv("RESET_TRANSPORT", "ssh")
+SCREEPS_CLI_PORT = int(os.getenv("SCREEPS_CLI_PORT", str(CLI_PORT)))
 
-if VPS_HOST is None or VPS_PASSWORD is None:
-    sys.exit("❌ VPS_HOST or VPS_PASSWORD missing in .env")
 
+# Screeps commands to reset one room (`room` is a JS expression if not quoted)
+def reset_commands(room: str, quoted: bool = True):
+    r = f"'{room}'" if quoted else room
+    return [
+        f"storage.db['rooms.objects'].removeWhere({{room: {r}, type: 'creep'}})",
+        f"storage.db['rooms.objects'].update({{room: {r}, type: 'controller'}}, {{$set: {{level: 1, progress: 0, progressTotal: 200}}, $unset: {{downgradeTime: 1, upgradeBlocked: 1, safeMode: 1, safeModeAvailable: 1, safeModeCooldown: 1}}}})",
+        f"storage.db['rooms.objects'].update({{room: {r}, type: 'spawn'}}, {{$set: {{store: {{energy: 300}}, storeCapacity: 300}}}})",
+        f"storage.db['rooms.objects'].removeWhere({{room: {r}, type: {{$in: ['extension', 'road', 'constructedWall', 'rampart', 'link', 'storage', 'tower', 'observer', 'powerBank', 'powerSpawn', 'extractor', 'lab', 'terminal', 'container', 'nuker']}}}})",
+        f"storage.db['rooms.objects'].removeWhere({{room: {r}, type: 'constructionSite'}})",
+    ]
 
-# Screeps commands to reset the room W7N7
-SCREEPS_COMMANDS = [
-    "storage.db['rooms.objects'].removeWhere({room: 'W7N7', type: 'creep'})",
-    "storage.db['rooms.objects'].update({room: 'W7N7', type: 'controller'}, {$set: {level: 1, progress: 0, progressTotal: 200}, $unset: {downgradeTime: 1, upgradeBlocked: 1, safeMode: 1, safeModeAvailable: 1, safeModeCooldown: 1}})",
-    "storage.db['rooms.objects'].update({room: 'W7N7', type: 'spawn'}, {$set: {store: {energy: 300}, storeCapacity: 300}})",
-    "storage.db['rooms.objects'].removeWhere({room: 'W7N7', type: {$in: ['extension', 'road', 'constructedWall', 'rampart', 'link', 'storage', 'tower', 'observer', 'powerBank', 'powerSpawn', 'extractor', 'lab', 'terminal', 'container', 'nuker']}})",
-    "storage.db['rooms.objects'].removeWhere({room: 'W7N7', type: 'constructionSite'})",
-]
+
+ROOM = os.getenv("ROOM", "W7N7")
 
 
 def connect_ssh():
     """Establishes the SSH connection to the VPS."""
+    if VPS_HOST is None or VPS_PASSWORD is None:
+        sys.exit("❌ VPS_HOST or VPS_PASSWORD missing in .env")
     try:
         print(f"Connecting to {VPS_HOST}:{VPS_PORT}…")
         client = paramiko.SSHClient()
@@ -44,80 +55,62 @@ def connect_ssh():
         sys.exit(f"❌ SSH connection error: {e}")
 
 
-def execute_command(ssh_client, command, wait_time=2):
-    """Executes a command and displays the result"""
-    try:
-        print(f"Executing: {command}")
-        stdin, stdout, stderr = ssh_client.exec_command(command)
-
-        # Wait for the command to complete
-        time.sleep(wait_time)
-
-        # Read the outputs
-        output = stdout.read().decode("utf-8").strip()
-        error = stderr.read().decode("utf-8").strip()
-
-        if output:
-            print(f"✅ Output: {output}")
-        if error:
-            print(f"⚠️ Error: {error}")
+class RoomResetter:
+    """Long-lived reset service holding one warm cli channel.
+
+    The SSH session (or TCP connection) and the cli are opened once; every
+    `reset(room)` then sends the room's reset commands as a single batched expression
+    and returns as soon as the cli reports that all of them completed.
+    """
+
+    def __init__(self, cli: ScreepsCLI, ssh_client=None):
+        self.cli = cli
+        self._ssh = ssh_client
+
+    @classmethod
+    def from_env(cls, transport: str = RESET_TRANSPORT) -> "RoomResetter":
+        if transport == "tcp":
+            if VPS_HOST is None:
+                sys.exit("❌ VPS_HOST missing in .env")
+            return cls(ScreepsCLI(VPS_HOST, SCREEPS_CLI_PORT).connect())
+        ssh_client = connect_ssh()
+        return cls(ScreepsCLI.over_ssh(ssh_client), ssh_client)
+
+    def reset(self, room: str = "W7N7"):
+        """Applies every command in one cli round trip, returns their results."""
+        return self.cli.eval(f"Promise.all([{', '.join(reset_commands(room))}])")
+
+    def reset_rooms(self, rooms: List[str]):
+        """Resets several rooms in the same single round trip."""
+        commands = ", ".join(reset_commands("room", quoted=False))
+        return self.cli.eval(
+            f"Promise.all({json.dumps(list(rooms))}.flatMap((room) => [{commands}]))"
+        )
 
-        return output, error
-
-    except Exception as e:
-        print(f"❌ Error during execution: {e}")
-        return None, str(e)
+    def close(self):
+        self.cli.close()
+        if self._ssh is not None:
+            self._ssh.close()
 
 
 def main():
-    print("🚀 Starting the reset script for room W7N7")
+    print(f"🚀 Starting the reset script for room {ROOM}")
     print("=" * 50)
 
-    # SSH connection
-    ssh_client = connect_ssh()
+    resetter = RoomResetter.from_env()
 
     try:
-        # Navigate to the Screepfinal folder
-        print("\n📁 Navigating to the Screepfinal folder...")
-        execute_command(ssh_client, "cd Screepfinal && pwd")
-
-        # Start the Screeps CLI with Docker Compose
-        print("\n🐳 Starting the Screeps CLI...")
-
-        # Create an interactive session for the CLI
-        channel = ssh_client.invoke_shell()
-
-        # Send commands to the channel
-        channel.send("cd Screepfinal\n")
-        time.sleep(1)
-
-        channel.send("sudo docker compose exec screeps screeps-launcher cli\n")
-        time.sleep(3)  # Wait for the CLI to start
-
         print("\n🔧 Executing reset commands...")
+        start = time.perf_counter()
+        results = resetter.reset(ROOM)
+        elapsed = time.perf_counter() - start
 
-        # Execute each Screeps command
-        for i, command in enumerate(SCREEPS_COMMANDS, 1):
-            print(f"\n[{i}/{len(SCREEPS_COMMANDS)}] {command}")
-
-            # Send the command
-            channel.send(f"{command}\n")
-            channel.send("\n")
-            time.sleep(2)  # Wait for execution
-
-            # Read the response
-            if channel.recv_ready():
-                response = channel.recv(4096).decode("utf-8")
-                print(f"Response: {response.strip()}")
-
-        # Quit the CLI
-        print("\n🚪 Quitting the CLI...")
-        channel.send("exit\n")
-        time.sleep(1)
-
-        channel.close()
+        commands = reset_commands(ROOM)
+        for i, (command, result) in enumerate(zip(commands, results), 1):
+            print(f"\n[{i}/{len(commands)}] {command}")
+            print(f"Response: {json.dumps(result)}")
 
-        print("\n✅ Reset of room W7N7 completed successfully!")
+        print(f"\n✅ Reset of room {ROOM} completed successfully in {elapsed:.3f}s!")
         print("=" * 50)
         print("Summary of actions taken:")
         print("- Removed all creeps")
@@ -125,15 +118,13 @@ def main():
         print("- Configured spawner to 300 energy")
         print("- Cleaned up non-permanent structures")
         print("- Removed construction sites")
-        print("- Cleaned up room intents")
 
     except Exception as e:
         print(f"❌ Error during execution: {e}")
 
     finally:
-        # Close the SSH connection
-        ssh_client.close()
-        print("\n🔒 SSH connection closed")
+        resetter.close()
+        print("\n🔒 CLI connection closed")
 
 
 if __name__ == "__main__":
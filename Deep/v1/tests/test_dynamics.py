@@ -0,0 +1,94 @@
+"""
+DynamicsModel checks on simulator transitions (python -m pytest tests)
+"""
+
+import os
+import sys
+
+import numpy as np
+from stable_baselines3.common.buffers import ReplayBuffer
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from DynamicsModel import DynamicsModel, add_to_buffer, reward_batch  # noqa: E402
+from MaskedDQN import MaskedReplayBuffer  # noqa: E402
+from ScreepsSim import ScreepsSimVecEnv  # noqa: E402
+from ScreepsSpawnEnv import ACTIONS, ScreepsSpawnEnv  # noqa: E402
+
+
+def collect(n: int, seed: int):
+    """(obs, action, next_obs) of random actions in 64 simulated rooms."""
+    env = ScreepsSimVecEnv(64, seed=seed, max_episode_steps=400)
+    rng = np.random.default_rng(seed)
+    obs, rows = env.reset(), []
+    while len(rows) * 64 < n:
+        actions = rng.integers(env.action_space.n, size=64)
+        env.step_async(actions)
+        new_obs, _, dones, infos = env.step_wait()
+        nxt = new_obs.copy()
+        for i in np.flatnonzero(dones):
+            nxt[i] = infos[i]["terminal_observation"]
+        rows.append((obs, actions, nxt))
+        obs = new_obs
+    return [np.concatenate(c) for c in zip(*rows)]
+
+
+def test_skill_against_no_change():
+    train, test = collect(20_000, seed=0), collect(2_048, seed=1)
+    no_change = DynamicsModel(seed=0)  # empty: predicts no change
+    fitted = DynamicsModel(seed=0)
+    fitted.add(*train)
+
+    assert no_change.skill(*test) < 0.05
+    assert fitted.skill(*test) > no_change.skill(*test) + 0.1
+
+
+def test_synthetic_reward_matches_env():
+    rng = np.random.default_rng(0)
+    prev = rng.integers(0, [2, 10, 10, 3, 300], size=(1000, 5)).astype(np.float32)
+    curr = np.clip(prev + rng.integers(-2, 3, size=prev.shape), [0, 0, 0, 1, 0], None)
+    actions = rng.integers(len(ACTIONS), size=len(prev))
+
+    live = [
+        ScreepsSpawnEnv._compute_reward(None, p, c, ACTIONS[a])
+        for p, c, a in zip(prev, curr, actions)
+    ]
+    np.testing.assert_allclose(reward_batch(prev, curr, actions), live, rtol=1e-6)
+
+
+def test_add_to_buffer_fills_every_env_column():
+    env = ScreepsSimVecEnv(4, seed=0)
+    buffer = ReplayBuffer(8, env.observation_space, env.action_space, n_envs=4)
+    n = 10
+    batch = {
+        "obs": np.arange(n * 5, dtype=np.float32).reshape(n, 5),
+        "next_obs": np.zeros((n, 5), dtype=np.float32),
+        "action": np.arange(n),
+        "reward": np.arange(n, dtype=np.float32),
+        "done": np.zeros(n, dtype=bool),
+    }
+    add_to_buffer(buffer, batch)
+
+    assert buffer.pos == 0 and buffer.full  # 2 rows of 4, the last 2 dropped
+    np.testing.assert_array_equal(buffer.rewards, [[0, 1, 2, 3], [4, 5, 6, 7]])
+    np.testing.assert_array_equal(buffer.actions[..., 0], buffer.rewards)
+    np.testing.assert_array_equal(buffer.observations[1, 2], batch["obs"][6])
+
+
+def test_add_to_buffer_resets_next_masks():
+    env = ScreepsSimVecEnv(1, seed=0)
+    buffer = MaskedReplayBuffer(4, env.observation_space, env.action_space)
+    buffer.next_masks[:] = 0  # stale masks of earlier transitions
+    n = 3
+    add_to_buffer(
+        buffer,
+        {
+            "obs": np.zeros((n, 5), dtype=np.float32),
+            "next_obs": np.zeros((n, 5), dtype=np.float32),
+            "action": np.zeros(n, dtype=np.int64),
+            "reward": np.zeros(n, dtype=np.float32),
+            "done": np.zeros(n, dtype=bool),
+        },
+    )
+    assert (buffer.next_masks[:n] == 255).all()
+    assert (buffer.next_masks[n:] == 0).all()
@@ -0,0 +1,116 @@
+"""
+ScreepsSpawnEnv / ScreepsVecEnv against MockScreepsServer, no game server needed
+(python -m pytest tests)
+"""
+
+import os
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import ScreepsSpawnEnv as live  # noqa: E402
+from MockScreepsServer import MockGame, MockScreepsServer  # noqa: E402
+from ScreepsSpawnEnv import (  # noqa: E402
+    ACTIONS,
+    ScreepsSpawnEnv,
+    spawn_reward,
+    spawns_without_move,
+)
+from ScreepsVecEnv import ScreepsVecEnv  # noqa: E402
+
+ROOMS = ["W7N7", "W8N7"]
+SPAWN = next(i for i, a in enumerate(ACTIONS) if a["type"] == "SPAWN")
+WAIT = len(ACTIONS) - 1
+
+
+@pytest.fixture
+def server():
+    live.DEBUG_RCL = False
+    srv = MockScreepsServer(game=MockGame(ROOMS, seed=0), tick_ms=None).start()
+    yield srv
+    srv.stop()
+
+
+def one_tick_per_poll(env, game):
+    # the game clock is the env's polling: one tick per wait, deterministic
+    env._chan.wait_tick = lambda n=1: game.tick()
+
+
+def reward(prev, obs, action):
+    return spawn_reward(prev, obs, spawns_without_move([ACTIONS[action]]))[0]
+
+
+def test_spawn_env_polling(server):
+    env = ScreepsSpawnEnv(
+        user="dqn",
+        password="dqn",
+        host=server.host,
+        secure=False,
+        shard="shard0",
+        room=ROOMS[0],
+        resetter=server.resetter(),
+    )
+    one_tick_per_poll(env, server.game)
+    try:
+        obs, info = env.reset()
+        assert env._step_data["seq"] == env._chan.seq == 1
+        np.testing.assert_array_equal(obs, [1, 0, 0, 1, 0])
+        assert info["action_mask"].all()
+
+        prev = obs
+        obs, r, terminated, _, info = env.step(SPAWN)
+        step = server.game.memory["dqn_step"]
+        assert step["seq"] == env._chan.seq == 2  # acknowledged
+        assert step["creeps"] == 1
+        np.testing.assert_array_equal(obs, step["obs"])
+        assert obs[0] == 0  # energy went into the creep
+        assert info["action_mask"].tolist() == [False] * WAIT + [True]
+        assert info["ticks"] == 2  # published before the action is applied
+        assert r == pytest.approx(reward(prev, obs, SPAWN))
+        assert not terminated
+
+        prev = obs
+        obs, r, _, _, info = env.step(WAIT)
+        assert server.game.memory["dqn_step"]["seq"] == env._chan.seq == 3
+        assert r == pytest.approx(reward(prev, obs, WAIT))
+        assert info["counters"].get("stale_steps", 0) == 0
+    finally:
+        env.close()
+
+
+def test_vec_env_polling(server):
+    env = ScreepsVecEnv(
+        user="dqn",
+        password="dqn",
+        host=server.host,
+        secure=False,
+        shard="shard0",
+        rooms=ROOMS,
+        resetter=server.resetter(),
+    )
+    one_tick_per_poll(env, server.game)
+    try:
+        prev = env.reset()
+        np.testing.assert_array_equal(prev, [[1, 0, 0, 1, 0]] * 2)
+        assert env.action_masks().all()
+
+        env.step_async(np.array([SPAWN, WAIT]))
+        obs, rewards, dones, infos = env.step_wait()
+        batch = server.game.memory["dqn_batch"]
+        assert batch["seq"] == env._chan.seq  # acknowledged
+        assert batch["creeps"] == [1, 0]
+        np.testing.assert_array_equal(obs, batch["obs"])
+        assert obs[0, 0] == 0 and obs[1, 0] == 1
+        assert not infos[0]["action_mask"][:WAIT].any()
+        assert infos[1]["action_mask"].all()
+        np.testing.assert_allclose(
+            rewards,
+            [reward(prev[0], obs[0], SPAWN), reward(prev[1], obs[1], WAIT)],
+            rtol=1e-6,
+        )
+        assert not dones.any()
+    finally:
+        env.close()
@@ -0,0 +1,163 @@
+"""
+Offline driver of the spawn GA of genetic.js.
+
+Same chromosomes (one action per 3-bit state "ehu" of main.js), but each
+generation is scored at once on the spawn-economy model of Deep/v1
+(ScreepsSim.SpawnEconomySim): every individual is a room of the vectorized
+simulator and the population is split over a process pool. The champion is
+then written to the GA memory segment (SEG_GEN), where main.js plays it
+without evaluating anything (Memory.champion).
+"""
+
+import json
+import os
+import sys
+import time
+from multiprocessing import Pool
+
+import numpy as np
+from dotenv import load_dotenv
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "..", "Deep", "v1"))
+from ScreepsSim import CONTROLLER_LEVELS, SimParams, SpawnEconomySim  # noqa: E402
+
+load_dotenv()
+
+# same encoding as genetic.js
+STATES = [f"{i:03b}" for i in range(8)]  # e h u, see state() in main.js
+ACTIONS = ["SPAWN_HARVESTER", "SPAWN_UPGRADER", "WAIT"]
+BASE = [2, 2, 2, 2, 0, 2, 1, 2]  # genetic.reset() seed individual
+BODY = ["WORK", "CARRY", "MOVE"]
+SIM_ACTIONS = [
+    {"type": "SPAWN", "role": "harvester", "body": BODY},
+    {"type": "SPAWN", "role": "upgrader", "body": BODY},
+    {"type": "WAIT"},
+]
+HARVESTER, WAIT = 0, 2
+
+POP_SIZE = int(os.getenv("POP_SIZE", "200"))
+GENERATIONS = int(os.getenv("GENERATIONS", "30"))
+EVAL_TICKS = int(os.getenv("EVAL_TICKS", "6000"))
+EPISODES = int(os.getenv("EPISODES", "2"))  # noisy rollouts per individual
+NOISE = float(os.getenv("NOISE", "0.1"))  # SimParams.noise
+WORKERS = int(os.getenv("WORKERS", str(os.cpu_count() or 1)))
+ELITE = int(os.getenv("ELITE", "2"))
+TOURNAMENT = int(os.getenv("TOURNAMENT", "3"))
+PC = float(os.getenv("PC", "0.7"))
+PM = float(os.getenv("PM", "0.05"))
+SEED = int(os.getenv("SEED", "0"))
+SEG_GEN = int(os.getenv("SEG_GEN", "2"))
+WRITE = os.getenv("WRITE", "0") == "1"  # push the champion to the server
+
+
+def evaluate(args) -> np.ndarray:
+    """Fitness of each chromosome of `genes` (k, 8), averaged over EPISODES.
+
+    Like finishEvaluation: controller progress until RCL2 or EVAL_TICKS, +50
+    at RCL2, plus up to 50 for reaching it early (the live GA has no time to
+    tell fast and slow winners apart).
+    """
+    genes, seed = args
+    table = np.repeat(genes, EPISODES, axis=0)
+    n = len(table)
+    rows = np.arange(n)
+    sim = SpawnEconomySim(n, SimParams(noise=NOISE), SIM_ACTIONS, seed=seed)
+    reached = np.full(n, EVAL_TICKS)
+    running = np.ones(n, dtype=bool)
+    for t in range(EVAL_TICKS):
+        alive = sim.role >= 0
+        e = sim.energy >= 200
+        h = (alive & (sim.role == 0)).any(axis=1)
+        u = (alive & (sim.role == 1)).any(axis=1)
+        action = table[rows, 4 * e + 2 * h + u]
+        action[~alive.any(axis=1)] = HARVESTER  # boot, as main.js
+        action[~running] = WAIT
+        sim.step(action)
+
+        up = running & (sim.level >= 2)
+        reached[up] = t + 1
+        running &= ~up
+        if not running.any():
+            break
+
+    done = reached < EVAL_TICKS
+    fit = np.where(
+        done,
+        CONTROLLER_LEVELS[1] + 50 + 50 * (1 - reached / EVAL_TICKS),
+        sim.progress,
+    )
+    return fit.reshape(-1, EPISODES).mean(axis=1)
+
+
+def evaluate_population(pool: Pool, pop: np.ndarray, seed: int) -> np.ndarray:
+    chunks = np.array_split(pop, WORKERS)
+    jobs = [(c, seed * 1000 + i) for i, c in enumerate(chunks) if len(c)]
+    return np.concatenate(pool.map(evaluate, jobs))
+
+
+def next_generation(pop: np.ndarray, fit: np.ndarray, rng) -> np.ndarray:
+    """Elitism, tournament selection, uniform crossover and mutation."""
+    order = np.argsort(-fit)
+    k = len(pop) - ELITE
+
+    def select():
+        idx = rng.integers(0, len(pop), (k, TOURNAMENT))
+        return pop[idx[np.arange(k), fit[idx].argmax(axis=1)]]
+
+    a, b = select(), select()
+    child = np.where(rng.random(a.shape) < PC, a, b)
+    mut = rng.random(child.shape) < PM
+    child[mut] = rng.integers(0, len(ACTIONS), mut.sum())
+    return np.concatenate([pop[order[:ELITE]], child])
+
+
+def to_individual(genes: np.ndarray) -> dict:
+    return {s: ACTIONS[g] for s, g in zip(STATES, genes)}
+
+
+def write_champion(champion: dict, fitness: float, generations: int) -> None:
+    """Segment payload in the shape of genetic.save(), plus `champion`."""
+    from screepsapi import API
+
+    host = f"{os.getenv('VPS_HOST')}:{os.getenv('SCREEPS_HOST', '21025')}"
+    api = API(u=os.getenv("USERNAME"), p=os.getenv("PASSWORD"), host=host, secure=False)
+    data = {
+        "population": [champion],
+        "fitnesses": [fitness],
+        "genIndex": 0,
+        "epochCount": generations,
+        "paused": False,
+        "prevLevel": 1,
+        "champion": champion,
+    }
+    api.set_segment(SEG_GEN, json.dumps(data), os.getenv("SHARD", "shard0"))
+    print(f"✅ Champion written to segment {SEG_GEN} on {host}")
+
+
+if __name__ == "__main__":
+    if POP_SIZE <= ELITE:
+        print(f"❌ POP_SIZE must be larger than ELITE ({ELITE})")
+        exit(1)
+    rng = np.random.default_rng(SEED)
+    pop = rng.integers(0, len(ACTIONS), (POP_SIZE, len(STATES)))
+    pop[0] = BASE
+
+    best, best_fit = pop[0], -np.inf
+    with Pool(WORKERS) as pool:
+        for gen in range(GENERATIONS):
+            start = time.perf_counter()
+            fit = evaluate_population(pool, pop, SEED + gen)
+            i = int(fit.argmax())
+            # an elite is re-scored every generation, keep the latest score
+            best, best_fit = pop[i].copy(), float(fit[i])
+            print(
+                f"🧬 Gen {gen}: best {best_fit:.1f}, mean {fit.mean():.1f} "
+                f"({time.perf_counter() - start:.1f}s)"
+            )
+            if gen < GENERATIONS - 1:
+                pop = next_generation(pop, fit, rng)
+
+    champion = to_individual(best)
+    print(f"🏆 Champion (fitness {best_fit:.1f}): {json.dumps(champion)}")
+    if WRITE:
+        write_champion(champion, best_fit, GENERATIONS)
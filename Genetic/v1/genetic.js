@@ -65,6 +65,8 @@ module.exports.load = function () {
     return;
   }
   try {
+    // a champion only exists while the segment holds one (ga-offline.py)
+    delete Memory.champion;
     Object.assign(Memory, JSON.parse(seg));
   } catch (e) {
     this.reset();
@@ -82,6 +84,7 @@ module.exports.save = function () {
       epochCount: Memory.epochCount,
       paused: Memory.paused,
       prevLevel: Memory.prevLevel,
+      champion: Memory.champion,
     });
   } catch (e) {
     RawMemory.segments[SEG_GEN] = "{}";
@@ -110,9 +113,11 @@ module.exports.reset = function () {
   Memory.epochCount = 0;
   Memory.paused = false;
   Memory.prevLevel = 1;
+  delete Memory.champion;
 };
 
 module.exports.act = function (state) {
+  if (Memory.champion) return Memory.champion[state];
   if (!Memory.population || !Memory.population[Memory.genIndex]) this.reset();
   return Memory.population[Memory.genIndex][state];
 };
@@ -19,6 +19,9 @@
  *       The GA then scores the individual, breeds if necessary,
  *       persists its new population, and may pause while the colony resets.
  *
+ *  With Memory.champion (written to the GA segment by ga-offline.py) the
+ *  evaluation is skipped: the champion picks every spawn, nothing is scored.
+ *
  *  This in-file documentation only adds comments; the executable logic
  *  remains unchanged.
  ******************************************************************************/
@@ -34,6 +37,41 @@ function state(room) {
   return `${e}${h}${u}`;
 }
 
+// Spawn decision (boot harvester first) and role logic of every creep
+function spawnAndRun(room, act) {
+  const sp = _.find(Game.spawns, (sp) => !sp.spawning);
+
+  // Boot : no creep, force a harvester
+  if (_.isEmpty(Game.creeps) && sp) {
+    const ret = sp.spawnCreep([WORK, CARRY, MOVE], "H" + Game.time, {
+      memory: { role: "harvester" },
+    });
+    if (ret !== OK && ret !== ERR_BUSY) {
+      console.log(
+        `[BOOT] spawnCreep code=${ret} energy=${room.energyAvailable}`
+      );
+    }
+  } else if (sp && room.energyAvailable >= 200) {
+    if (act === "SPAWN_HARVESTER") {
+      sp.spawnCreep([WORK, CARRY, MOVE], "H" + Game.time, {
+        memory: { role: "harvester" },
+      });
+    }
+    if (act === "SPAWN_UPGRADER") {
+      sp.spawnCreep([WORK, CARRY, MOVE], "U" + Game.time, {
+        memory: { role: "upgrader" },
+      });
+    }
+  }
+
+  // Creeps logic
+  for (const name in Game.creeps) {
+    const c = Game.creeps[name];
+    if (c.memory.role === "harvester") roleHarv.run(c);
+    if (c.memory.role === "upgrader") roleUpg.run(c);
+  }
+}
+
 module.exports.loop = function () {
   // GA Persistence
   genetic.load();
@@ -41,6 +79,12 @@ module.exports.loop = function () {
   const room = Game.rooms[Object.keys(Game.rooms)[0]];
   if (!room) return;
 
+  // Champion from ga-offline.py: no evaluation, no pause
+  if (Memory.champion) {
+    spawnAndRun(room, genetic.act(state(room)));
+    return;
+  }
+
   // Init premier tick
   if (Memory.evalHistory === undefined) {
     Memory.evalHistory = [];
@@ -88,39 +132,7 @@ module.exports.loop = function () {
   }
 
   // GA Actions / Boot
-  const s = state(room);
-  const act = genetic.act(s);
-  const sp = _.find(Game.spawns, (sp) => !sp.spawning);
-
-  // Boot : no creep, force a harvester
-  if (_.isEmpty(Game.creeps) && sp) {
-    const ret = sp.spawnCreep([WORK, CARRY, MOVE], "H" + Game.time, {
-      memory: { role: "harvester" },
-    });
-    if (ret !== OK && ret !== ERR_BUSY) {
-      console.log(
-        `[BOOT] spawnCreep code=${ret} energy=${room.energyAvailable}`
-      );
-    }
-  } else if (sp && room.energyAvailable >= 200) {
-    if (act === "SPAWN_HARVESTER") {
-      sp.spawnCreep([WORK, CARRY, MOVE], "H" + Game.time, {
-        memory: { role: "harvester" },
-      });
-    }
-    if (act === "SPAWN_UPGRADER") {
-      sp.spawnCreep([WORK, CARRY, MOVE], "U" + Game.time, {
-        memory: { role: "upgrader" },
-      });
-    }
-  }
-
-  // Creeps logic
-  for (const name in Game.creeps) {
-    const c = Game.creeps[name];
-    if (c.memory.role === "harvester") roleHarv.run(c);
-    if (c.memory.role === "upgrader") roleUpg.run(c);
-  }
+  spawnAndRun(room, genetic.act(state(room)));
 
   // Metrics collection
   const prevProg = room.controller._prevProg || 0;
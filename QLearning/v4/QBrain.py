@@ -0,0 +1,321 @@
+from __future__ import annotations
+import base64
+import json
+import os
+import subprocess
+import tempfile
+from typing import Any, Dict, List, Sequence, Tuple
+
+import numpy as np
+
+# Screeps body part constants as stored in Memory
+WORK, CARRY, MOVE = "work", "carry", "move"
+
+# Compact format of qtable.js
+COMPACT_HEADER = "QT1"
+STATE_CAP = 5  # role counts above share the row of STATE_CAP
+BRAIN_SEG, BUILDER_SEG = 2, 3
+
+
+def action_key(action: Dict[str, Any]) -> str:
+    """Action half of `key(s, a)` in qlearning.js: "type|role|body-parts"."""
+    body = "-".join(action.get("body") or [])
+    return f"{action['type']}|{action.get('role') or ''}|{body}"
+
+
+def parse_action(key: str) -> Dict[str, Any]:
+    kind, role, body = key.split("|")
+    if kind != "SPAWN":
+        return {"type": kind}
+    return {"type": kind, "role": role, "body": body.split("-") if body else []}
+
+
+def split_key(key: str) -> Tuple[str, str]:
+    """(state, action key) of a q key; states contain "|" too."""
+    parts = key.rsplit("|", 3)
+    return parts[0], "|".join(parts[1:])
+
+
+def compact_actions() -> List[str]:
+    """ACTION_KEYS of qtable.js: the ACTIONS of main.js at RCL1 and RCL2+."""
+    base = [WORK, CARRY, MOVE]
+    keys = [
+        action_key({"type": "SPAWN", "role": r, "body": base})
+        for r in ("harvester", "upgrader")
+    ]
+    for i in range(len(base)):
+        for j in range(i, len(base)):
+            body = base + [base[i], base[j]]
+            for role in ("harvester", "upgrader", "builder"):
+                keys.append(action_key({"type": "SPAWN", "role": role, "body": body}))
+    keys.append(action_key({"type": "WAIT"}))
+    return keys
+
+
+COMPACT_ACTIONS = compact_actions()
+_R = range(STATE_CAP + 1)
+# row order of stateIndex() in qtable.js
+COMPACT_STATES = [
+    f"{e}|{h}|{u}|{b}" for e in (0, 1) for h in _R for u in _R for b in _R
+]
+
+
+def cap_state(state: str) -> str:
+    """State as stored by the compact table (counts capped at STATE_CAP)."""
+    try:
+        e, h, u, b = (int(float(x)) for x in state.split("|"))
+    except ValueError:
+        return state
+    c = lambda x: min(x, STATE_CAP)  # noqa: E731
+    return f"{min(e, 1)}|{c(h)}|{c(u)}|{c(b)}"
+
+
+class QTable:
+    """Dense view of `Memory.brain.q` (string keys) for vectorized updates.
+
+    Rows are states, columns actions; `seen` marks the entries that exist
+    in the game table, so only those (and the updated ones) are written back
+    and entries the game never created keep their default of 0.
+    """
+
+    def __init__(self, states: Sequence[str] = (), actions: Sequence[str] = ()):
+        self.states: List[str] = list(states)
+        self.actions: List[str] = list(actions)
+        self._s = {s: i for i, s in enumerate(self.states)}
+        self._a = {a: i for i, a in enumerate(self.actions)}
+        self.q = np.zeros((len(self.states), len(self.actions)))
+        self.seen = np.zeros(self.q.shape, dtype=bool)
+
+    @classmethod
+    def from_memory(
+        cls, q: Dict[str, float] | None, actions: Sequence[str] = ()
+    ) -> "QTable":
+        table = cls(actions=actions)
+        items = [(*split_key(k), v) for k, v in (q or {}).items()]
+        s = table.state_index([i[0] for i in items])
+        a = table.action_index([i[1] for i in items])
+        table.q[s, a] = [float(i[2]) for i in items]
+        table.seen[s, a] = True
+        return table
+
+    def to_memory(self) -> Dict[str, float]:
+        s, a = np.nonzero(self.seen)
+        return {
+            f"{self.states[i]}|{self.actions[j]}": float(self.q[i, j])
+            for i, j in zip(s, a)
+        }
+
+    @classmethod
+    def from_compact(cls, raw: str | None) -> "QTable | None":
+        """Table of a qtable.js segment, None if `raw` is not one."""
+        parts = raw.split("|") if isinstance(raw, str) else []
+        if len(parts) != 4 or parts[0] != COMPACT_HEADER:
+            return None
+        shape = (len(COMPACT_STATES), len(COMPACT_ACTIONS))
+        if (int(parts[1]), int(parts[2])) != shape:
+            raise ValueError(
+                f"❌ Segment table is {parts[1]}x{parts[2]}, expected {shape}"
+            )
+        table = cls(COMPACT_STATES, COMPACT_ACTIONS)
+        q = np.frombuffer(base64.b64decode(parts[3]), dtype="<f4").reshape(shape)
+        table.q = q.astype(np.float64)
+        table.seen = q != 0
+        return table
+
+    def to_compact(self) -> str:
+        """Segment string of qtable.js; states are capped, unknown actions dropped."""
+        rows = {s: i for i, s in enumerate(COMPACT_STATES)}
+        cols = {a: j for j, a in enumerate(COMPACT_ACTIONS)}
+        q = np.zeros((len(rows), len(cols)), dtype="<f4")
+        s_idx, a_idx = np.nonzero(self.seen)
+        for i, j in zip(s_idx, a_idx):
+            row = rows.get(cap_state(self.states[i]))
+            col = cols.get(self.actions[j])
+            if row is not None and col is not None:
+                q[row, col] = self.q[i, j]
+        data = base64.b64encode(q.tobytes()).decode()
+        return f"{COMPACT_HEADER}|{len(rows)}|{len(cols)}|{data}"
+
+    def _grow(self) -> None:
+        shape = (len(self.states), len(self.actions))
+        if shape != self.q.shape:
+            q, seen = np.zeros(shape), np.zeros(shape, dtype=bool)
+            q[: self.q.shape[0], : self.q.shape[1]] = self.q
+            seen[: self.q.shape[0], : self.q.shape[1]] = self.seen
+            self.q, self.seen = q, seen
+
+    def _index(self, keys: Sequence[str], names: List[str], ids: Dict[str, int]):
+        out = np.empty(len(keys), dtype=np.int64)
+        for i, k in enumerate(keys):
+            if k not in ids:
+                ids[k] = len(names)
+                names.append(k)
+            out[i] = ids[k]
+        self._grow()
+        return out
+
+    def state_index(self, states: Sequence[str]) -> np.ndarray:
+        """Row of each state, new states get a row of zeros."""
+        return self._index(states, self.states, self._s)
+
+    def action_index(self, actions: Sequence[str]) -> np.ndarray:
+        return self._index(actions, self.actions, self._a)
+
+    def greedy(self, s: np.ndarray, valid: np.ndarray | None = None) -> np.ndarray:
+        """argmax over the (valid) columns, first one on ties like act()."""
+        q = self.q[s]
+        if valid is not None:
+            q = np.where(valid, q, -np.inf)
+        return q.argmax(axis=1)
+
+
+PARITY_JS = """
+Object.assign(global, { WORK: "work", CARRY: "carry", MOVE: "move" });
+Object.assign(global, { Game: { time: 0 }, Memory: { parity: {} } });
+global.RawMemory = { segments: {} };
+console.log = console.error; // qtable.js warnings stay out of the result
+const qtable = require(process.argv[1]);
+const [raw, states] = JSON.parse(require("fs").readFileSync(process.argv[2], "utf8"));
+RawMemory.segments[0] = raw;
+const t = qtable.open(0, "parity");
+const values = states.map((s) =>
+  qtable.ACTION_KEYS.map((a) => qtable.get(t, qtable.stateIndex(s), qtable.actionIndex(a)))
+);
+t.dirty = true;
+qtable.flush(true);
+process.stdout.write(
+  JSON.stringify({ actions: qtable.ACTION_KEYS, values, raw: RawMemory.segments[0] })
+);
+"""
+
+
+def compact_parity(qtable_js: str | None = None, seed: int = 0) -> bool:
+    """Round trip of a random table through qtable.js with node: same action
+    columns, same state rows (capped states included), same values both ways."""
+    qtable_js = qtable_js or os.path.join(os.path.dirname(__file__), "qtable.js")
+    rng = np.random.default_rng(seed)
+    table = QTable(COMPACT_STATES, COMPACT_ACTIONS)
+    table.q = rng.normal(size=table.q.shape).astype("<f4").astype(np.float64)
+    table.seen[:] = True
+    states = COMPACT_STATES + ["1|7|0|9", "0|2|12|3"]
+    with tempfile.NamedTemporaryFile("w", suffix=".json", delete=False) as f:
+        json.dump([table.to_compact(), states], f)
+    try:
+        out = subprocess.run(
+            ["node", "-e", PARITY_JS, os.path.abspath(qtable_js), f.name],
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+    finally:
+        os.unlink(f.name)
+    got = json.loads(out.stdout)
+
+    rows = [COMPACT_STATES.index(cap_state(s)) for s in states]
+    try:
+        back = QTable.from_compact(got["raw"])
+    except ValueError:  # another shape
+        back = None
+    same_actions = got["actions"] == COMPACT_ACTIONS
+    values = np.array(got["values"])
+    same_read = values.shape == table.q[rows].shape and np.array_equal(
+        values, table.q[rows]
+    )
+    same_write = back is not None and np.array_equal(back.q, table.q)
+    print(
+        f"🔎 QT1 parity with {os.path.basename(qtable_js)}: actions {same_actions}, "
+        f"read {same_read}, write {same_write}"
+    )
+    return same_actions and same_read and same_write
+
+
+def alpha_update(
+    table: QTable, s: np.ndarray, a: np.ndarray, targets: np.ndarray, alpha: float
+) -> None:
+    """Q(s,a) += alpha * (target - Q(s,a)) for every sample, in order.
+
+    Closed form of the sequential pass of learnEpisode: after k samples of
+    one entry, Q = (1-alpha)^k Q0 + sum_i alpha (1-alpha)^(k-1-i) target_i.
+    """
+    n_a = table.q.shape[1]
+    flat = s * n_a + a
+    order = np.argsort(flat, kind="stable")
+    f = flat[order]
+    starts = np.r_[0, np.flatnonzero(np.diff(f)) + 1]
+    counts = np.diff(np.r_[starts, len(f)])
+    rank = np.arange(len(f)) - np.repeat(starts, counts)
+    decay = (1 - alpha) ** (np.repeat(counts, counts) - 1 - rank)
+    size = table.q.size
+    contrib = np.bincount(f, weights=alpha * decay * targets[order], minlength=size)
+    k = np.bincount(flat, minlength=size)
+    q = table.q.reshape(-1)
+    q *= (1 - alpha) ** k
+    q += contrib
+    table.seen.reshape(-1)[k > 0] = True
+
+
+def episode_returns(rewards: np.ndarray, gamma: float) -> np.ndarray:
+    """(E, L) rewards -> discounted returns G_t, all episodes at once."""
+    G = np.zeros_like(rewards, dtype=np.float64)
+    acc = np.zeros(len(rewards))
+    for t in range(rewards.shape[1] - 1, -1, -1):
+        acc = gamma * acc + rewards[:, t]
+        G[:, t] = acc
+    return G
+
+
+def split_episodes(steps: Sequence[Dict[str, Any]], length: int):
+    """Complete episodes of `length` steps of currentEpisode.steps, as arrays.
+
+    Returns (states (E, L), action keys (E, L), rewards (E, L)); the
+    remaining steps do not form an episode yet.
+    """
+    e = len(steps) // length
+    used = steps[: e * length]
+    states = np.array([st["state"] for st in used], dtype=object).reshape(e, length)
+    actions = np.array([action_key(st["action"]) for st in used], dtype=object).reshape(
+        e, length
+    )
+    rewards = np.array([st["reward"] for st in used], dtype=np.float64).reshape(
+        e, length
+    )
+    return states, actions, rewards
+
+
+def mc_update(
+    table: QTable,
+    states: np.ndarray,
+    actions: np.ndarray,
+    rewards: np.ndarray,
+    alpha: float,
+    gamma: float,
+) -> None:
+    """learnEpisode over E episodes at once (same result, episode by episode)."""
+    G = episode_returns(rewards, gamma)
+    s = table.state_index(states.ravel().tolist())
+    a = table.action_index(actions.ravel().tolist())
+    alpha_update(table, s, a, G.ravel(), alpha)
+
+
+def td_update(
+    table: QTable,
+    states: np.ndarray,
+    actions: np.ndarray,
+    rewards: np.ndarray,
+    alpha: float,
+    gamma: float,
+    sweeps: int = 10,
+) -> None:
+    """Synchronous Q-learning sweeps over the transitions of the episodes.
+
+    Each sweep computes every target r + gamma max_a' Q(s', a') from the
+    table before the sweep (max over the known actions, 0 by default as in
+    learn()); the last step of an episode bootstraps from itself.
+    """
+    s = table.state_index(states.ravel().tolist()).reshape(states.shape)
+    a = table.action_index(actions.ravel().tolist())
+    s_next = np.concatenate([s[:, 1:], s[:, -1:]], axis=1).ravel()
+    r = rewards.ravel()
+    for _ in range(sweeps):
+        targets = r + gamma * table.q[s_next].max(axis=1)
+        alpha_update(table, s.ravel(), a, targets, alpha)
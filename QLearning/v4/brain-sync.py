@@ -0,0 +1,276 @@
+"""
+Trains the Q-table of qlearning.js (Memory.brain.q) outside the game.
+
+MODE=sync    pulls Memory.brain, learns on the complete episodes of
+             currentEpisode.steps (all at once, vectorized), pushes the table
+             back and drops the consumed steps. Memory.brain.external is set,
+             so the game only records steps and looks actions up.
+             SYNC_EVERY=60 repeats it every 60 s.
+MODE=offline learns on episodes of the Deep/v1 spawn-economy simulator
+             (level 1 actions of main.js), WRITE=1 uploads the table.
+
+LEARN=mc is the Monte-Carlo update of learnEpisode, LEARN=td runs SWEEPS
+synchronous Q-learning sweeps over the same transitions. FORMAT=compact
+reads and writes the qtable.js segment (BRAIN_SEG) instead of brain.q.
+"""
+
+import json
+import os
+import sys
+import time
+
+import numpy as np
+from dotenv import load_dotenv
+
+from QBrain import (
+    BRAIN_SEG,
+    CARRY,
+    MOVE,
+    WORK,
+    QTable,
+    action_key,
+    cap_state,
+    compact_parity,
+    mc_update,
+    split_episodes,
+    td_update,
+)
+
+load_dotenv()
+
+MODE = os.getenv("MODE", "sync")
+LEARN = os.getenv("LEARN", "mc")
+SWEEPS = int(os.getenv("SWEEPS", "10"))
+SYNC_EVERY = float(os.getenv("SYNC_EVERY", "0"))  # seconds, 0 = once
+SHARD = os.getenv("SHARD", "shard0")
+FORMAT = os.getenv("FORMAT", "keys")  # keys (Memory.brain.q) | compact
+# offline
+EPISODES = int(os.getenv("EPISODES", "5000"))
+ROOMS = int(os.getenv("ROOMS", "64"))  # simulated rooms, episodes in parallel
+NOISE = float(os.getenv("NOISE", "0.1"))
+SEED = int(os.getenv("SEED", "0"))
+WRITE = os.getenv("WRITE", "0") == "1"
+OUT = os.getenv("OUT", "brain_q.json")
+
+# qlearning.js DEFAULT_CONFIG
+DEFAULTS = {
+    "alpha": 0.2,
+    "gamma": 0.9,
+    "epsilon": 0.3,
+    "minEpsilon": 0.05,
+    "epsilonDecay": 0.995,
+    "episodeLength": 100,
+    "warmupEpisodes": 4,
+}
+BASIC_BODY = [WORK, CARRY, MOVE]
+# main.js ACTIONS at RCL1, in the same order (ties go to the first)
+LEVEL1_ACTIONS = [
+    {"type": "SPAWN", "role": "harvester", "body": BASIC_BODY},
+    {"type": "SPAWN", "role": "upgrader", "body": BASIC_BODY},
+    {"type": "WAIT"},
+]
+
+
+def make_api():
+    from screepsapi import API
+
+    host = f"{os.getenv('VPS_HOST')}:{os.getenv('SCREEPS_HOST', '21025')}"
+    return API(
+        u=os.getenv("USERNAME"), p=os.getenv("PASSWORD"), host=host, secure=False
+    )
+
+
+def pull_table(api, brain: dict) -> QTable:
+    if FORMAT == "compact":
+        try:
+            raw = api.get_segment(BRAIN_SEG, SHARD).get("data")
+        except TypeError:  # screepsapi chokes on an empty segment (data: null)
+            raw = None
+        table = QTable.from_compact(raw)
+        if table is not None:
+            return table  # else migrate brain.q, like qlearning.js
+    return QTable.from_memory(brain.get("q"), [action_key(a) for a in LEVEL1_ACTIONS])
+
+
+def push_table(api, table: QTable) -> None:
+    if FORMAT == "compact":
+        # one console command, so no flush() of the game lands between the
+        # segment and the new stamp (a ms timestamp, never a Game.time of
+        # flush): every global drops its heap copy and decodes the segment
+        api.console(
+            f"RawMemory.segments[{BRAIN_SEG}] = {json.dumps(table.to_compact())};"
+            " Object.assign(Memory.brain, { q: {}, compact: true,"
+            f" qStamp: {int(time.time() * 1000)} }});"
+            f" if (global.qtables) delete global.qtables[{BRAIN_SEG}];",
+            SHARD,
+        )
+    else:
+        api.set_memory("brain.q", table.to_memory(), SHARD)
+
+
+def learn(table: QTable, brain: dict, states, actions, rewards) -> None:
+    alpha, gamma = brain["alpha"], brain["gamma"]
+    if FORMAT == "compact":
+        states = np.array([cap_state(s) for s in states.ravel()], dtype=object).reshape(
+            states.shape
+        )
+    if LEARN == "td":
+        td_update(table, states, actions, rewards, alpha, gamma, SWEEPS)
+    else:
+        mc_update(table, states, actions, rewards, alpha, gamma)
+
+
+def finish_episodes(brain: dict, totals: np.ndarray) -> None:
+    """Stats and epsilon decay of learnEpisode, for len(totals) episodes."""
+    stats = brain.setdefault("stats", {"episodes": 0, "recentRewards": []})
+    before = stats.get("episodes", 0)
+    stats["episodes"] = before + len(totals)
+    recent = (stats.get("recentRewards", []) + [float(t) for t in totals])[-20:]
+    stats["recentRewards"] = recent
+    stats["avgReward"] = float(np.mean(recent)) if recent else 0.0
+    decays = max(0, stats["episodes"] - max(before, brain["warmupEpisodes"]))
+    brain["epsilon"] = max(
+        brain["minEpsilon"], brain["epsilon"] * brain["epsilonDecay"] ** decays
+    )
+
+
+def sync_once(api) -> int:
+    """One pull/learn/push round, returns the number of episodes learned."""
+    brain = {**DEFAULTS, **(api.memory("brain", SHARD).get("data") or {})}
+    steps = (brain.get("currentEpisode") or {}).get("steps") or []
+    states, actions, rewards = split_episodes(steps, int(brain["episodeLength"]))
+    if not brain.get("external"):
+        api.set_memory("brain.external", True, SHARD)
+    if not len(states):
+        print(f"⏳ {len(steps)} steps recorded, no complete episode yet")
+        return 0
+
+    start = time.perf_counter()
+    table = pull_table(api, brain)
+    learn(table, brain, states, actions, rewards)
+    finish_episodes(brain, rewards.sum(axis=1))
+    elapsed = time.perf_counter() - start
+
+    push_table(api, table)
+    api.set_memory("brain.epsilon", brain["epsilon"], SHARD)
+    api.set_memory("brain.stats", brain["stats"], SHARD)
+    # steps recorded since the pull stay for the next round; by id, since
+    # recordStep may have dropped the oldest ones in between
+    last = steps[states.size - 1].get("n")
+    drop = (
+        f"E.steps = E.steps.filter((st) => st.n > {int(last)});"  # untagged: older
+        if isinstance(last, int)
+        else f"E.steps.splice(0, {states.size});"  # steps recorded before ids
+    )
+    api.console(
+        f"const E = Memory.brain.currentEpisode; {drop}"
+        ' E.totalReward = _.sum(E.steps, "reward");',
+        SHARD,
+    )
+    print(
+        f"✅ {len(states)} episodes ({states.size} steps) learned in {elapsed * 1000:.0f} ms, "
+        f"{int(table.seen.sum())} entries, ε={brain['epsilon']:.3f}, avg reward {brain['stats']['avgReward']:.1f}"
+    )
+    return len(states)
+
+
+def offline(brain: dict) -> QTable:
+    """ε-greedy episodes of ROOMS simulated rooms at once, learned as they end.
+
+    State and reward follow state() and calculateReward() of main.js at RCL1
+    (no builders); a room is reset once it reaches RCL2.
+    """
+    sys.path.insert(
+        0, os.path.join(os.path.dirname(__file__), "..", "..", "Deep", "v1")
+    )
+    from ScreepsSim import CONTROLLER_LEVELS, SimParams, SpawnEconomySim
+
+    table = QTable(actions=[action_key(a) for a in LEVEL1_ACTIONS])
+    keys = np.array(table.actions, dtype=object)
+    sim_actions = [
+        {**a, "body": [p.upper() for p in a["body"]]} if "body" in a else a
+        for a in LEVEL1_ACTIONS
+    ]
+    sim = SpawnEconomySim(ROOMS, SimParams(noise=NOISE), sim_actions, seed=SEED)
+    rng = np.random.default_rng(SEED)
+    length = int(brain["episodeLength"])
+
+    for _ in range(max(1, EPISODES // ROOMS)):
+        S = np.empty((ROOMS, length), dtype=object)
+        A = np.empty((ROOMS, length), dtype=object)
+        R = np.zeros((ROOMS, length))
+        for t in range(length):
+            alive = sim.role >= 0
+            h = (alive & (sim.role == 0)).sum(axis=1)
+            u = (alive & (sim.role == 1)).sum(axis=1)
+            e = sim.energy >= 200
+            S[:, t] = [f"{int(x)}|{y}|{z}|0" for x, y, z in zip(e, h, u)]
+            greedy = table.greedy(table.state_index(S[:, t].tolist()))
+            explore = rng.random(ROOMS) < brain["epsilon"]
+            act = np.where(explore, rng.integers(0, len(keys), ROOMS), greedy)
+            A[:, t] = keys[act]
+
+            spawned, progress, level = (
+                sim.creeps_spawned.copy(),
+                sim.progress.copy(),
+                sim.level.copy(),
+            )
+            sim.step(act)
+            # calculateReward, counts of the state before the action
+            done = sim.creeps_spawned > spawned
+            r = np.full(ROOMS, -1.0)
+            r += np.where(done, 5 + 2 * 1, 0)  # one WORK part
+            r += np.where(done & (act == 0) & (h < 2), 5, 0)
+            r += np.where(done & (act == 1) & (u == 0) & (h >= 1), 3, 0)
+            r -= (act == 2) & e
+            gain = (
+                sim.progress
+                - progress
+                + np.where(sim.level > level, CONTROLLER_LEVELS[level], 0)
+            )
+            R[:, t] = r + 2 * gain
+            if (sim.level >= 2).any():
+                sim.reset(sim.level >= 2)
+
+        learn(table, brain, S, A, R)
+        finish_episodes(brain, R.sum(axis=1))
+
+    stats = brain["stats"]
+    print(
+        f"✅ {stats['episodes']} offline episodes, {int(table.seen.sum())} entries, "
+        f"ε={brain['epsilon']:.3f}, avg reward {stats['avgReward']:.1f}"
+    )
+    return table
+
+
+if __name__ == "__main__":
+    if MODE not in ("sync", "offline") or LEARN not in ("mc", "td"):
+        print(f"❌ Unknown MODE={MODE!r} (sync|offline) or LEARN={LEARN!r} (mc|td)")
+        exit(1)
+    if FORMAT not in ("keys", "compact"):
+        print(f"❌ Unknown FORMAT={FORMAT!r} (keys|compact)")
+        exit(1)
+    if FORMAT == "compact" and not compact_parity():
+        print("❌ QBrain.py and qtable.js disagree on the QT1 layout")
+        exit(1)
+
+    if MODE == "offline":
+        brain = dict(DEFAULTS)
+        table = offline(brain)
+        q = table.to_memory()
+        with open(OUT, "w") as f:
+            json.dump(q, f)
+        print(f"💾 Q-table saved in {OUT}")
+        if WRITE:
+            api = make_api()
+            push_table(api, table)
+            api.set_memory("brain.epsilon", brain["minEpsilon"], SHARD)
+            print(f"✅ Q-table uploaded ({FORMAT})")
+        exit(0)
+
+    api = make_api()
+    while True:
+        sync_once(api)
+        if SYNC_EVERY <= 0:
+            break
+        time.sleep(SYNC_EVERY)
@@ -24,42 +24,36 @@
  *         • applies one-step Q-learning updates with `brainLogic.learn`,
  *         • decays ε, and
  *         • updates per-role statistics in `Memory.creepStats`.
+ *       With `Memory.incrementalLearning` the updates are queued in
+ *       learnqueue.js and applied over the next ticks under a CPU cap.
  ******************************************************************************/
 
 const brainLogic = require("creep.brain");
+const roomCache = require("roomcache");
+const learnQueue = require("learnqueue");
 
 const HARVESTER_ACTIONS = ["HARVEST", "TRANSFER"];
 const UPGRADER_ACTIONS = ["WITHDRAW", "UPGRADE"];
 const BUILDER_ACTIONS = ["WITHDRAW", "BUILD", "REPAIR"];
 const EPISODE_LENGTH = 10; // Actions per episode
 
+// Queued steps of a creep episode; dropped if the creep died meanwhile
+learnQueue.register("creep.td", (st, job) => {
+  const mem = Memory.creeps[job.n];
+  if (mem && mem.brain) brainLogic.learn(st.s, st.a, st.r, st.s2, job.acts, mem.brain);
+});
+
 function findSource(creep) {
-  return creep.pos.findClosestByPath(FIND_SOURCES_ACTIVE);
+  return roomCache.source(creep);
 }
 
 function findDepositTarget(creep) {
-  return creep.pos.findClosestByPath(FIND_STRUCTURES, {
-    filter: (s) =>
-      (((s.structureType === STRUCTURE_SPAWN ||
-        s.structureType === STRUCTURE_EXTENSION) &&
-        s.my) ||
-        s.structureType === STRUCTURE_CONTAINER ||
-        s.structureType === STRUCTURE_STORAGE) &&
-      s.store.getFreeCapacity(RESOURCE_ENERGY) > 0,
-  });
+  return roomCache.depositTarget(creep);
 }
 
 function findWithdrawSource(creep) {
   // for upgrader/builder withdraw from storage|spawn|extension|container
-  return creep.pos.findClosestByPath(FIND_STRUCTURES, {
-    filter: (s) =>
-      (((s.structureType === STRUCTURE_SPAWN ||
-        s.structureType === STRUCTURE_EXTENSION) &&
-        s.my) ||
-        s.structureType === STRUCTURE_CONTAINER ||
-        s.structureType === STRUCTURE_STORAGE) &&
-      s.store.getUsedCapacity(RESOURCE_ENERGY) > 0,
-  });
+  return roomCache.withdrawSource(creep);
 }
 
 function findController(creep) {
@@ -67,23 +61,12 @@ function findController(creep) {
 }
 
 function findConstructionSite(creep) {
-  return creep.pos.findClosestByPath(FIND_CONSTRUCTION_SITES);
+  return roomCache.constructionSite(creep);
 }
 
 function findRepairTarget(creep) {
-  // Look for structures that need repair
-  const targets = creep.room.find(FIND_STRUCTURES, {
-    filter: (s) =>
-      s.hits < s.hitsMax &&
-      s.structureType !== STRUCTURE_WALL &&
-      s.structureType !== STRUCTURE_RAMPART,
-  });
-
-  if (targets.length > 0) {
-    // Prioritize the most damaged structures
-    return targets.sort((a, b) => a.hits / a.hitsMax - b.hits / b.hitsMax)[0];
-  }
-  return null;
+  // Most damaged structure (walls and ramparts excluded)
+  return roomCache.repairTarget(creep);
 }
 
 function computeReward(creep, action, did, prevState, currentState) {
@@ -266,7 +249,7 @@ module.exports.run = function (creep) {
         const code = creep.harvest(src);
         if (code === OK) did = true;
         else if (code === ERR_NOT_IN_RANGE)
-          creep.moveTo(src, { visualizePathStyle: { stroke: "#ffaa00" } });
+          roomCache.moveTo(creep, src, "#ffaa00");
       }
     }
   } else if (action === "TRANSFER") {
@@ -276,7 +259,7 @@ module.exports.run = function (creep) {
         const code = creep.transfer(tgt, RESOURCE_ENERGY);
         if (code === OK) did = true;
         else if (code === ERR_NOT_IN_RANGE)
-          creep.moveTo(tgt, { visualizePathStyle: { stroke: "#ffffff" } });
+          roomCache.moveTo(creep, tgt, "#ffffff");
       }
     }
   } else if (action === "WITHDRAW") {
@@ -286,7 +269,7 @@ module.exports.run = function (creep) {
         const code = creep.withdraw(src, RESOURCE_ENERGY);
         if (code === OK) did = true;
         else if (code === ERR_NOT_IN_RANGE)
-          creep.moveTo(src, { visualizePathStyle: { stroke: "#ffaa00" } });
+          roomCache.moveTo(creep, src, "#ffaa00");
       }
     }
   } else if (action === "UPGRADE") {
@@ -296,7 +279,7 @@ module.exports.run = function (creep) {
         const code = creep.upgradeController(ctrl);
         if (code === OK) did = true;
         else if (code === ERR_NOT_IN_RANGE)
-          creep.moveTo(ctrl, { visualizePathStyle: { stroke: "#ffffff" } });
+          roomCache.moveTo(creep, ctrl, "#ffffff");
       }
     }
   } else if (action === "BUILD") {
@@ -306,7 +289,7 @@ module.exports.run = function (creep) {
         const code = creep.build(site);
         if (code === OK) did = true;
         else if (code === ERR_NOT_IN_RANGE)
-          creep.moveTo(site, { visualizePathStyle: { stroke: "#00ff00" } });
+          roomCache.moveTo(creep, site, "#00ff00");
       }
     }
   } else if (action === "REPAIR") {
@@ -316,7 +299,7 @@ module.exports.run = function (creep) {
         const code = creep.repair(target);
         if (code === OK) did = true;
         else if (code === ERR_NOT_IN_RANGE)
-          creep.moveTo(target, { visualizePathStyle: { stroke: "#0000ff" } });
+          roomCache.moveTo(creep, target, "#0000ff");
       }
     }
   }
@@ -363,18 +346,24 @@ function learnEpisode(creep, actions) {
   const episode = creep.memory.episode;
   const currentState = creepState(creep);
 
-  // Learning from the episode
+  // Learning from the episode, backward
+  const steps = [];
   for (let i = episode.step - 1; i >= 0; i--) {
-    const s = episode.states[i];
-    const a = episode.actions[i];
-    const r = episode.rewards[i];
-
     // Next state is the current state for the last step
     // or the next state in the episode for all others
-    const s2 = i === episode.step - 1 ? currentState : episode.states[i + 1];
+    steps.push({
+      s: episode.states[i],
+      a: episode.actions[i],
+      r: episode.rewards[i],
+      s2: i === episode.step - 1 ? currentState : episode.states[i + 1],
+    });
+  }
 
-    // standard Q-learning
-    brainLogic.learn(s, a, r, s2, actions, brain);
+  // standard Q-learning, now or spread over the next ticks (learnqueue.js)
+  if (learnQueue.enabled()) {
+    learnQueue.push("creep.td", steps, { n: creep.name, acts: actions });
+  } else {
+    for (const st of steps) brainLogic.learn(st.s, st.a, st.r, st.s2, actions, brain);
   }
 
   // Reset the episode for the next cycle
@@ -0,0 +1,114 @@
+/******************************************************************************
+ *  learnqueue.js — CPU-budgeted queue of Q-table updates
+ *  -----------------------------------------------------
+ *  With `Memory.incrementalLearning = true` the batch pass of main.js and the
+ *  creep episodes of creep.js are no longer replayed in the tick they end:
+ *  they are pushed here as one job (a list of steps + a cursor) and
+ *  `drain()` applies steps, oldest first, until `cpu` CPU was spent this
+ *  tick. Updates happen in the same order as the burst pass, only spread
+ *  over the following ticks.
+ *
+ *  • Bounded: past `maxSteps` pending steps the oldest are dropped (counted).
+ *    Applied and dropped steps are cut off the jobs before Memory is saved,
+ *    so Memory holds at most `maxSteps` steps.
+ *  • `Memory.learnQueue.stats` = { backlog, dropped, processed, cpu } and a
+ *    console line every REPORT_EVERY ticks while work is deferred.
+ *  • Handlers are registered per job kind at require time (main.js, creep.js).
+ ******************************************************************************/
+
+const DEFAULTS = { cpu: 2, maxSteps: 2000 };
+const REPORT_EVERY = 100;
+const SAFETY = 0.9; // never drain past this fraction of the tick limit
+
+const handlers = {};
+
+function queue() {
+  if (!Memory.learnQueue) {
+    Memory.learnQueue = {
+      ...DEFAULTS,
+      jobs: [],
+      stats: { backlog: 0, dropped: 0, processed: 0, cpu: 0 },
+    };
+  }
+  return Memory.learnQueue;
+}
+
+function backlog(Q) {
+  return _.sum(Q.jobs, (j) => j.p.length - j.i);
+}
+
+// Only the first job can be partly consumed: keep its pending steps only
+function trim(Q) {
+  const job = Q.jobs[0];
+  if (job && job.i > 0) {
+    job.p = job.p.slice(job.i);
+    job.i = 0;
+  }
+}
+
+module.exports = {
+  enabled() {
+    return !!Memory.incrementalLearning;
+  },
+
+  // handler(step, job) applies one step of a job of this kind
+  register(kind, handler) {
+    handlers[kind] = handler;
+  },
+
+  // Queues `steps` (applied in array order); `meta` is kept on the job
+  push(kind, steps, meta = {}) {
+    if (!steps.length) return;
+    const Q = queue();
+    Q.jobs.push({ k: kind, p: steps, i: 0, ...meta });
+
+    // bounded memory: drop the oldest pending steps
+    let extra = backlog(Q) - (Q.maxSteps || DEFAULTS.maxSteps);
+    while (extra > 0 && Q.jobs.length) {
+      const job = Q.jobs[0];
+      const n = Math.min(extra, job.p.length - job.i);
+      job.i += n;
+      extra -= n;
+      Q.stats.dropped += n;
+      if (job.i >= job.p.length) Q.jobs.shift();
+    }
+    trim(Q);
+  },
+
+  // Applies queued steps until the per-tick CPU cap is reached
+  drain() {
+    const Q = Memory.learnQueue;
+    if (!Q || !Q.jobs.length) return;
+
+    const start = Game.cpu.getUsed();
+    const cap = Q.cpu || DEFAULTS.cpu;
+    const hardStop = (Game.cpu.tickLimit || Infinity) * SAFETY;
+    let processed = 0;
+    while (Q.jobs.length) {
+      const used = Game.cpu.getUsed();
+      if (used - start >= cap || used >= hardStop) break;
+      const job = Q.jobs[0];
+      const handler = handlers[job.k];
+      if (handler) handler(job.p[job.i], job);
+      job.i++;
+      processed++;
+      if (job.i >= job.p.length) Q.jobs.shift();
+    }
+    trim(Q);
+
+    Q.stats.processed += processed;
+    Q.stats.cpu = Game.cpu.getUsed() - start;
+    Q.stats.backlog = backlog(Q);
+    if (Q.stats.backlog > 0 && Game.time % REPORT_EVERY === 0) {
+      console.log(
+        `[LEARN] backlog ${Q.stats.backlog} steps in ${Q.jobs.length} jobs | ` +
+          `dropped ${Q.stats.dropped} | ${Q.stats.cpu.toFixed(2)} CPU/tick`
+      );
+    }
+  },
+
+  stats() {
+    const Q = Memory.learnQueue;
+    return Q ? { ...Q.stats, backlog: backlog(Q) } : null;
+  },
+};
@@ -12,6 +12,10 @@
  *  • Auto-infrastructure: roads + extensions when RCL 2 is reached.
  *  • Graceful wipe/reset handling and compact segment persistence
  *    (Q-table in segment 0, metrics in segment 1).
+ *  • Compact Q-tables (`Memory.brain.compact`, `Memory.builderBrain.compact`)
+ *    are heap-cached by qtable.js and flushed to segments 2 and 3.
+ *  • `Memory.incrementalLearning = true`: batch updates are queued
+ *    (learnqueue.js) and drained under `Memory.learnQueue.cpu` per tick.
  ******************************************************************************/
 
 const SEG_ID = 0;
@@ -21,6 +25,8 @@ const BATCH_SIZE = 100;
 const brain = require("qlearning");
 const brainBuilder = require("qlearning_builder");
 const creepLogic = require("creep");
+const qtable = require("qtable");
+const learnQueue = require("learnqueue");
 
 const EVAL = !!Memory.evalMode;
 
@@ -197,6 +203,15 @@ function calculateBatchRewards(decisions) {
   return rewards;
 }
 
+// Queued steps hold the index `t` of their action list in the job's `acts`
+function batchLearn(activeBrain, st, acts) {
+  activeBrain.learn(st.s, st.a, st.r, st.s2, acts[st.t]);
+}
+learnQueue.register("batch.spawn", (st, job) => batchLearn(brain, st, job.acts));
+learnQueue.register("batch.builder", (st, job) =>
+  batchLearn(brainBuilder, st, job.acts)
+);
+
 function processBatch() {
   const decisions = Memory.batchLearning.decisions;
   if (decisions.length < BATCH_SIZE) return;
@@ -206,25 +221,36 @@ function processBatch() {
   const activeBrain = useBuilderBrain ? brainBuilder : brain;
 
   let totalReward = 0;
+  const steps = [];
+  const acts = []; // distinct action lists (RCL1 / RCL2+), stored once
+  const actsIndex = {};
   for (let i = 0; i < decisions.length; i++) {
     const decision = decisions[i];
     const reward = batchRewards[i];
     const nextState =
       i < decisions.length - 1 ? decisions[i + 1].state : decision.state;
 
-    if (!EVAL) {
-      activeBrain.learn(
-        decision.state,
-        decision.action,
-        reward,
-        nextState,
-        decision.availableActions
-      );
+    const actsKey = JSON.stringify(decision.availableActions);
+    if (!(actsKey in actsIndex)) {
+      actsIndex[actsKey] = acts.length;
+      acts.push(decision.availableActions);
     }
-
+    steps.push({
+      s: decision.state,
+      a: decision.action,
+      r: reward,
+      s2: nextState,
+      t: actsIndex[actsKey],
+    });
     totalReward += reward;
   }
 
+  if (!EVAL) {
+    const kind = useBuilderBrain ? "batch.builder" : "batch.spawn";
+    if (learnQueue.enabled()) learnQueue.push(kind, steps, { acts });
+    else for (const st of steps) batchLearn(activeBrain, st, acts);
+  }
+
   const avgReward = totalReward / decisions.length;
   Memory.batchLearning.batchCount++;
   Memory.batchLearning.totalBatches++;
@@ -356,14 +382,15 @@ module.exports.loop = function () {
         batches: Memory.batchLearning.totalBatches || 0,
         episodes: Memory.brain.stats.episodes || 0,
         avgReward: Memory.brain.stats.avgReward || 0,
+        learnQueue: learnQueue.stats(),
       };
 
       console.log("[FINAL METRICS]", JSON.stringify(finalMetrics));
 
       // Save to segments
-      RawMemory.setActiveSegments([METRICS_SEG]);
+      qtable.keepActive([METRICS_SEG]);
       RawMemory.segments[METRICS_SEG] = JSON.stringify(finalMetrics);
-      RawMemory.setActiveSegments([]);
+      qtable.keepActive();
     }
 
     // Cleanup and prepare for reset
@@ -426,7 +453,7 @@ module.exports.loop = function () {
 
   // Load brain from segments
   if (!Memory.brainLoaded) {
-    RawMemory.setActiveSegments([SEG_ID]);
+    qtable.keepActive([SEG_ID]);
     const seg = RawMemory.segments[SEG_ID];
     if (typeof seg === "string" && seg.startsWith('{"brain":')) {
       try {
@@ -436,7 +463,7 @@ module.exports.loop = function () {
         console.log("Error loading brain:", e);
       }
     }
-    RawMemory.setActiveSegments([]);
+    qtable.keepActive();
   }
 
   // Build infrastructure at RCL2
@@ -452,7 +479,7 @@ module.exports.loop = function () {
     }
 
     // Save Q-table (only essential data)
-    RawMemory.setActiveSegments([SEG_ID]);
+    qtable.keepActive([SEG_ID]);
     const compactBrain = {
       qTable: Memory.brain.qTable,
       stats: {
@@ -461,7 +488,8 @@ module.exports.loop = function () {
       },
     };
     RawMemory.segments[SEG_ID] = JSON.stringify({ brain: compactBrain });
-    RawMemory.setActiveSegments([]);
+    qtable.flush(true);
+    qtable.keepActive();
 
     console.log("[SAVE] Q-table saved, preparing for reset");
     Memory.wantReset = true;
@@ -563,7 +591,15 @@ module.exports.loop = function () {
     creepLogic.run(creep);
   }
 
-  activeBrain.recordStep(currentState, action, immediateReward);
+  const episodeFull = activeBrain.recordStep(
+    currentState,
+    action,
+    immediateReward
+  );
+  // processBatch already learns from these decisions: a full episode is only
+  // dropped, so currentEpisode.steps stays bounded (external mode keeps its
+  // own `maxSteps` steps for brain-sync.py and never reports full)
+  if (episodeFull) activeBrain.resetEpisode();
 
   // Save history periodically
   if ((Memory.epochTick || 0) % 500 === 0) {
@@ -582,5 +618,12 @@ module.exports.loop = function () {
     }
   }
 
+  // Deferred learning under its CPU cap, then table write back
+  learnQueue.drain();
+
+  // Compact Q-tables: periodic write back, segments kept readable
+  qtable.flush();
+  qtable.keepActive(Memory.brainLoaded ? [] : [SEG_ID]);
+
   Memory.epochTick = (Memory.epochTick || 0) + 1;
 };
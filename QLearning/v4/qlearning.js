@@ -8,6 +8,10 @@
  *  • Works in *episodes* of `episodeLength` steps; `learnEpisode()` performs
  *    a Monte-Carlo (back-propagated) update once the episode is complete.
  *  • Also exposes a classic one-step `learn()` for immediate TD(0) updates.
+ *  • `Memory.brain.external` (set by brain-sync.py): Python owns learning,
+ *    the game only records steps (at most `maxSteps`) and looks actions up.
+ *  • `Memory.brain.compact = true`: the table lives in qtable.js (segment
+ *    BRAIN_SEG, heap-cached) instead of `Memory.brain.q`, which is emptied.
  ******************************************************************************/
 
 const DEFAULT_CONFIG = {
@@ -18,9 +22,12 @@ const DEFAULT_CONFIG = {
   epsilonDecay: 0.995,
   episodeLength: 100,
   warmupEpisodes: 4,
+  maxSteps: 5000,
   frozen: false,
 };
 
+const qtable = require("qtable");
+
 const key = (s, a) =>
   `${s}|${a.type}|${a.role || ""}|${a.body ? a.body.join("-") : ""}`;
 
@@ -37,6 +44,53 @@ function isFrozen() {
   return !!Memory.brain.frozen;
 }
 
+function isExternal() {
+  return !!Memory.brain.external;
+}
+
+// Compact table (null when off or the segment is not loaded yet)
+function compactTable() {
+  const B = Memory.brain;
+  if (!B.compact) return null;
+  const t = qtable.open(qtable.BRAIN_SEG, "brain", () =>
+    Object.entries(B.q || {}).map(([k, v]) => {
+      const parts = k.split("|");
+      return [parts.slice(0, -3).join("|"), parts.slice(-3).join("|"), v];
+    })
+  );
+  if (t && B.q && Object.keys(B.q).length) B.q = {}; // migrated
+  return t;
+}
+
+// Q-value accessors over either representation
+function getQ(t, s, a) {
+  return t
+    ? qtable.get(t, qtable.stateIndex(s), qtable.actionIndex(a))
+    : Memory.brain.q[key(s, a)] || 0;
+}
+
+// Compact but the segment is not readable yet: the update is dropped, a
+// write to Memory.brain.q would be imported over the newer segment values
+function setQ(t, s, a, v) {
+  if (t) qtable.set(t, qtable.stateIndex(s), qtable.actionIndex(a), v);
+  else if (!Memory.brain.compact) Memory.brain.q[key(s, a)] = v;
+}
+
+// Monte-Carlo step of learnEpisode: Q(s,a) += α (G - Q(s,a))
+function updateReturn({ s, a, g }) {
+  const t = compactTable();
+  const oldQ = getQ(t, s, a);
+  setQ(t, s, a, oldQ + Memory.brain.alpha * (g - oldQ));
+}
+
+function qSize() {
+  const t = compactTable();
+  if (!t) return Object.keys(Memory.brain.q).length;
+  let n = 0;
+  for (const v of t.q) if (v !== 0) n++;
+  return n;
+}
+
 module.exports = {
   setFrozen(flag = true) {
     Memory.brain.frozen = !!flag;
@@ -49,11 +103,13 @@ module.exports = {
     if (Math.random() < explore) return _.sample(actions);
 
     // Greedy policy : returns the action with the best Q
+    const t = compactTable();
+    const si = t ? qtable.stateIndex(state) : -1;
     let bestAction = actions[0];
     let bestQ = -Infinity;
 
     for (const a of actions) {
-      const q = B.q[key(state, a)] || 0;
+      const q = t ? qtable.get(t, si, qtable.actionIndex(a)) : B.q[key(state, a)] || 0;
       if (q > bestQ) {
         bestQ = q;
         bestAction = a;
@@ -66,14 +122,27 @@ module.exports = {
     const B = Memory.brain;
     if (!B.currentEpisode) this.resetEpisode();
 
-    B.currentEpisode.steps.push({ state, action, reward });
+    // n: increasing step id, brain-sync.py drops the steps it learned by id
+    B.stepCount = (B.stepCount || 0) + 1;
+    B.currentEpisode.steps.push({ state, action, reward, n: B.stepCount });
     B.currentEpisode.totalReward += reward;
 
+    // brain-sync.py drains the steps; if it stops, keep the latest only
+    if (isExternal()) {
+      const steps = B.currentEpisode.steps;
+      const extra = steps.length - (B.maxSteps || DEFAULT_CONFIG.maxSteps);
+      if (extra > 0) {
+        for (const st of steps.splice(0, extra))
+          B.currentEpisode.totalReward -= st.reward;
+      }
+      return false;
+    }
+
     return B.currentEpisode.steps.length >= B.episodeLength;
   },
 
   learnEpisode(finalState) {
-    if (isFrozen()) return this.getStats();
+    if (isFrozen() || isExternal()) return this.getStats();
 
     const B = Memory.brain;
     const episode = B.currentEpisode.steps;
@@ -87,12 +156,9 @@ module.exports = {
     }
 
     // Update the Q-table
-    for (let t = 0; t < episode.length; t++) {
-      const { state, action } = episode[t];
-      const k = key(state, action);
-      const oldQ = B.q[k] || 0;
-      B.q[k] = oldQ + B.alpha * (returns[t] - oldQ);
-    }
+    episode.forEach(({ state, action }, t) =>
+      updateReturn({ s: state, a: action, g: returns[t] })
+    );
 
     // Global stats update
     B.stats.episodes++;
@@ -111,18 +177,19 @@ module.exports = {
       episode: B.stats.episodes,
       avgReward: B.stats.avgReward,
       epsilon: B.epsilon,
-      qSize: Object.keys(B.q).length,
+      qSize: qSize(),
     };
   },
 
   learn(s, a, r, s2, actions) {
-    if (isFrozen()) return;
+    if (isFrozen() || isExternal()) return;
 
     const B = Memory.brain;
-    const qs = B.q[key(s, a)] || 0;
-    const qsp = _.max(actions.map((x) => B.q[key(s2, x)] || 0));
+    const t = compactTable();
+    const qs = getQ(t, s, a);
+    const qsp = _.max(actions.map((x) => getQ(t, s2, x)));
 
-    B.q[key(s, a)] = (1 - B.alpha) * qs + B.alpha * (r + B.gamma * qsp);
+    setQ(t, s, a, (1 - B.alpha) * qs + B.alpha * (r + B.gamma * qsp));
     B.epsilon = Math.max(0.05, B.epsilon * 0.9995);
   },
 
@@ -136,7 +203,7 @@ module.exports = {
       episodes: B.stats.episodes,
       avgReward: B.stats.avgReward,
       epsilon: B.epsilon,
-      qSize: Object.keys(B.q).length,
+      qSize: qSize(),
     };
   },
 };
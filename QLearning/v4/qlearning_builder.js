@@ -11,8 +11,12 @@
  *
  *  • Exploration ε decays exponentially from 1.0 → 0.05.
  *  • A *frozen* flag lets you disable learning and force greedy play.
+ *  • `Memory.builderBrain.compact = true` keeps the table in qtable.js
+ *    (segment BUILDER_SEG, heap-cached) instead of the nested object.
  ******************************************************************************/
 
+const qtable = require("qtable");
+
 const EPSILON_START = 1.0;
 const EPSILON_END = 0.05;
 const EPSILON_DECAY = 0.001;
@@ -52,6 +56,54 @@ if (!Memory.builderBrain) {
   };
 }
 
+// Compact table (null when off or the segment is not loaded yet)
+function compactTable() {
+  const brain = Memory.builderBrain;
+  if (!brain.compact) return null;
+  const t = qtable.open(qtable.BUILDER_SEG, "builderBrain", () =>
+    _.flatten(
+      Object.entries(brain.q || {}).map(([s, row]) =>
+        Object.entries(row).map(([h, v]) => [s, JSON.parse(h), v])
+      )
+    )
+  );
+  if (t && brain.q && Object.keys(brain.q).length) brain.q = {}; // migrated
+  return t;
+}
+
+// TD(0) step of learnEpisode, bootstrapped on the state ending the episode.
+// The compact table has a column for every action of both levels: the max
+// is taken over the `actions` offered in nextState, like the keys of
+// q[nextState] (a never-offered column would bootstrap on its 0).
+function updateStep({ state, action, reward, nextState }, actions = []) {
+  const table = compactTable();
+  if (table) {
+    const si = qtable.stateIndex(state);
+    const ai = qtable.actionIndex(action);
+    const old = qtable.get(table, si, ai);
+    const s2 = qtable.stateIndex(nextState);
+    const maxQNext = actions.length
+      ? Math.max(...actions.map((a) => qtable.get(table, s2, qtable.actionIndex(a))))
+      : 0;
+    qtable.set(table, si, ai, old + ALPHA * (reward + GAMMA * maxQNext - old));
+    return;
+  }
+  if (Memory.builderBrain.compact) return; // segment not readable yet: dropped
+
+  const q = Memory.builderBrain.q;
+  const key = hash(action);
+
+  if (!q[state]) q[state] = {};
+  if (!(key in q[state])) q[state][key] = 0;
+
+  let maxQNext = 0;
+  if (q[nextState]) {
+    maxQNext = Math.max(...Object.values(q[nextState]));
+  }
+
+  q[state][key] += ALPHA * (reward + GAMMA * maxQNext - q[state][key]);
+}
+
 let frozen = false;
 let currentTrajectory = [];
 
@@ -67,6 +119,24 @@ module.exports = {
   act(state, actions) {
     const q = Memory.builderBrain.q;
     const epsilon = Memory.builderBrain.epsilon;
+    const t = compactTable();
+
+    if (t) {
+      if (!frozen && Math.random() <= epsilon) return _.sample(actions);
+      const si = qtable.stateIndex(state);
+      let best = actions[0];
+      let bestQ = -Infinity;
+      for (const a of actions) {
+        const v = qtable.get(t, si, qtable.actionIndex(a));
+        if (v > bestQ) {
+          bestQ = v;
+          best = a;
+        }
+      }
+      return best;
+    }
+    // segment not readable yet: explore, brain.q must stay empty
+    if (Memory.builderBrain.compact) return _.sample(actions);
 
     if (!q[state]) q[state] = {};
     for (const a of actions) {
@@ -87,22 +157,11 @@ module.exports = {
     return currentTrajectory.length > 10;
   },
 
-  learnEpisode(nextState) {
-    const q = Memory.builderBrain.q;
-
+  // `actions`: the actions offered in nextState (compact table only)
+  learnEpisode(nextState, actions = []) {
+    // backward pass
     for (let t = currentTrajectory.length - 1; t >= 0; t--) {
-      const { state, action, reward } = currentTrajectory[t];
-      const key = hash(action);
-
-      if (!q[state]) q[state] = {};
-      if (!(key in q[state])) q[state][key] = 0;
-
-      let maxQNext = 0;
-      if (q[nextState]) {
-        maxQNext = Math.max(...Object.values(q[nextState]));
-      }
-
-      q[state][key] += ALPHA * (reward + GAMMA * maxQNext - q[state][key]);
+      updateStep({ ...currentTrajectory[t], nextState }, actions);
     }
 
     const totalReward = currentTrajectory.reduce(
@@ -128,6 +187,20 @@ module.exports = {
   },
 
   learn(state, action, reward, nextState, actions) {
+    const table = compactTable();
+    if (table) {
+      const si = qtable.stateIndex(state);
+      const ai = qtable.actionIndex(action);
+      const s2 = qtable.stateIndex(nextState);
+      let maxQNext = 0;
+      for (const a of actions)
+        maxQNext = Math.max(maxQNext, qtable.get(table, s2, qtable.actionIndex(a)));
+      const old = qtable.get(table, si, ai);
+      qtable.set(table, si, ai, old + ALPHA * (reward + GAMMA * maxQNext - old));
+      return;
+    }
+    if (Memory.builderBrain.compact) return; // segment not readable yet: dropped
+
     const q = Memory.builderBrain.q;
     const key = hash(action);
     if (!q[state]) q[state] = {};
@@ -0,0 +1,186 @@
+/******************************************************************************
+ *  qtable.js — compact Q-table kept in a RawMemory segment
+ *  -------------------------------------------------------
+ *  • States "e|h|u|b" (main.js) become an integer: e × role counts capped at
+ *    CAP, mixed radix → N_STATES rows.
+ *  • Actions become their index in ACTION_KEYS (every action main.js can
+ *    offer, RCL1 and RCL2+) → N_ACTIONS columns.
+ *  • Values live in one dense Float32Array, stored in the segment as
+ *        "QT1|<N_STATES>|<N_ACTIONS>|<base64 little-endian float32>"
+ *    (QBrain.py reads and writes the same string).
+ *  • The decoded table stays on the global heap across ticks: the segment is
+ *    only parsed after a global reset or when Memory.<owner>.qStamp changes,
+ *    and written back every SAVE_EVERY ticks if dirty. Each write sets
+ *    qStamp = Game.time, so other globals of the same code (the server runs
+ *    several) reload instead of saving over it; brain-sync.py sets it too
+ *    when it pushes a table.
+ ******************************************************************************/
+
+const HEADER = "QT1";
+const CAP = 5; // role counts above CAP share the row of CAP
+const RADIX = CAP + 1;
+const N_STATES = 2 * RADIX * RADIX * RADIX;
+const SAVE_EVERY = 10;
+const ABC = "ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789+/";
+
+// Same key as qlearning.js without the state: "type|role|body-parts"
+function actionKey(a) {
+  return `${a.type}|${a.role || ""}|${a.body ? a.body.join("-") : ""}`;
+}
+
+// ACTIONS of main.js, both levels, in a fixed order
+function buildActionKeys() {
+  const base = [WORK, CARRY, MOVE];
+  const keys = ["harvester", "upgrader"].map((role) =>
+    actionKey({ type: "SPAWN", role, body: base })
+  );
+  for (let i = 0; i < base.length; i++) {
+    for (let j = i; j < base.length; j++) {
+      const body = base.concat([base[i], base[j]]);
+      for (const role of ["harvester", "upgrader", "builder"])
+        keys.push(actionKey({ type: "SPAWN", role, body }));
+    }
+  }
+  keys.push(actionKey({ type: "WAIT" }));
+  return keys;
+}
+
+const ACTION_KEYS = buildActionKeys();
+const N_ACTIONS = ACTION_KEYS.length;
+const ACTION_INDEX = {};
+ACTION_KEYS.forEach((k, i) => (ACTION_INDEX[k] = i));
+
+function stateIndex(state) {
+  const v = String(state).split("|").map(Number);
+  if (v.length !== 4 || v.some((x) => !(x >= 0))) return -1;
+  const c = (x) => Math.min(Math.floor(x), CAP);
+  return ((Math.min(v[0], 1) * RADIX + c(v[1])) * RADIX + c(v[2])) * RADIX + c(v[3]);
+}
+
+function actionIndex(action) {
+  const i = ACTION_INDEX[typeof action === "string" ? action : actionKey(action)];
+  return i === undefined ? -1 : i;
+}
+
+// base64 by hand: no Buffer / atob / btoa in the game sandbox
+function encode(values) {
+  const b = new Uint8Array(values.buffer, values.byteOffset, values.byteLength);
+  const out = [];
+  for (let i = 0; i < b.length; i += 3) {
+    const n = (b[i] << 16) | ((b[i + 1] || 0) << 8) | (b[i + 2] || 0);
+    out.push(
+      ABC[(n >> 18) & 63] +
+        ABC[(n >> 12) & 63] +
+        (i + 1 < b.length ? ABC[(n >> 6) & 63] : "=") +
+        (i + 2 < b.length ? ABC[n & 63] : "=")
+    );
+  }
+  return out.join("");
+}
+
+function decode(b64, length) {
+  const lookup = new Int16Array(128).fill(0);
+  for (let i = 0; i < ABC.length; i++) lookup[ABC.charCodeAt(i)] = i;
+  const bytes = new Uint8Array(length * 4);
+  for (let i = 0, j = 0; i < b64.length && j < bytes.length; i += 4) {
+    const n =
+      (lookup[b64.charCodeAt(i)] << 18) |
+      (lookup[b64.charCodeAt(i + 1)] << 12) |
+      (lookup[b64.charCodeAt(i + 2)] << 6) |
+      lookup[b64.charCodeAt(i + 3)];
+    bytes[j++] = n >> 16;
+    if (j < bytes.length) bytes[j++] = (n >> 8) & 255;
+    if (j < bytes.length) bytes[j++] = n & 255;
+  }
+  return new Float32Array(bytes.buffer);
+}
+
+function parse(raw) {
+  const parts = typeof raw === "string" ? raw.split("|") : [];
+  if (parts[0] !== HEADER) return null;
+  if (+parts[1] !== N_STATES || +parts[2] !== N_ACTIONS) {
+    console.log(`[QTABLE] Segment is ${parts[1]}x${parts[2]}, ignored`);
+    return null;
+  }
+  return decode(parts[3] || "", N_STATES * N_ACTIONS);
+}
+
+// Decoded tables by segment, survive until the next global reset
+if (!global.qtables) global.qtables = {};
+
+module.exports = {
+  N_STATES,
+  N_ACTIONS,
+  ACTION_KEYS,
+  stateIndex,
+  actionIndex,
+
+  /**
+   * Table of segment `seg`, or null while the segment is not readable yet.
+   * `owner` is the Memory key of the brain holding `qStamp`. `legacy()`
+   * returns [state, action key, value] entries of a string-keyed Memory
+   * table, written over the segment's values (the caller empties it after).
+   */
+  open(seg, owner, legacy) {
+    const stamp = (Memory[owner] || {}).qStamp;
+    const cached = global.qtables[seg];
+    if (cached && cached.stamp === stamp) return cached;
+
+    const raw = RawMemory.segments[seg];
+    if (raw === undefined) return null;
+    let q = parse(raw);
+    let dirty = !q;
+    if (!q) q = new Float32Array(N_STATES * N_ACTIONS);
+    for (const [s, a, v] of legacy ? legacy() : []) {
+      const i = stateIndex(s);
+      const j = actionIndex(a);
+      if (i >= 0 && j >= 0) {
+        q[i * N_ACTIONS + j] = v;
+        dirty = true;
+      }
+    }
+    const t = { seg, owner, q, stamp, dirty, savedAt: Game.time };
+    global.qtables[seg] = t;
+    return t;
+  },
+
+  get(t, s, a) {
+    return s < 0 || a < 0 ? 0 : t.q[s * N_ACTIONS + a];
+  },
+
+  set(t, s, a, v) {
+    if (s < 0 || a < 0) return;
+    t.q[s * N_ACTIONS + a] = v;
+    t.dirty = true;
+  },
+
+  // Writes the dirty tables, at most every SAVE_EVERY ticks unless forced
+  flush(force = false) {
+    for (const t of Object.values(global.qtables)) {
+      if (!t.dirty || (!force && Game.time - t.savedAt < SAVE_EVERY)) continue;
+      const B = Memory[t.owner];
+      if (!B) continue;
+      if (B.qStamp !== t.stamp) {
+        // written by another global or brain-sync.py since we read it
+        delete global.qtables[t.seg];
+        continue;
+      }
+      RawMemory.segments[t.seg] = `${HEADER}|${N_STATES}|${N_ACTIONS}|${encode(t.q)}`;
+      B.qStamp = t.stamp = Game.time;
+      t.dirty = false;
+      t.savedAt = Game.time;
+    }
+  },
+
+  // setActiveSegments replaces the whole set: always include the tables
+  keepActive(extra = []) {
+    const segs = extra.concat(Object.keys(global.qtables).map(Number));
+    if (Memory.brain && Memory.brain.compact) segs.push(this.BRAIN_SEG);
+    if (Memory.builderBrain && Memory.builderBrain.compact)
+      segs.push(this.BUILDER_SEG);
+    RawMemory.setActiveSegments(_.uniq(segs).slice(0, 10));
+  },
+
+  BRAIN_SEG: 2,
+  BUILDER_SEG: 3,
+};
@@ -0,0 +1,142 @@
+/******************************************************************************
+ *  roomcache.js — per-room cache of creep targets and paths
+ *  --------------------------------------------------------
+ *  Replaces the per-creep, per-tick `findClosestByPath` calls:
+ *    • each room keeps the IDs of its sources, energy stores, construction
+ *      sites and damaged structures (most damaged first), rebuilt when the
+ *      number of structures / sites changes and refreshed every
+ *      REFRESH_TICKS while CPU is below REFRESH_CPU;
+ *    • a creep keeps its target until it is no longer valid, new ones are the
+ *      closest by range among the cached objects;
+ *    • `moveTo` reuses the serialized path of the creep (reusePath) and drops
+ *      it when the room layout changed. Path visuals only when
+ *      `Memory.visuals !== false` (set it to false while training).
+ ******************************************************************************/
+
+const REFRESH_TICKS = 20;
+const REFRESH_CPU = 0.8; // fraction of Game.cpu.limit
+const REUSE_PATH = 20;
+
+// Heap only: rebuilt for free after a global reset
+if (!global.roomCache) global.roomCache = {};
+
+function isStore(s) {
+  return (
+    (((s.structureType === STRUCTURE_SPAWN ||
+      s.structureType === STRUCTURE_EXTENSION) &&
+      s.my) ||
+      s.structureType === STRUCTURE_CONTAINER ||
+      s.structureType === STRUCTURE_STORAGE) &&
+    !!s.store
+  );
+}
+
+function needsRepair(s) {
+  return (
+    s.hits < s.hitsMax &&
+    s.structureType !== STRUCTURE_WALL &&
+    s.structureType !== STRUCTURE_RAMPART
+  );
+}
+
+function damagedIds(structures) {
+  return structures
+    .filter(needsRepair)
+    .sort((a, b) => a.hits / a.hitsMax - b.hits / b.hitsMax)
+    .map((s) => s.id);
+}
+
+function build(room, sig, version) {
+  const structures = room.find(FIND_STRUCTURES);
+  return {
+    sig,
+    version,
+    at: Game.time,
+    checked: Game.time,
+    sources: room.find(FIND_SOURCES).map((s) => s.id),
+    stores: structures.filter(isStore).map((s) => s.id),
+    sites: room.find(FIND_CONSTRUCTION_SITES).map((s) => s.id),
+    repairs: damagedIds(structures),
+  };
+}
+
+function roomCache(room) {
+  let c = global.roomCache[room.name];
+  if (c && c.checked === Game.time) return c;
+
+  // room.find results are cached by the engine for the tick
+  const sig = `${room.find(FIND_STRUCTURES).length}|${
+    room.find(FIND_CONSTRUCTION_SITES).length
+  }`;
+  if (!c || c.sig !== sig) {
+    c = build(room, sig, c ? c.version + 1 : 0);
+    global.roomCache[room.name] = c;
+  } else if (
+    Game.time - c.at >= REFRESH_TICKS &&
+    Game.cpu.getUsed() < Game.cpu.limit * REFRESH_CPU
+  ) {
+    // hits change without layout changes: refresh the repair order only
+    c.repairs = damagedIds(room.find(FIND_STRUCTURES));
+    c.at = Game.time;
+  }
+  c.checked = Game.time;
+  return c;
+}
+
+const KINDS = {
+  source: { ids: (c) => c.sources, ok: (o) => o.energy > 0 },
+  deposit: {
+    ids: (c) => c.stores,
+    ok: (o) => o.store.getFreeCapacity(RESOURCE_ENERGY) > 0,
+  },
+  withdraw: {
+    ids: (c) => c.stores,
+    ok: (o) => o.store.getUsedCapacity(RESOURCE_ENERGY) > 0,
+  },
+  site: { ids: (c) => c.sites, ok: () => true },
+  // most damaged first, like the findRepairTarget it replaces
+  repair: { ids: (c) => c.repairs, ok: needsRepair, first: true },
+};
+
+function target(creep, kind) {
+  const k = KINDS[kind];
+  const mem = creep.memory._tgt || (creep.memory._tgt = {});
+  const held = mem[kind] && Game.getObjectById(mem[kind]);
+  if (held && k.ok(held)) return held;
+
+  const objs = [];
+  for (const id of k.ids(roomCache(creep.room))) {
+    const o = Game.getObjectById(id);
+    if (o && k.ok(o)) {
+      objs.push(o);
+      if (k.first) break;
+    }
+  }
+  const t = k.first ? objs[0] : creep.pos.findClosestByRange(objs);
+  if (t) mem[kind] = t.id;
+  else delete mem[kind];
+  return t || null;
+}
+
+module.exports = {
+  source: (creep) => target(creep, "source"),
+  depositTarget: (creep) => target(creep, "deposit"),
+  withdrawSource: (creep) => target(creep, "withdraw"),
+  constructionSite: (creep) => target(creep, "site"),
+  repairTarget: (creep) => target(creep, "repair"),
+
+  visuals() {
+    return Memory.visuals !== false;
+  },
+
+  moveTo(creep, dest, stroke) {
+    const c = roomCache(creep.room);
+    if (creep.memory._pv !== c.version) {
+      delete creep.memory._move; // path of the old layout
+      creep.memory._pv = c.version;
+    }
+    const opts = { reusePath: REUSE_PATH };
+    if (this.visuals()) opts.visualizePathStyle = { stroke };
+    return creep.moveTo(dest, opts);
+  },
+};